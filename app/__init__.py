@@ -2,26 +2,50 @@
 from flask import Flask
 from flask_cors import CORS
 from .config import Config
-from .utils.file_handler import ensure_upload_folder
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+def configure_logging(level):
+    app_logger = logging.getLogger('app')
+    app_logger.setLevel(level)
+    if not logging.getLogger().handlers and not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        app_logger.addHandler(handler)
+
+def check_nltk_data(warm_up=False):
+    """Verify the bundled NLTK data offline; optionally build the analyzer right away."""
+    from .utils.nlp_processor import missing_nltk_resources, warm_up as warm_up_nlp
+
+    missing = missing_nltk_resources()
+    if missing:
+        logger.warning("Missing NLTK data %s; run `python setup_nltk.py` to download it", missing)
+    elif warm_up:
+        warm_up_nlp()
+
 def create_app():
     # Get the absolute path to the project root
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     dist_path = os.path.join(project_root, 'dist')
     
-    print(f"Looking for React build files in: {dist_path}")
-    print(f"Dist folder exists: {os.path.exists(dist_path)}")
-    
+    # dist/ is served by the main blueprint (ETags, cache headers, precompressed
+    # variants) rather than Flask's static route, which would shadow the
+    # client-side routing fallback
     app = Flask(__name__, 
-                static_folder=dist_path, 
-                static_url_path='',
+                static_folder=None,
                 template_folder=dist_path)
     
     app.config.from_object(Config)
+    if not app.config['DIST_FOLDER']:
+        app.config['DIST_FOLDER'] = dist_path
+    configure_logging(app.config['LOG_LEVEL'])
+    logger.debug("Serving React build files from %s (exists: %s)", dist_path, os.path.exists(dist_path))
     CORS(app)
 
-    ensure_upload_folder(app.config['UPLOAD_FOLDER'])
+    if app.config['NLTK_WARM_UP']:
+        check_nltk_data(warm_up=True)
 
     from .routes import main_bp
     app.register_blueprint(main_bp)
@@ -1,11 +1,94 @@
-
 import os
 
 class Config:
-    UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'csv'}
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
-    NLTK_DATA = ['vader_lexicon', 'punkt', 'stopwords']
+    NLTK_DATA = ['vader_lexicon', 'stopwords']
+    # Verify NLTK data and build the VADER analyzer and stop words at startup instead of on the first upload
+    NLTK_WARM_UP = os.environ.get('NLTK_WARM_UP', '0') == '1'
     # OpenAI API key - Set via environment variable for security
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or None
+    # Any OpenAI-compatible endpoint, e.g. a local stub (python benchmarks/openai_stub.py)
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None
+    OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+    OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT', 30))  # seconds
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 2))
+    OPENAI_POOL_SIZE = int(os.environ.get('OPENAI_POOL_SIZE', 10))
+    # Chat answers cached per dataset, question and prompt
+    CHAT_CACHE_TTL = int(os.environ.get('CHAT_CACHE_TTL', 3600))  # seconds
+    CHAT_CACHE_ENTRIES = int(os.environ.get('CHAT_CACHE_ENTRIES', 1024))
+
+    # Analysis result cache (keyed by the hash of the uploaded bytes)
+    RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '1') != '0'
+    RESULT_CACHE_FOLDER = os.environ.get('RESULT_CACHE_FOLDER') or os.path.join('cache', 'results')
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256))
+    RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 200 * 1024 * 1024))  # 200MB
+
+    # Parallel sentiment scoring / phrase extraction (0 or 1 keeps the serial path)
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))
+    ANALYSIS_CHUNK_SIZE = int(os.environ.get('ANALYSIS_CHUNK_SIZE', 5000))
+
+    # Streaming CSV ingestion: rows per chunk and bytes sampled for encoding detection
+    CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE', 20000))
+    ENCODING_SAMPLE_BYTES = 64 * 1024
+
+    # Background analysis jobs (/api/upload?async=1)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 8))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 600))  # seconds
+    # Job status and results shared by every worker process, so polls can land on any of them
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH') or os.path.join('cache', 'jobs.sqlite3')
+
+    # Phrase extraction: n-gram sizes counted (e.g. "1,2" adds bigrams) and phrases returned per list
+    PHRASE_NGRAM_RANGE = tuple(int(n) for n in os.environ.get('PHRASE_NGRAM_RANGE', '1,1').split(','))
+    PHRASE_TOP_K = int(os.environ.get('PHRASE_TOP_K', 10))
+
+    # Multi-product uploads (/api/upload?mode=products): phrases per group and groups returned per list
+    GROUP_TOP_K = int(os.environ.get('GROUP_TOP_K', 5))
+    GROUP_MAX_GROUPS = int(os.environ.get('GROUP_MAX_GROUPS', 1000))
+
+    # Near-duplicate reviews (MinHash/LSH on word shingles): off, report, exclude (never scored)
+    # or downweight (each review of a k-review cluster weighs 1/k); uploads can pick another mode with ?dedup=
+    # Off by default: clustering adds a per-review LSH lookup to every upload
+    DEDUP_MODE = os.environ.get('DEDUP_MODE', 'off')
+    # Estimated shingle Jaccard similarity at which two reviews count as copies
+    DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.8))
+    # Reviews with fewer words are never treated as copies ("Great phone" is not spam)
+    DEDUP_MIN_WORDS = int(os.environ.get('DEDUP_MIN_WORDS', 5))
+
+    # Per-review score/token store keyed by the normalized review text
+    SCORE_STORE_ENABLED = os.environ.get('SCORE_STORE_ENABLED', '1') != '0'
+    SCORE_STORE_PATH = os.environ.get('SCORE_STORE_PATH') or os.path.join('cache', 'scores.sqlite3')
+    SCORE_STORE_MAX_ENTRIES = int(os.environ.get('SCORE_STORE_MAX_ENTRIES', 1000000))
+
+    # Built frontend location (defaults to dist/ in the project root) and whether
+    # to pick up a rebuilt dist/ without a restart
+    DIST_FOLDER = os.environ.get('DIST_FOLDER') or None
+    STATIC_RELOAD = os.environ.get('STATIC_RELOAD', '0') == '1'
+
+    # Log level for the app loggers (DEBUG restores the old step-by-step request tracing)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+    # Analyzed rows with their scores, persisted as Parquet per uploaded file (sha256 of the bytes)
+    DATASET_STORE_ENABLED = os.environ.get('DATASET_STORE_ENABLED', '1') != '0'
+    DATASET_FOLDER = os.environ.get('DATASET_FOLDER') or os.path.join('data', 'datasets')
+    # Rows read and serialized per step by /api/datasets/<id>/export, and the level of its optional gzip
+    EXPORT_BATCH_ROWS = int(os.environ.get('EXPORT_BATCH_ROWS', 10000))
+    EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', 6))
+
+    # Uploads stored once per sha256 of their bytes, with size/age retention
+    UPLOAD_STORE_FOLDER = os.environ.get('UPLOAD_STORE_FOLDER') or os.path.join('data', 'uploads')
+    UPLOAD_STORE_MAX_BYTES = int(os.environ.get('UPLOAD_STORE_MAX_BYTES', 2 * 1024 ** 3))  # 2GB
+    UPLOAD_STORE_MAX_AGE = int(os.environ.get('UPLOAD_STORE_MAX_AGE', 30 * 24 * 3600))  # 30 days unused
+    # Blobs used this recently are never evicted (covers analyses still reading them)
+    UPLOAD_STORE_GRACE = int(os.environ.get('UPLOAD_STORE_GRACE', 3600))
+    UPLOAD_STORE_COMPACT_INTERVAL = int(os.environ.get('UPLOAD_STORE_COMPACT_INTERVAL', 3600))  # 0 disables
+
+    # Chat context kept server side; the session cookie only carries its id
+    CONTEXT_STORE_PATH = os.environ.get('CONTEXT_STORE_PATH') or os.path.join('cache', 'contexts.sqlite3')
+    CONTEXT_TTL = int(os.environ.get('CONTEXT_TTL', 24 * 3600))  # 1 day
+    CONTEXT_MEMORY_ENTRIES = int(os.environ.get('CONTEXT_MEMORY_ENTRIES', 256))
+    # Reviews retrieved per chat question and the prompt token budget they share
+    CHAT_TOP_K = int(os.environ.get('CHAT_TOP_K', 8))
+    CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', 600))
@@ -1,32 +1,60 @@
-from flask import Blueprint, send_from_directory, request, jsonify, send_file
-from app.services.analysis import analyze_reviews
-from app.utils.file_handler import save_uploaded_file, generate_excel_report
-from app.utils.nlp_processor import extract_common_phrases
-import pandas as pd
-from datetime import datetime
-import numpy as np
+from flask import Blueprint, request, jsonify, send_file, url_for, g, Response, stream_with_context
+from app.services.analysis import (
+    AnalysisError, AnalysisState, analyze_csv_file, build_state_response, PRODUCT_NAME_COLUMNS, BRAND_NAME_COLUMNS
+)
+from app.services.context_store import get_context_store
+from app.services.dataset_store import get_dataset_store
+from app.services.dedup import DEDUP_MODES, DuplicateDetector
+from app.services.export import EXPORT_FORMATS, export_chunks, export_columns
+from app.services.jobs import JobQueueFull, get_job_manager
+from app.services.llm_client import get_llm_client
+from app.services.metrics import metrics
+from app.services.result_cache import get_result_cache, make_cache_key
+from app.services.retrieval import ReviewIndex, estimate_tokens, get_dataset_index
+from app.services.static_assets import get_static_assets
+from app.services.upload_store import get_upload_store
+from app.utils.nlp_processor import get_stop_words
+from app.utils.phrase_engine import tokenize
+from app.utils.score_store import get_score_store
+from functools import partial
+import hashlib
+import json
+import logging
 import os
+import re
+import time
 from flask import session
-import openai
 from flask import current_app
-import traceback
+
+logger = logging.getLogger(__name__)
 
 main_bp = Blueprint('main', __name__)
 
+@main_bp.before_app_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@main_bp.after_app_request
+def _record_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started, {
+            'endpoint': request.endpoint or 'unknown',
+            'method': request.method,
+            'status': response.status_code
+        })
+    return response
+
 # Serve React app
+def _static_assets():
+    return get_static_assets(current_app.config)
+
 @main_bp.route('/')
 def serve_index():
-    try:
-        dist_path = current_app.static_folder
-        index_path = os.path.join(dist_path, 'index.html')
-        
-        print(f"Trying to serve index.html from: {index_path}")
-        print(f"File exists: {os.path.exists(index_path)}")
-        
-        if os.path.exists(index_path):
-            return send_from_directory(dist_path, 'index.html')
-        else:
-            return """
+    response = _static_assets().serve('index.html', request)
+    if response is not None:
+        return response
+    return """
             <h1>React Build Not Found</h1>
             <p>Please run the following commands to build the React app:</p>
             <pre>
@@ -35,290 +63,587 @@ npm run build
             </pre>
             <p>Then restart the Flask server with: <code>python main.py</code></p>
             """, 404
-    except Exception as e:
-        print(f"Error serving index: {str(e)}")
-        return f"Error: {str(e)}", 500
 
 @main_bp.route('/<path:path>')
 def serve_static(path):
+    response = _static_assets().serve(path, request)
+    if response is not None:
+        return response
+    if path.startswith('assets/'):
+        # A missing bundle must not come back as index.html with a 200
+        return "Not found", 404
+    # Anything else is a client-side route of the React app
+    return serve_index()
+
+# API Routes
+def _wants_async():
+    flag = request.args.get('async') or request.form.get('async') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+def _group_options(config):
+    """Options for the multi-product mode (``mode=products``), or None for a single product."""
+    mode = request.args.get('mode') or request.form.get('mode') or ''
+    if mode.lower() != 'products':
+        return None
+    return {
+        'top_k': config.get('GROUP_TOP_K', 5),
+        'max_groups': config.get('GROUP_MAX_GROUPS', 1000)
+    }
+
+def _dedup_mode(config):
+    """Near-duplicate handling for this upload (``dedup=off|report|exclude|downweight``), None if unknown."""
+    mode = (request.args.get('dedup') or request.form.get('dedup') or config.get('DEDUP_MODE', 'off')).lower()
+    return mode if mode in DEDUP_MODES else None
+
+def _date_column():
+    """Column holding the review dates (``date_column=...``); None picks a known name when present."""
+    return (request.args.get('date_column') or request.form.get('date_column') or '').strip() or None
+
+def _dataset_id(content_hash, dedup_mode):
+    """Uploads analyzed without their near-duplicate copies are stored apart from the full rows."""
+    if dedup_mode != 'exclude':
+        return content_hash
+    return hashlib.sha256(f"{content_hash}:dedup-exclude".encode('utf-8')).hexdigest()
+
+def _analysis_params(config, group_options=None, dedup_mode='off', date_column=None):
+    """Parameters that change the upload payload; part of the result cache key."""
+    params = {
+        'text_column': 'Reviews',
+        'ngram_range': list(config.get('PHRASE_NGRAM_RANGE', (1, 1))),
+        'top_k': config.get('PHRASE_TOP_K', 10)
+    }
+    if date_column is not None:
+        params['date_column'] = date_column
+    if group_options is not None:
+        params['groups'] = group_options
+    if dedup_mode != 'off':
+        params['dedup'] = {'mode': dedup_mode, 'threshold': config.get('DEDUP_THRESHOLD', 0.8),
+                           'min_words': config.get('DEDUP_MIN_WORDS', 5)}
+    return params
+
+def _store_chat_context(context):
+    """Keep the chat context server side; the session only carries its id."""
     try:
-        dist_path = current_app.static_folder
-        file_path = os.path.join(dist_path, path)
-        
-        print(f"Trying to serve static file: {file_path}")
-        
-        if os.path.exists(file_path):
-            return send_from_directory(dist_path, path)
-        else:
-            # If file doesn't exist, serve index.html for React routing
-            return serve_index()
+        store = get_context_store(current_app.config)
+        session['context_id'] = store.put(context)
+        logger.debug("Context %s stored for chatbot", session['context_id'])
     except Exception as e:
-        print(f"Error serving static file {path}: {str(e)}")
-        return serve_index()
+        logger.warning("Could not store context for chatbot: %s", e)
+
+def _load_chat_context():
+    context_id = session.get('context_id')
+    if not context_id:
+        return None
+    try:
+        return get_context_store(current_app.config).get(context_id)
+    except Exception as e:
+        logger.warning("Context store unavailable: %s", e)
+        return None
+
+def _relevant_reviews(context, question, config):
+    """Reviews most relevant to ``question``, best first, within CHAT_CONTEXT_TOKENS.
+
+    Searches the TF-IDF index of the stored dataset when the upload has one,
+    otherwise the 50-review sample; questions without any indexed word get
+    the first reviews of the sample. Returns ``[{'text', 'sentiment'}]``.
+    """
+    stop_words = get_stop_words()
+    top_k = config.get('CHAT_TOP_K', 8)
+    sample = context.get('reviews', [])
+    found = []
+    dataset_id = context.get('dataset_id')
+    datasets = _dataset_store(config) if dataset_id else None
+    index = None
+    if datasets is not None and datasets.exists(dataset_id):
+        try:
+            index = get_dataset_index(datasets, dataset_id)
+        except Exception as e:
+            logger.warning("Review index unavailable for %s: %s", dataset_id, e)
+    if index is not None:
+        hits = index.search(question, stop_words, top_k)
+        if hits:
+            text_column = context.get('text_column', 'Reviews')
+            rows = datasets.take(dataset_id, [position for position, _ in hits], columns=[text_column, 'sentiment'])
+            found = [{'text': str(text), 'sentiment': str(label)}
+                     for text, label in zip(rows[text_column], rows['sentiment'])]
+    else:
+        sample_index = ReviewIndex()
+        sample_index.add_tokens([tokenize(review, stop_words) for review in sample])
+        found = [{'text': sample[position], 'sentiment': None}
+                 for position, _ in sample_index.search(question, stop_words, top_k)]
+    if not found:
+        found = [{'text': review, 'sentiment': None} for review in sample[:top_k]]
+
+    budget = config.get('CHAT_CONTEXT_TOKENS', 600)
+    selected = []
+    for review in found:
+        if budget <= 0:
+            break
+        text = review['text'][:budget * 4]
+        selected.append(dict(review, text=text))
+        budget -= estimate_tokens(text)
+    return selected
+
+def _format_reviews(reviews):
+    return "\n".join(f"- [{review['sentiment']}] {review['text']}" if review['sentiment'] else f"- {review['text']}"
+                     for review in reviews)
+
+def _format_summary(summary):
+    stats = summary.get('stats')
+    if not stats:
+        return ""
+    return (f"{stats['total_reviews']} reviews analyzed: {stats['positive_reviews']} positive, "
+            f"{stats['neutral_reviews']} neutral, {stats['negative_reviews']} negative; "
+            f"average sentiment {summary.get('sentiment_score', 0):.3f}.")
+
+def _score_store(config):
+    if not config.get('SCORE_STORE_ENABLED'):
+        return None
+    try:
+        return get_score_store(config)
+    except Exception as e:
+        logger.warning("Score store unavailable: %s", e)
+        return None
+
+def _dataset_store(config):
+    if not config.get('DATASET_STORE_ENABLED'):
+        return None
+    try:
+        return get_dataset_store(config)
+    except Exception as e:
+        logger.warning("Dataset store unavailable: %s", e)
+        return None
+
+def _save_upload(file):
+    """Store the request file by content hash; returns (path, sha256) or (None, None)."""
+    try:
+        with metrics.timer('analysis_stage_seconds', stage='upload_save'):
+            file_path, content_hash, deduplicated = get_upload_store(current_app.config).save(file.stream,
+                                                                                              file.filename)
+    except OSError as e:
+        logger.error("File was not saved properly: %s", e)
+        return None, None
+    if deduplicated:
+        logger.info("Upload %s matches stored blob %s", file.filename, content_hash[:12])
+    else:
+        logger.info("Stored upload %s as %s (%d bytes)", file.filename, content_hash[:12], os.path.getsize(file_path))
+    return file_path, content_hash
+
+def _stream_options(config):
+    """analyze_csv_file arguments that only affect how the CSV is read and scored."""
+    return {
+        'chunk_size': config.get('CSV_CHUNK_SIZE', 20000),
+        'workers': config.get('ANALYSIS_WORKERS', 0),
+        'worker_chunk_size': config.get('ANALYSIS_CHUNK_SIZE', 5000),
+        'sample_size': config.get('ENCODING_SAMPLE_BYTES', 64 * 1024),
+        'score_store': _score_store(config)
+    }
+
+def _save_indexes(datasets, dataset_id, *indexes):
+    """Store the chat retrieval index and the duplicate signatures next to the dataset.
+
+    Without them chat falls back to the review sample and appends skip
+    near-duplicate detection.
+    """
+    for index in indexes:
+        if index is None:
+            continue
+        try:
+            with metrics.timer('analysis_stage_seconds', stage='index_save'):
+                index.save(datasets.path(dataset_id))
+        except Exception as e:
+            logger.warning("Could not save %s for %s: %s", type(index).__name__, dataset_id, e)
+
+def _run_upload_analysis(file_path, dataset_id, cache, cache_key, group_options=None, dedup_mode='off',
+                         date_column=None, progress=None):
+    """Stream the CSV through cleaning, scoring and phrase counting and cache the result.
+
+    The scored rows and the running aggregates are persisted under
+    ``dataset_id`` unless that dataset is already stored.
+    """
+    config = current_app.config
+    datasets = _dataset_store(config)
+    writer = None
+    if datasets is not None and not datasets.exists(dataset_id):
+        writer = datasets.writer(dataset_id, PRODUCT_NAME_COLUMNS + BRAND_NAME_COLUMNS)
+    review_index = ReviewIndex() if writer is not None else None
+    duplicates = None
+    if dedup_mode != 'off':
+        duplicates = DuplicateDetector(dedup_mode, config.get('DEDUP_THRESHOLD', 0.8),
+                                       min_words=config.get('DEDUP_MIN_WORDS', 5))
+    state = AnalysisState(
+        text_column='Reviews',
+        ngram_range=config.get('PHRASE_NGRAM_RANGE', (1, 1)),
+        top_k=config.get('PHRASE_TOP_K', 10),
+        group_options=group_options,
+        date_column=date_column
+    )
+    try:
+        response_data, context = analyze_csv_file(
+            file_path, state=state, dataset_writer=writer, review_index=review_index, duplicates=duplicates,
+            progress=progress, **_stream_options(config)
+        )
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        try:
+            with datasets.lock(dataset_id):
+                if datasets.exists(dataset_id):
+                    # The same file finished uploading elsewhere in the meantime
+                    writer.abort()
+                else:
+                    with metrics.timer('analysis_stage_seconds', stage='dataset_commit'):
+                        committed = writer.close()
+                        if committed:
+                            try:
+                                datasets.save_state(dataset_id, state.to_state())
+                            except Exception:
+                                # A part without its aggregates cannot be appended to; drop it
+                                os.remove(writer.path)
+                                raise
+                    if committed:
+                        _save_indexes(datasets, dataset_id, review_index, duplicates)
+        except Exception as e:
+            logger.warning("Could not persist dataset %s: %s", dataset_id, e)
+            writer.abort()
+    if datasets is not None and datasets.exists(dataset_id):
+        response_data['dataset_id'] = dataset_id
+        context['dataset_id'] = dataset_id
+    logger.info("Sentiment stats: %s", response_data['stats'])
+    logger.debug("Product info: %s", response_data['product_info'])
+
+    if cache is not None:
+        try:
+            cache.put(cache_key, {"response": response_data, "context": context})
+        except Exception as e:
+            logger.warning("Could not store analysis result in cache: %s", e)
+    return response_data, context
+
+def _job_accepted(job):
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": url_for('main.job_status', job_id=job.id)
+    }), 202
 
-# API Routes
 @main_bp.route('/api/upload', methods=['POST'])
 def upload_file():
     try:
-        print("\n" + "="*50)
-        print("UPLOAD ENDPOINT CALLED")
-        print("="*50)
-        
         # Check if file is in request
         if 'file' not in request.files:
-            print("ERROR: No file in request.files")
-            print("Available keys:", list(request.files.keys()))
+            logger.info("No file in upload request; form keys: %s", list(request.files.keys()))
             return jsonify({"error": "No file uploaded", "success": False}), 400
 
         file = request.files['file']
         if not file or file.filename == '':
-            print("ERROR: Empty filename or no file")
             return jsonify({"error": "No selected file", "success": False}), 400
 
-        print(f"Processing file: {file.filename}")
-        print(f"File size: {file.content_length if hasattr(file, 'content_length') else 'Unknown'}")
+        dedup_mode = _dedup_mode(current_app.config)
+        if dedup_mode is None:
+            return jsonify({"error": f"Unknown dedup mode, expected one of: {', '.join(DEDUP_MODES)}",
+                            "success": False}), 400
 
-        # Ensure uploads directory exists
-        uploads_dir = 'uploads'
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
-            print(f"Created uploads directory: {uploads_dir}")
-
-        # Save file with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        file_path = os.path.join(uploads_dir, filename)
-        
-        print(f"Saving file to: {file_path}")
-        file.save(file_path)
-        
-        if not os.path.exists(file_path):
-            print("ERROR: File was not saved properly")
+        logger.debug("Processing file: %s", file.filename)
+        file_path, content_hash = _save_upload(file)
+        if file_path is None:
             return jsonify({"error": "Failed to save file", "success": False}), 500
-            
-        print(f"File saved successfully. Size: {os.path.getsize(file_path)} bytes")
 
-        # Read and validate CSV
-        try:
-            print("Reading CSV file...")
-            df = pd.read_csv(file_path, encoding='utf-8')
-            print(f"CSV loaded: {len(df)} rows, {len(df.columns)} columns")
-            print(f"Columns: {list(df.columns)}")
-            print(f"First few rows preview:")
-            print(df.head().to_string())
-            
-        except UnicodeDecodeError:
+        group_options = _group_options(current_app.config)
+        date_column = _date_column()
+        dataset_id = _dataset_id(content_hash, dedup_mode)
+
+        # Serve repeat uploads of identical bytes straight from the result cache
+        cache = None
+        cache_key = None
+        if current_app.config.get('RESULT_CACHE_ENABLED'):
             try:
-                print("UTF-8 failed, trying latin-1 encoding...")
-                df = pd.read_csv(file_path, encoding='latin-1')
-                print(f"CSV loaded with latin-1: {len(df)} rows, {len(df.columns)} columns")
+                cache = get_result_cache(current_app.config)
+                # The payload describes these bytes only; rows appended to the dataset since
+                # show up under /api/datasets/<id>, not here
+                params = _analysis_params(current_app.config, group_options, dedup_mode, date_column)
+                cache_key = make_cache_key(content_hash, params)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Result cache hit for %s", content_hash)
+                    metrics.inc('result_cache_lookups_total', labels={'result': 'hit'})
+                    metrics.inc('analysis_uploads_total', labels={'outcome': 'cached'})
+                    if _wants_async():
+                        job = get_job_manager(current_app._get_current_object()).add_finished(
+                            cached['response'], cached['context'])
+                        return _job_accepted(job)
+                    _store_chat_context(cached['context'])
+                    return jsonify(cached['response'])
+                logger.debug("Result cache miss for %s", content_hash)
+                metrics.inc('result_cache_lookups_total', labels={'result': 'miss'})
             except Exception as e:
-                print(f"ERROR reading CSV with latin-1: {str(e)}")
-                return jsonify({"error": f"Failed to read CSV file: {str(e)}", "success": False}), 400
-        except Exception as e:
-            print(f"ERROR reading CSV: {str(e)}")
-            return jsonify({"error": f"Failed to read CSV: {str(e)}", "success": False}), 400
+                logger.warning("Result cache unavailable: %s", e)
+                cache = None
 
-        # Check for required columns
-        required_columns = ['Reviews']
-        missing_cols = [col for col in required_columns if col not in df.columns]
-        
-        if missing_cols:
-            print(f"Missing required columns: {missing_cols}")
-            print(f"Available columns: {list(df.columns)}")
-            # Try to find similar column names
-            potential_review_cols = [col for col in df.columns if 'review' in col.lower() or 'comment' in col.lower() or 'feedback' in col.lower()]
-            if potential_review_cols:
-                print(f"Potential review columns found: {potential_review_cols}")
-                return jsonify({
-                    "error": f"Missing 'Reviews' column. Found potential columns: {', '.join(potential_review_cols)}",
-                    "available_columns": list(df.columns),
-                    "success": False
-                }), 400
-            else:
-                return jsonify({
-                    "error": f"Missing required 'Reviews' column",
-                    "available_columns": list(df.columns),
-                    "success": False
-                }), 400
-
-        # Clean the data
-        print("Cleaning data...")
-        original_count = len(df)
-        
-        # Handle missing values in Reviews column
-        df = df.dropna(subset=['Reviews'])
-        df = df[df['Reviews'].astype(str).str.strip() != '']
-        df = df[df['Reviews'].astype(str) != 'nan']
-        
-        cleaned_count = len(df)
-        print(f"Data cleaned: {cleaned_count} rows remaining (from {original_count})")
+        # Hand large files to a background job and let the client poll for the result
+        if _wants_async():
+            target = partial(_run_upload_analysis, file_path, dataset_id, cache, cache_key, group_options, dedup_mode,
+                             date_column)
+            try:
+                job = get_job_manager(current_app._get_current_object()).submit(target)
+            except JobQueueFull:
+                logger.warning("Analysis queue is full, rejecting upload")
+                metrics.inc('analysis_uploads_total', labels={'outcome': 'rejected'})
+                response = jsonify({"error": "Too many analyses in progress, please retry shortly", "success": False})
+                response.headers['Retry-After'] = '5'
+                return response, 429
+            logger.info("Queued analysis job %s", job.id)
+            metrics.inc('analysis_uploads_total', labels={'outcome': 'queued'})
+            return _job_accepted(job)
 
-        if cleaned_count == 0:
-            return jsonify({"error": "No valid reviews found after cleaning", "success": False}), 400
+        try:
+            response_data, context = _run_upload_analysis(
+                file_path, dataset_id, cache, cache_key, group_options, dedup_mode, date_column
+            )
+        except AnalysisError as e:
+            logger.info("Could not analyze CSV: %s", e.message)
+            metrics.inc('analysis_uploads_total', labels={'outcome': 'invalid'})
+            return jsonify(e.to_dict()), e.status_code
 
-        # Perform sentiment analysis
-        print("Starting sentiment analysis...")
-        from app.utils.nlp_processor import analyze_sentiment
-        
-        df = analyze_sentiment(df, 'Reviews')
-        print("Sentiment analysis completed")
-        print(df['sentiment'].value_counts().to_dict())
+        # Store context for chatbot
+        _store_chat_context(context)
+        metrics.inc('analysis_uploads_total', labels={'outcome': 'analyzed'})
+        return jsonify(response_data)
 
-        # Extract product information
-        print("Extracting product information...")
-        product_info = {}
-        
-        # Try to get product info from first row
-        for col_name in ['Product Name', 'ProductName', 'product_name', 'Product', 'Name']:
-            if col_name in df.columns and len(df) > 0:
-                val = df[col_name].iloc[0]
-                if pd.notna(val) and str(val).strip():
-                    product_info['Product Name'] = str(val).strip()
-                    break
-        
-        for col_name in ['Brand Name', 'BrandName', 'brand_name', 'Brand', 'Manufacturer']:
-            if col_name in df.columns and len(df) > 0:
-                val = df[col_name].iloc[0]
-                if pd.notna(val) and str(val).strip():
-                    product_info['Brand Name'] = str(val).strip()
-                    break
-        
-        for col_name in ['Price', 'price', 'Cost', 'cost']:
-            if col_name in df.columns and len(df) > 0:
-                val = df[col_name].iloc[0]
-                if pd.notna(val):
-                    try:
-                        price_val = float(str(val).replace('$', '').replace(',', ''))
-                        product_info['Price'] = f"${price_val:.2f}"
-                    except:
-                        product_info['Price'] = str(val)
-                    break
-
-        # Set defaults if not found
-        if 'Product Name' not in product_info:
-            product_info['Product Name'] = 'Unknown Product'
-        if 'Brand Name' not in product_info:
-            product_info['Brand Name'] = 'Unknown Brand'  
-        if 'Price' not in product_info:
-            product_info['Price'] = 'N/A'
-            
-        print(f"Product info: {product_info}")
-
-        # Calculate sentiment statistics
-        print("Calculating sentiment statistics...")
-        sentiment_counts = df['sentiment'].value_counts()
-        pos_count = sentiment_counts.get('positive', 0)
-        neg_count = sentiment_counts.get('negative', 0)
-        neu_count = sentiment_counts.get('neutral', 0)
-        
-        # Calculate mean sentiment scores by category
-        pos_mean = float(df[df['sentiment'] == 'positive']['sentiment_score'].mean()) if pos_count > 0 else 0
-        neg_mean = float(df[df['sentiment'] == 'negative']['sentiment_score'].mean()) if neg_count > 0 else 0
-        
-        # Overall sentiment score
-        overall_sentiment = float(df['sentiment_score'].mean())
-        
-        print(f"Sentiment stats: Pos={pos_count}, Neg={neg_count}, Neu={neu_count}")
-        print(f"Sentiment means: Pos={pos_mean:.3f}, Neg={neg_mean:.3f}, Overall={overall_sentiment:.3f}")
+    except Exception as e:
+        logger.exception("Unhandled error in upload endpoint")
+        metrics.inc('analysis_uploads_total', labels={'outcome': 'error'})
+        return jsonify({
+            "error": f"Internal server error: {str(e)}",
+            "success": False
+        }), 500
 
-        # Extract common phrases
-        print("Extracting common phrases...")
-        try:
-            common_phrases = extract_common_phrases(df['Reviews'].tolist())
-            negative_reviews = df[df['sentiment'] == 'negative']['Reviews'].tolist()
-            negative_phrases = extract_common_phrases(negative_reviews) if negative_reviews else []
-            print(f"Common phrases extracted: {len(common_phrases)} total, {len(negative_phrases)} negative")
-        except Exception as e:
-            print(f"Error extracting phrases: {str(e)}")
-            common_phrases = []
-            negative_phrases = []
-
-        # Prepare chart data
-        chart_data = {
-            "sentiment": {
-                "labels": ["Positive", "Negative"],
-                "means": [pos_mean, abs(neg_mean)]  # Make negative mean positive for display
-            },
-            "distribution": {
-                "labels": ["Positive", "Neutral", "Negative"],
-                "values": [int(pos_count), int(neu_count), int(neg_count)]
-            },
-            "counts": {
-                "labels": ["Total Reviews"],
-                "values": [int(len(df))]
-            }
-        }
-
-        # Determine sales trend
-        if overall_sentiment > 0.05:
-            trend = 'Up'
-            message = "Customers are mostly satisfied, so the product is likely to sell well."
-        elif overall_sentiment < -0.05:
-            trend = 'Down' 
-            message = "Many customers are unhappy, which may reduce future sales."
-        else:
-            trend = 'Stable'
-            message = "Customer opinions are mixed, so sales are expected to stay the same."
-
-        sales_trend = {
-            "avg_sentiment": round(overall_sentiment, 3),
-            "trend": trend,
-            "message": message
-        }
-
-        # Build response
-        response_data = {
-            "success": True,
-            "chart_data": chart_data,
-            "product_info": product_info,
-            "common_phrases": common_phrases,
-            "negative_phrases": negative_phrases,
-            "sentiment_score": overall_sentiment,
-            "sales_trend": sales_trend,
-            "stats": {
-                "total_reviews": int(len(df)),
-                "positive_reviews": int(pos_count),
-                "negative_reviews": int(neg_count),
-                "neutral_reviews": int(neu_count)
-            }
-        }
+@main_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_manager(current_app._get_current_object()).get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job", "success": False}), 404
+    if job.status == 'done' and job.context is not None:
+        # The worker thread has no session; hand the chat context over on poll
+        _store_chat_context(job.context)
+    return jsonify(job.to_dict())
+
+@main_bp.route('/api/datasets/<dataset_id>', methods=['GET'])
+def dataset_info(dataset_id):
+    """Size and columns of a stored dataset, plus its payload over every row, appended ones included."""
+    datasets = _dataset_store(current_app.config)
+    if datasets is None or not datasets.exists(dataset_id):
+        return jsonify({"error": "Unknown dataset", "success": False}), 404
+    info = datasets.info(dataset_id)
+    saved = datasets.load_state(dataset_id)
+    if saved is not None and AnalysisState.is_current(saved):
+        info['analysis'], _ = build_state_response(AnalysisState.from_state(saved))
+    return jsonify(dict(info, success=True))
+
+@main_bp.route('/api/datasets/<dataset_id>/export', methods=['GET'])
+def export_dataset(dataset_id):
+    """Download the scored reviews of a dataset as CSV, JSONL or XLSX, streamed batch by batch.
+
+    ``format`` picks the format (csv by default), ``columns`` is ``all`` or a
+    comma-separated list of stored columns and ``gzip=1`` compresses CSV and
+    JSONL on the fly.
+    """
+    config = current_app.config
+    datasets = _dataset_store(config)
+    if datasets is None or not datasets.exists(dataset_id):
+        return jsonify({"error": "Unknown dataset", "success": False}), 404
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format '{fmt}'; use one of {', '.join(EXPORT_FORMATS)}",
+                        "success": False}), 400
+    compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+    if compress and fmt == 'xlsx':
+        return jsonify({"error": "XLSX files are already compressed", "success": False}), 400
+    try:
+        state = datasets.load_state(dataset_id) or {}
+        columns = export_columns(datasets.info(dataset_id)['columns'], state.get('text_column', 'Reviews'),
+                                 request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({"error": str(e), "success": False}), 400
 
-        # Store context for chatbot
+    chunks = export_chunks(datasets, dataset_id, fmt, columns, batch_size=config.get('EXPORT_BATCH_ROWS', 10000),
+                           compress_level=config.get('EXPORT_GZIP_LEVEL', 6) if compress else None)
+
+    def stream():
         try:
-            reviews_sample = " ".join(df['Reviews'].astype(str).head(50).tolist())[:2000]
-            session['reviews_text'] = reviews_sample
-            session['product_info'] = product_info
-            print("Context stored for chatbot")
-        except Exception as e:
-            print(f"Warning: Could not store context for chatbot: {str(e)}")
+            yield from chunks
+        except Exception:
+            # The status line is gone already; the client sees a truncated download
+            logger.exception("Export of dataset %s as %s failed", dataset_id, fmt)
+            raise
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"reviews-{dataset_id[:12]}.{extension}"
+    if compress:
+        mimetype, filename = 'application/gzip', f"{filename}.gz"
+    metrics.inc('dataset_exports_total', labels={'format': f"{fmt}.gz" if compress else fmt})
+    return Response(stream(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _run_append_analysis(file_path, dataset_id, progress=None):
+    """Score only the rows of ``file_path`` and fold them into the stored dataset."""
+    config = current_app.config
+    datasets = _dataset_store(config)
+    with datasets.lock(dataset_id):
+        saved = datasets.load_state(dataset_id)
+        if saved is None:
+            raise AnalysisError("Dataset has no stored aggregates to append to", status_code=404)
+        if not AnalysisState.is_current(saved):
+            raise AnalysisError("Dataset was stored by an older version of the analysis and cannot be appended to",
+                                status_code=409)
+        state = AnalysisState.from_state(saved)
+        rows_before = state.aggregate.total
+        review_index = ReviewIndex.load(datasets.path(dataset_id))
+        if review_index is not None and review_index.size != rows_before:
+            review_index = None
+        # New rows are checked against every stored review, in the mode the dataset was created with
+        duplicates = DuplicateDetector.load(datasets.path(dataset_id))
+        if duplicates is not None and duplicates.kept_rows != rows_before:
+            duplicates = None
+        writer = datasets.writer(dataset_id, PRODUCT_NAME_COLUMNS + BRAND_NAME_COLUMNS)
+        try:
+            response_data, context = analyze_csv_file(
+                file_path, state=state, dataset_writer=writer, review_index=review_index, duplicates=duplicates,
+                progress=progress, **_stream_options(config)
+            )
+            writer.close()
+        except Exception:
+            writer.abort()
+            raise
+        try:
+            datasets.save_state(dataset_id, state.to_state())
+        except Exception:
+            # Keep the parts and the aggregates in step
+            os.remove(writer.path)
+            raise
+        _save_indexes(datasets, dataset_id, review_index, duplicates)
+
+    response_data['dataset_id'] = dataset_id
+    response_data['appended_reviews'] = state.aggregate.total - rows_before
+    context['dataset_id'] = dataset_id
+    logger.info("Appended %d reviews to dataset %s", response_data['appended_reviews'], dataset_id)
+    return response_data, context
+
+@main_bp.route('/api/datasets/<dataset_id>/append', methods=['POST'])
+def append_dataset(dataset_id):
+    """Add new reviews to an analyzed dataset, scoring only the new rows."""
+    try:
+        datasets = _dataset_store(current_app.config)
+        if datasets is None or not datasets.exists(dataset_id):
+            return jsonify({"error": "Unknown dataset", "success": False}), 404
 
-        print("="*50)
-        print("ANALYSIS COMPLETED SUCCESSFULLY")
-        print(f"Response keys: {list(response_data.keys())}")
-        print("="*50)
-        
-        return jsonify(response_data)
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            return jsonify({"error": "No file uploaded", "success": False}), 400
+        file_path, _ = _save_upload(file)
+        if file_path is None:
+            return jsonify({"error": "Failed to save file", "success": False}), 500
+
+        if _wants_async():
+            try:
+                job = get_job_manager(current_app._get_current_object()).submit(
+                    partial(_run_append_analysis, file_path, dataset_id))
+            except JobQueueFull:
+                response = jsonify({"error": "Too many analyses in progress, please retry shortly", "success": False})
+                response.headers['Retry-After'] = '5'
+                return response, 429
+            return _job_accepted(job)
 
+        try:
+            response_data, context = _run_append_analysis(file_path, dataset_id)
+        except AnalysisError as e:
+            return jsonify(e.to_dict()), e.status_code
+        _store_chat_context(context)
+        return jsonify(response_data)
     except Exception as e:
-        print(f"\n{'='*50}")
-        print("CRITICAL ERROR IN UPLOAD ENDPOINT")
-        print(f"{'='*50}")
-        print(f"Error: {str(e)}")
-        print("Full traceback:")
-        traceback.print_exc()
-        print(f"{'='*50}")
-        
+        logger.exception("Unhandled error appending to dataset %s", dataset_id)
         return jsonify({
             "error": f"Internal server error: {str(e)}",
             "success": False
         }), 500
 
+@main_bp.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    config = current_app.config
+    if config.get('RESULT_CACHE_ENABLED'):
+        stats = get_result_cache(config).stats()
+        stats['enabled'] = True
+    else:
+        stats = {"enabled": False}
+    store = _score_store(config)
+    stats['scores'] = dict(store.stats(), enabled=True) if store is not None else {"enabled": False}
+    return jsonify(stats)
+
+def _cache_gauges():
+    """Point-in-time cache and job queue figures, read when /api/metrics is scraped."""
+    config = current_app.config
+    gauges = []
+    if config.get('RESULT_CACHE_ENABLED'):
+        for name, value in get_result_cache(config).stats().items():
+            if name in ('entries', 'bytes'):
+                gauges.append((f'result_cache_{name}', 'gauge', None, value))
+    store = _score_store(config)
+    if store is not None:
+        store_stats = store.stats()
+        gauges.append(('score_store_entries', 'gauge', None, store_stats['entries']))
+        for name in ('hits', 'misses', 'evictions'):
+            gauges.append((f'score_store_{name}_total', 'counter', None, store_stats[name]))
+    context_stats = get_context_store(config).stats()
+    gauges.append(('chat_context_entries', 'gauge', None, context_stats['entries']))
+    for name in ('hits', 'misses'):
+        gauges.append((f'chat_context_{name}_total', 'counter', None, context_stats[name]))
+    upload_stats = get_upload_store(config).stats()
+    for name in ('blobs', 'bytes', 'uploads', 'uploaded_bytes'):
+        gauges.append((f'upload_store_{name}', 'gauge', None, upload_stats[name]))
+    for name, value in get_job_manager(current_app._get_current_object()).stats().items():
+        gauges.append(('analysis_jobs', 'gauge', {'state': name}, value))
+    return gauges
+
+metrics.register_collector(_cache_gauges)
+
+@main_bp.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def _llm_configured(config):
+    openai_key = config.get('OPENAI_API_KEY')
+    return bool(openai_key) and openai_key != 'your-openai-key-here'
+
+def _chat_messages(chat_context, question, reviews):
+    product_info = chat_context.get('product_info', {})
+    prompt = f"""You are a helpful assistant analyzing customer reviews for this product:
+Product: {product_info.get('Product Name', 'Unknown')}
+Brand: {product_info.get('Brand Name', 'Unknown')}
+Price: {product_info.get('Price', 'Unknown')}
+{_format_summary(chat_context.get('summary', {}))}
+
+Here are the customer reviews most relevant to the question:
+---
+{_format_reviews(reviews)}
+---
+
+Question: {question}
+
+Please provide a helpful answer based on the reviews and product information."""
+    return [
+        {"role": "system", "content": "You are a helpful product review analyst."},
+        {"role": "user", "content": prompt}
+    ]
+
 @main_bp.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        print(f"Chat endpoint called")
-        
         # Get the question from request
         data = request.get_json()
         if not data:
@@ -328,98 +653,167 @@ def chat():
         if not question:
             return jsonify({'answer': "Please ask a question about your data."})
         
-        print(f"Question: {question}")
+        logger.debug("Chat question: %s", question)
         
         # Check for context (uploaded data)
-        context = session.get('reviews_text', '')
-        product_info = session.get('product_info', {})
-        
-        if not context:
+        chat_context = _load_chat_context()
+        if not chat_context:
             return jsonify({'answer': "Please upload and analyze a CSV file first to enable chat functionality."})
+        reviews = _relevant_reviews(chat_context, question, current_app.config)
+        product_info = chat_context.get('product_info', {})
         
-        print(f"Context available: {len(context)} characters")
-        print(f"Product info: {product_info}")
+        logger.debug("Chat context: %d reviews, product info: %s", len(reviews), product_info)
         
         # Check if OpenAI API key is configured
-        openai_key = current_app.config.get('OPENAI_API_KEY')
-        if not openai_key or openai_key == 'your-openai-key-here':
-            print("OpenAI API key not configured, using local responses")
+        if not _llm_configured(current_app.config):
+            logger.debug("OpenAI API key not configured, using local responses")
             # Return a local response when API key is not available
-            return jsonify({'answer': generate_local_chat_response(question, context, product_info)})
+            return jsonify({'answer': generate_local_chat_response(question, reviews, chat_context)})
 
         # Use OpenAI API if key is available
-        client = openai.OpenAI(api_key=openai_key)
-
-        prompt = f"""You are a helpful assistant analyzing customer reviews for this product:
-Product: {product_info.get('Product Name', 'Unknown')}
-Brand: {product_info.get('Brand Name', 'Unknown')}
-Price: {product_info.get('Price', 'Unknown')}
-
-Here are some customer reviews:
----
-{context}
----
-
-Question: {question}
-
-Please provide a helpful answer based on the reviews and product information."""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful product review analyst."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        
-        answer = response.choices[0].message.content
-        print(f"OpenAI response: {answer}")
+        client = get_llm_client(current_app.config)
+        messages = _chat_messages(chat_context, question, reviews)
+        scope = chat_context.get('dataset_id') or session.get('context_id')
+
+        if _wants_async():
+            # Poll /api/jobs/<id>; the model call waits on the client's event loop, not on this worker
+            fallback = generate_local_chat_response(question, reviews, chat_context)
+            job = get_job_manager(current_app._get_current_object()).add_future(
+                client.complete_async(messages, scope=scope, max_tokens=200, temperature=0.7),
+                on_result=lambda answer: ({'answer': answer}, None),
+                on_error=lambda error: ({'answer': fallback}, None)
+            )
+            return _job_accepted(job)
+
+        answer = client.complete(messages, scope=scope, max_tokens=200, temperature=0.7)
+        logger.debug("OpenAI response: %s", answer)
         return jsonify({'answer': answer})
         
     except Exception as e:
-        print(f"Chat error: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Chat error")
         # Fallback to local response on any error
         try:
-            context = session.get('reviews_text', '')
-            product_info = session.get('product_info', {})
+            chat_context = _load_chat_context() or {}
             question = request.get_json().get('question', '') if request.get_json() else ''
-            return jsonify({'answer': generate_local_chat_response(question, context, product_info)})
+            reviews = [{'text': review, 'sentiment': None} for review in chat_context.get('reviews', [])]
+            return jsonify({'answer': generate_local_chat_response(question, reviews, chat_context)})
         except:
             return jsonify({'answer': "Sorry, I'm having trouble processing your question right now. Please try again."})
 
-def generate_local_chat_response(question, context, product_info):
-    """Generate a response using local analysis when OpenAI API is not available"""
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _text_pieces(text):
+    """Split a ready-made answer into word-sized pieces so it streams like a model answer."""
+    return re.findall(r'\S+\s*|\s+', text)
+
+@main_bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat over server-sent events: ``delta`` events as the answer is generated, then ``done``.
+
+    The local answer streams the same way when no API key is configured or
+    the model call fails before producing anything.
+    """
+    data = request.get_json(silent=True) or {}
+    question = (data.get('question') or '').strip()
+    chat_context = _load_chat_context() if question else None
+    config = current_app.config
+    if not question:
+        pieces, fallback = _text_pieces("Please ask a question about your data."), None
+    elif not chat_context:
+        pieces, fallback = _text_pieces("Please upload and analyze a CSV file first to enable chat functionality."), None
+    else:
+        reviews = _relevant_reviews(chat_context, question, config)
+        fallback = partial(generate_local_chat_response, question, reviews, chat_context)
+        if _llm_configured(config):
+            pieces = get_llm_client(config).stream(
+                _chat_messages(chat_context, question, reviews),
+                scope=chat_context.get('dataset_id') or session.get('context_id'),
+                max_tokens=200, temperature=0.7
+            )
+        else:
+            pieces, fallback = _text_pieces(fallback()), None
+
+    def events():
+        answer = []
+        try:
+            for piece in pieces:
+                answer.append(piece)
+                yield _sse('delta', {'delta': piece})
+        except Exception as e:
+            logger.warning("Chat stream failed: %s", e)
+            if answer or fallback is None:
+                yield _sse('error', {'error': "The answer was interrupted.", 'success': False})
+            else:
+                for piece in _text_pieces(fallback()):
+                    answer.append(piece)
+                    yield _sse('delta', {'delta': piece})
+        yield _sse('done', {'answer': ''.join(answer)})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _phrase_list(phrases, n=5):
+    return ", ".join(f'"{phrase}" ({count})' for phrase, count in phrases[:n])
+
+def _quote(reviews, n=2, sentiment=None):
+    picked = [review for review in reviews if sentiment is None or review['sentiment'] == sentiment][:n]
+    return " ".join(f'"{review["text"][:300]}"' for review in picked)
+
+def generate_local_chat_response(question, reviews, context):
+    """Answer from the stored aggregates and the retrieved reviews when OpenAI is not available"""
     question_lower = question.lower()
+    product_info = context.get('product_info') or {}
+    summary = context.get('summary') or {}
+    stats = summary.get('stats')
     
-    # Product information responses
-    if any(word in question_lower for word in ['product', 'name', 'what is']):
-        product_name = product_info.get('Product Name', 'Unknown Product')
-        brand_name = product_info.get('Brand Name', 'Unknown Brand')
-        price = product_info.get('Price', 'N/A')
-        return f"This analysis is for {product_name} by {brand_name}, priced at {price}."
+    # Review count questions
+    if stats and any(word in question_lower for word in ['how many', 'count', 'total', 'number']):
+        return (f"I analyzed {stats['total_reviews']} reviews: {stats['positive_reviews']} positive, "
+                f"{stats['neutral_reviews']} neutral and {stats['negative_reviews']} negative.")
     
     # Sentiment-related questions
-    if any(word in question_lower for word in ['sentiment', 'feeling', 'opinion', 'positive', 'negative']):
-        return "Based on the uploaded reviews, I can see the overall sentiment analysis. The data shows how customers feel about this product. You can see the detailed sentiment breakdown in the charts above."
+    if stats and any(word in question_lower for word in ['sentiment', 'feeling', 'opinion', 'positive', 'negative']):
+        total = max(stats['total_reviews'], 1)
+        answer = (f"Overall sentiment is {summary.get('sentiment_score', 0):.2f} on a -1 to 1 scale: "
+                  f"{stats['positive_reviews'] / total:.0%} of reviews are positive and "
+                  f"{stats['negative_reviews'] / total:.0%} negative.")
+        if summary.get('positive_phrases'):
+            answer += f" Positive reviews often mention {_phrase_list(summary['positive_phrases'], 3)}."
+        if summary.get('negative_phrases'):
+            answer += f" Negative reviews often mention {_phrase_list(summary['negative_phrases'], 3)}."
+        return answer
     
     # Sales trend questions
-    if any(word in question_lower for word in ['sales', 'trend', 'forecast', 'future', 'sell']):
-        return "The sales forecast is based on customer sentiment analysis. Positive reviews typically indicate good sales potential, while negative reviews might suggest challenges. Check the sales forecast section above for detailed predictions."
+    trend = summary.get('sales_trend')
+    if trend and any(word in question_lower for word in ['sales', 'trend', 'forecast', 'future', 'sell']):
+        return f"The sales trend looks {trend['trend'].lower()} (average sentiment {trend['avg_sentiment']}). {trend['message']}"
     
-    # Review count questions
-    if any(word in question_lower for word in ['how many', 'count', 'total', 'number']):
-        return "I analyzed all the reviews from your uploaded CSV file. You can see the exact numbers in the statistics section above, including total reviews and their sentiment breakdown."
+    # Product information responses
+    if any(word in question_lower for word in ['product', 'name', 'brand', 'price', 'what is']):
+        product_name = product_info.get('Product Name', 'Unknown Product')
+        brand_name = product_info.get('Brand Name', 'Unknown Brand')
+        price = product_info.get('Price', 'N/A')
+        return f"This analysis is for {product_name} by {brand_name}, priced at {price}."
     
     # Common phrases questions
-    if any(word in question_lower for word in ['phrase', 'keyword', 'common', 'mention', 'say']):
-        return "The analysis identified common phrases and keywords from customer reviews. You can see these in the 'Common Phrases' and 'Word Cloud' sections above."
+    if summary.get('common_phrases') and any(word in question_lower for word in ['phrase', 'keyword', 'common', 'mention', 'say']):
+        return f"The most common phrases in the reviews are {_phrase_list(summary['common_phrases'])}."
     
     # Improvement questions
     if any(word in question_lower for word in ['improve', 'better', 'fix', 'problem', 'issue']):
-        return "Based on the sentiment analysis, you can identify areas for improvement by looking at negative reviews and common complaint phrases. The analysis shows what customers are saying about your product."
+        answer = "Look at what unhappy customers bring up."
+        if summary.get('negative_phrases'):
+            answer = f"Negative reviews most often mention {_phrase_list(summary['negative_phrases'])}."
+        quotes = _quote(reviews, sentiment='negative')
+        if quotes:
+            answer += f" For example: {quotes}"
+        return answer
+
+    # Anything else: point at the reviews closest to the question
+    quotes = _quote(reviews)
+    if quotes:
+        return f"Here is what reviewers say that relates to your question: {quotes}"
     
     # Default helpful response
     return """I can help you understand your review analysis! Try asking me about:
@@ -0,0 +1,431 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from app.utils.sentiment_engine import SENTIMENT_LABELS
+
+# Partial per-chunk results are folded together once this many pile up
+_COMPACT_EVERY = 16
+
+
+class SentimentAggregate:
+    """Per-label counts, score sums and text partitions of a scored frame.
+
+    Aggregates of consecutive chunks can be merged, so the streaming upload
+    path and the in-memory helpers share the same numbers.
+    """
+
+    def __init__(self, counts=None, sums=None, partitions=None, weights=None):
+        self.counts = dict.fromkeys(SENTIMENT_LABELS, 0)
+        self.sums = dict.fromkeys(SENTIMENT_LABELS, 0.0)
+        self.partitions = {label: [] for label in SENTIMENT_LABELS}
+        self.counts.update(counts or {})
+        self.sums.update(sums or {})
+        self.partitions.update(partitions or {})
+        # Per-label weight totals once any rows were weighted (``sums`` are then weighted too)
+        self.weights = dict(weights) if weights is not None else None
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def _weight(self, label):
+        return self.weights[label] if self.weights is not None else self.counts[label]
+
+    def mean(self, label):
+        weight = self._weight(label)
+        return self.sums[label] / weight if weight else 0
+
+    def overall_mean(self):
+        weight = sum(self._weight(label) for label in SENTIMENT_LABELS)
+        return sum(self.sums.values()) / weight if weight else 0.0
+
+    def merge(self, other, keep_partitions=False):
+        if self.weights is not None or other.weights is not None:
+            self.weights = {label: self._weight(label) + other._weight(label) for label in SENTIMENT_LABELS}
+        for label in SENTIMENT_LABELS:
+            self.counts[label] += other.counts[label]
+            self.sums[label] += other.sums[label]
+            if keep_partitions:
+                self.partitions[label].extend(other.partitions[label])
+        return self
+
+    def to_state(self):
+        state = {"counts": dict(self.counts), "sums": dict(self.sums)}
+        if self.weights is not None:
+            state["weights"] = dict(self.weights)
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state['counts'], state['sums'], weights=state.get('weights'))
+
+
+def aggregate_sentiment(df, text_column=None, score_column='sentiment_score', label_column='sentiment',
+                        weight_column=None):
+    """Compute counts, per-label sums/means and text partitions in one groupby.
+
+    ``label_column`` is grouped as a categorical over all sentiment labels, so
+    labels with no rows still come back with a zero count. When
+    ``text_column`` is given, the texts of every label are returned as lists.
+    With a ``weight_column`` the score sums and means are weighted; the
+    counts stay row counts.
+    """
+    labels = df[label_column]
+    if not isinstance(labels.dtype, pd.CategoricalDtype) or tuple(labels.cat.categories) != SENTIMENT_LABELS:
+        labels = labels.astype(pd.CategoricalDtype(SENTIMENT_LABELS))
+
+    grouped = df[score_column].groupby(labels, observed=False)
+    stats = grouped.agg(['count', 'sum'])
+    counts = {label: int(stats.at[label, 'count']) for label in SENTIMENT_LABELS}
+    sums = {label: float(stats.at[label, 'sum']) for label in SENTIMENT_LABELS}
+    weights = None
+    if weight_column is not None:
+        weighted = pd.DataFrame({'weight': df[weight_column], 'score': df[score_column] * df[weight_column]})
+        weighted = weighted.groupby(labels, observed=False).sum()
+        weights = {label: float(weighted.at[label, 'weight']) for label in SENTIMENT_LABELS}
+        sums = {label: float(weighted.at[label, 'score']) for label in SENTIMENT_LABELS}
+
+    partitions = None
+    if text_column is not None:
+        texts = df[text_column].to_numpy()
+        positions = grouped.indices
+        partitions = {label: texts[positions[label]].tolist() if label in positions else []
+                      for label in SENTIMENT_LABELS}
+    return SentimentAggregate(counts, sums, partitions, weights)
+
+
+def _plain(value):
+    """A JSON-serializable Python scalar for a pandas/NumPy cell."""
+    if pd.isna(value):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class GroupedAggregate:
+    """Per-group label counts, score sums and phrase counts for one key column.
+
+    Each chunk is reduced with one groupby over (group, label) and one over
+    the exploded (group, phrase) pairs, so there is no Python loop per group.
+    Partial results from consecutive chunks are summed when the table is read.
+    As in ``SentimentAggregate``, ``weight`` is the weight total of a
+    group's reviews and ``sum`` their weighted score sum.
+    """
+
+    def __init__(self):
+        self._stats = []
+        self._phrases = []
+        self._attributes = []
+
+    def add(self, keys, scores, labels, token_lists=None, attributes=None, weights=None):
+        """Fold one chunk in; ``keys``, ``scores``, ``labels``, ``token_lists`` and ``weights`` are aligned.
+
+        ``attributes`` is an optional frame of per-row values (e.g. brand or
+        price) whose first value per group is kept.
+        """
+        keys = np.asarray(keys, dtype=object)
+        scores = np.asarray(scores, dtype=float)
+        weights = np.ones(len(scores)) if weights is None else np.asarray(weights, dtype=float)
+        frame = pd.DataFrame({
+            'group': keys,
+            'sentiment': pd.Categorical(np.asarray(labels), categories=SENTIMENT_LABELS),
+            'weight': weights,
+            'sum': scores * weights
+        })
+        self._stats.append(
+            frame.groupby(['group', 'sentiment'], observed=True, sort=False)
+            .agg(count=('weight', 'size'), weight=('weight', 'sum'), sum=('sum', 'sum'))
+        )
+        if token_lists is not None:
+            exploded = pd.Series(list(token_lists), index=keys, dtype=object).explode().dropna()
+            if len(exploded):
+                self._phrases.append(exploded.groupby([exploded.index, exploded.to_numpy()], sort=False).size())
+        if attributes is not None:
+            self._attributes.append(attributes.set_axis(keys).groupby(level=0, sort=False).first())
+        if len(self._stats) >= _COMPACT_EVERY:
+            self._compact()
+        return self
+
+    def _compact(self):
+        self._stats = [self._combined(self._stats)]
+        self._phrases = [self._combined(self._phrases)] if self._phrases else []
+        if self._attributes:
+            self._attributes = [pd.concat(self._attributes).groupby(level=0, sort=False).first()]
+
+    @staticmethod
+    def _combined(parts):
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts).groupby(level=[0, 1], observed=True, sort=False).sum()
+
+    def to_state(self):
+        """JSON-friendly rows of the compacted partial results."""
+        if not self._stats:
+            return {"stats": [], "phrases": [], "attributes": None}
+        self._compact()
+        stats = self._stats[0]
+        phrases = self._phrases[0] if self._phrases else None
+        attributes = self._attributes[0] if self._attributes else None
+        return {
+            "stats": [[group, label, int(count), float(total), float(weight)]
+                      for (group, label), count, total, weight
+                      in zip(stats.index, stats['count'], stats['sum'], stats['weight'])],
+            "phrases": [] if phrases is None else [[group, phrase, int(count)]
+                                                   for (group, phrase), count in phrases.items()],
+            "attributes": None if attributes is None else {
+                "columns": list(attributes.columns),
+                "rows": [[group] + [_plain(v) for v in values]
+                         for group, values in zip(attributes.index, attributes.itertuples(index=False))]
+            }
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        grouped = cls()
+        if state['stats']:
+            stats = pd.DataFrame(state['stats'], columns=['group', 'sentiment', 'count', 'sum', 'weight'])
+            stats['sentiment'] = pd.Categorical(stats['sentiment'], categories=SENTIMENT_LABELS)
+            grouped._stats = [stats.set_index(['group', 'sentiment'])]
+        if state['phrases']:
+            phrases = pd.DataFrame(state['phrases'], columns=['group', 'phrase', 'count'])
+            grouped._phrases = [phrases.set_index(['group', 'phrase'])['count']]
+        if state.get('attributes'):
+            columns = state['attributes']['columns']
+            rows = pd.DataFrame(state['attributes']['rows'], columns=['group'] + columns)
+            grouped._attributes = [rows.set_index('group')]
+        return grouped
+
+    def table(self):
+        """One row per group: label counts, total, mean score and per-label means."""
+        if not self._stats:
+            return pd.DataFrame(columns=['total', 'mean'])
+        stats = self._combined(self._stats)
+        counts = stats['count'].unstack(fill_value=0).reindex(columns=list(SENTIMENT_LABELS), fill_value=0)
+        sums = stats['sum'].unstack(fill_value=0.0).reindex(columns=list(SENTIMENT_LABELS), fill_value=0.0)
+        weights = stats['weight'].unstack(fill_value=0.0).reindex(columns=list(SENTIMENT_LABELS), fill_value=0.0)
+        table = counts.astype(int)
+        table['total'] = counts.sum(axis=1)
+        weight_total = weights.sum(axis=1)
+        table['mean'] = (sums.sum(axis=1) / weight_total.where(weight_total > 0)).fillna(0.0)
+        for label in SENTIMENT_LABELS:
+            table[f'mean_{label}'] = (sums[label] / weights[label].where(weights[label] > 0)).fillna(0.0)
+        if self._attributes:
+            attributes = pd.concat(self._attributes).groupby(level=0, sort=False).first()
+            table = table.join(attributes)
+        return table
+
+    def top_phrases(self, groups, k=10):
+        """``{group: [(phrase, count), ...]}`` for the given groups, most frequent first."""
+        if not self._phrases or k <= 0:
+            return {}
+        counts = self._combined(self._phrases)
+        counts = counts[counts.index.get_level_values(0).isin(list(groups))]
+        frame = counts.rename('count').rename_axis(['group', 'phrase']).reset_index()
+        frame = frame.sort_values(['group', 'count', 'phrase'], ascending=[True, False, True], kind='stable')
+        top = frame.groupby('group', sort=False).head(k)
+        return {group: [(phrase, int(count)) for phrase, count in zip(part['phrase'], part['count'])]
+                for group, part in top.groupby('group', sort=False)}
+
+
+class TrendAggregate:
+    """Per-day review counts and score sums, the base of the time-bucketed sentiment trend.
+
+    Each chunk is reduced with one groupby over the calendar day of its
+    reviews; weekly and monthly buckets are resampled from the daily table,
+    so no row is kept. ``weight`` is the weight total of the day's reviews
+    and ``sum`` their weighted score sum, as in ``SentimentAggregate``.
+    """
+
+    def __init__(self):
+        self._days = []
+        self.undated = 0
+
+    def add(self, dates, scores, weights=None):
+        """Fold one chunk in; ``dates`` (NaT when unknown), ``scores`` and ``weights`` are aligned."""
+        dates = pd.DatetimeIndex(dates)
+        scores = np.asarray(scores, dtype=float)
+        weights = np.ones(len(scores)) if weights is None else np.asarray(weights, dtype=float)
+        dated = ~dates.isna()
+        self.undated += int(len(dates) - dated.sum())
+        if dated.any():
+            frame = pd.DataFrame({
+                'count': np.ones(int(dated.sum()), dtype=np.int64),
+                'weight': weights[dated],
+                'sum': scores[dated] * weights[dated]
+            }, index=dates[dated].floor('D'))
+            self._days.append(frame.groupby(level=0, sort=False).sum())
+        if len(self._days) >= _COMPACT_EVERY:
+            self._days = [self.daily()]
+        return self
+
+    def daily(self):
+        """One row per day with reviews: ``count``, ``weight`` and ``sum``, oldest first."""
+        if not self._days:
+            return pd.DataFrame({'count': pd.Series(dtype=np.int64), 'weight': pd.Series(dtype=float),
+                                 'sum': pd.Series(dtype=float)}, index=pd.DatetimeIndex([]))
+        if len(self._days) == 1:
+            return self._days[0].sort_index()
+        return pd.concat(self._days).groupby(level=0).sum()
+
+    @property
+    def dated(self):
+        return int(sum(frame['count'].sum() for frame in self._days))
+
+    def buckets(self, freq):
+        """Counts, weights and score sums resampled to ``freq`` (e.g. 'D', 'W-MON', 'MS'), empty buckets included."""
+        return self.daily().resample(freq, label='left', closed='left').sum()
+
+    def to_state(self):
+        daily = self.daily()
+        self._days = [daily] if len(daily) else []
+        return {
+            "days": [[day.strftime('%Y-%m-%d'), int(count), float(weight), float(total)]
+                     for day, count, weight, total in zip(daily.index, daily['count'], daily['weight'], daily['sum'])],
+            "undated": self.undated
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        trend = cls()
+        if state['days']:
+            days = pd.DataFrame(state['days'], columns=['day', 'count', 'weight', 'sum'])
+            trend._days = [days.set_index(pd.DatetimeIndex(days.pop('day')))]
+        trend.undated = state['undated']
+        return trend
+
+
+# Star ratings a review can carry, and the sentiment each one implies
+RATING_LEVELS = (1, 2, 3, 4, 5)
+_RATING_LABEL_CODES = np.array([1, 1, 2, 0, 0])  # SENTIMENT_LABELS codes for 1..5 stars
+_POSITIVE, _NEGATIVE = SENTIMENT_LABELS.index('positive'), SENTIMENT_LABELS.index('negative')
+
+
+class RatingAggregate:
+    """Star rating and helpful-vote statistics alongside the sentiment labels.
+
+    Keeps a rating x label count matrix, vote-weighted score sums (every
+    review weighs 1 + its helpful votes, times its own weight when the
+    chunk is weighted), weighted score sums per rating and the most-voted
+    reviews whose rating contradicts their text: 4-5 stars with a negative
+    compound score or 1-2 stars with a positive one. All per-chunk work is
+    array arithmetic.
+    """
+
+    def __init__(self, max_examples=5):
+        self.max_examples = max_examples
+        self.matrix = np.zeros((len(RATING_LEVELS), len(SENTIMENT_LABELS)), dtype=np.int64)
+        self.rating_score_sums = np.zeros(len(RATING_LEVELS))
+        self.rating_weight_sums = np.zeros(len(RATING_LEVELS))
+        self.weight_sums = np.zeros(len(SENTIMENT_LABELS))
+        self.weighted_score_sums = np.zeros(len(SENTIMENT_LABELS))
+        self.disagreements = 0
+        self.examples = []
+        self._seen = 0
+
+    def add(self, scores, label_codes, ratings=None, votes=None, texts=None, weights=None):
+        """Fold one chunk in and return its per-review disagreement flags.
+
+        ``weights`` scale every review in the means; the matrix and the
+        disagreement figures stay row counts.
+        """
+        scores = np.asarray(scores, dtype=float)
+        codes = np.asarray(label_codes, dtype=np.int64)
+        n = len(scores)
+
+        review_weights = np.ones(n) if weights is None else np.asarray(weights, dtype=float)
+        vote_weights = np.ones(n)
+        if votes is not None:
+            vote_weights += np.clip(pd.to_numeric(pd.Series(votes), errors='coerce').fillna(0).to_numpy(float),
+                                    0, None)
+        weights = vote_weights * review_weights
+        self.weight_sums += np.bincount(codes, weights=weights, minlength=len(SENTIMENT_LABELS))
+        self.weighted_score_sums += np.bincount(codes, weights=weights * scores, minlength=len(SENTIMENT_LABELS))
+
+        flags = np.zeros(n, dtype=bool)
+        if ratings is not None:
+            stars = np.rint(pd.to_numeric(pd.Series(ratings), errors='coerce').to_numpy(float))
+            rated = (stars >= RATING_LEVELS[0]) & (stars <= RATING_LEVELS[-1])
+            rating_idx = stars[rated].astype(np.int64) - RATING_LEVELS[0]
+            cells = np.bincount(rating_idx * len(SENTIMENT_LABELS) + codes[rated],
+                                minlength=self.matrix.size)
+            self.matrix += cells.reshape(self.matrix.shape)
+            self.rating_score_sums += np.bincount(rating_idx, weights=(scores * review_weights)[rated],
+                                                  minlength=len(RATING_LEVELS))
+            self.rating_weight_sums += np.bincount(rating_idx, weights=review_weights[rated],
+                                                   minlength=len(RATING_LEVELS))
+            flags[rated] = (((stars[rated] >= 4) & (codes[rated] == _NEGATIVE))
+                            | ((stars[rated] <= 2) & (codes[rated] == _POSITIVE)))
+            self.disagreements += int(flags.sum())
+            if texts is not None and flags.any():
+                self._keep_examples(np.flatnonzero(flags), vote_weights, stars, scores, texts)
+        self._seen += n
+        return flags
+
+    def _keep_examples(self, positions, weights, stars, scores, texts):
+        texts = list(texts)
+        # Most helpful first; earlier reviews win ties
+        candidates = [(float(weights[i]), -(self._seen + int(i)), i) for i in positions]
+        for weight, order, i in heapq.nlargest(self.max_examples, candidates):
+            self.examples.append((weight, order, {
+                "review": str(texts[i])[:300],
+                "rating": int(stars[i]),
+                "sentiment_score": float(scores[i]),
+                "votes": int(weight - 1)
+            }))
+        self.examples = heapq.nlargest(self.max_examples, self.examples, key=lambda e: e[:2])
+
+    def merge(self, other):
+        self.matrix += other.matrix
+        self.rating_score_sums += other.rating_score_sums
+        self.rating_weight_sums += other.rating_weight_sums
+        self.weight_sums += other.weight_sums
+        self.weighted_score_sums += other.weighted_score_sums
+        self.disagreements += other.disagreements
+        self.examples = heapq.nlargest(self.max_examples, self.examples + other.examples, key=lambda e: e[:2])
+        self._seen += other._seen
+        return self
+
+    def to_state(self):
+        return {
+            "max_examples": self.max_examples,
+            "matrix": self.matrix.tolist(),
+            "rating_score_sums": self.rating_score_sums.tolist(),
+            "rating_weight_sums": self.rating_weight_sums.tolist(),
+            "weight_sums": self.weight_sums.tolist(),
+            "weighted_score_sums": self.weighted_score_sums.tolist(),
+            "disagreements": self.disagreements,
+            "examples": [[weight, order, example] for weight, order, example in self.examples],
+            "seen": self._seen
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        ratings = cls(state['max_examples'])
+        ratings.matrix = np.array(state['matrix'], dtype=np.int64)
+        ratings.rating_score_sums = np.array(state['rating_score_sums'], dtype=float)
+        ratings.rating_weight_sums = np.array(state['rating_weight_sums'], dtype=float)
+        ratings.weight_sums = np.array(state['weight_sums'], dtype=float)
+        ratings.weighted_score_sums = np.array(state['weighted_score_sums'], dtype=float)
+        ratings.disagreements = state['disagreements']
+        ratings.examples = [tuple(example) for example in state['examples']]
+        ratings._seen = state['seen']
+        return ratings
+
+    @property
+    def rated(self):
+        return int(self.matrix.sum())
+
+    def weighted_mean(self, label=None):
+        if label is None:
+            total = self.weight_sums.sum()
+            return float(self.weighted_score_sums.sum() / total) if total else 0.0
+        i = SENTIMENT_LABELS.index(label)
+        return float(self.weighted_score_sums[i] / self.weight_sums[i]) if self.weight_sums[i] else 0.0
+
+    def agreement_rate(self):
+        """Share of rated reviews whose label matches the sentiment their stars imply."""
+        if not self.rated:
+            return 0.0
+        agreeing = self.matrix[np.arange(len(RATING_LEVELS)), _RATING_LABEL_CODES].sum()
+        return float(agreeing / self.rated)
@@ -1,19 +1,69 @@
+import logging
+import os
 
+import numpy as np
 import pandas as pd
-from collections import Counter
-from app.utils.nlp_processor import analyze_sentiment, extract_common_phrases
+from app.services.metrics import metrics
+from app.utils.nlp_processor import (
+    analyze_sentiment, extract_common_phrases, sentiment_scores, phrase_counts, cached_scores_and_tokens, get_stop_words
+)
+from app.utils.phrase_engine import PhraseCounter, make_ngrams, tokenize
+from app.utils.sentiment_engine import SENTIMENT_LABELS, label_sentiments
+from app.services.aggregation import (
+    RATING_LEVELS, SentimentAggregate, GroupedAggregate, RatingAggregate, TrendAggregate, aggregate_sentiment
+)
+from app.services.ingestion import (
+    FALLBACK_ENCODING, detect_encoding, read_csv_columns, iter_csv_chunks, clean_review_chunk, parse_dates
+)
+from app.services.result_cache import ANALYSIS_VERSION
 from app.services.visualization import prepare_chart_data
 
-def analyze_reviews(df, text_column='Reviews'):
+PRODUCT_NAME_COLUMNS = ['Product Name', 'ProductName', 'product_name', 'Product', 'Name']
+BRAND_NAME_COLUMNS = ['Brand Name', 'BrandName', 'brand_name', 'Brand', 'Manufacturer']
+PRICE_COLUMNS = ['Price', 'price', 'Cost', 'cost']
+RATING_COLUMNS = ['Rating', 'rating', 'Stars', 'stars', 'Star Rating']
+VOTE_COLUMNS = ['Review Votes', 'ReviewVotes', 'review_votes', 'Helpful Votes', 'helpful_votes', 'Votes']
+DATE_COLUMNS = ['Review Date', 'ReviewDate', 'review_date', 'Date', 'date', 'Timestamp', 'timestamp', 'Time']
+
+# Time-bucketed trend: bucket sizes, smoothing spans (in buckets) and the fewest
+# non-empty buckets a direction is read from
+TREND_FREQUENCIES = {'daily': 'D', 'weekly': 'W-MON', 'monthly': 'MS'}
+TREND_UNITS = {'daily': 'day', 'weekly': 'week', 'monthly': 'month'}
+TREND_EWMA_SPAN = 4
+TREND_ROLLING_WINDOW = 4
+TREND_MIN_BUCKETS = 3
+# Points returned per series; the most recent ones are kept
+TREND_MAX_POINTS = 366
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisError(Exception):
+    """An upload that cannot be analyzed; carries the HTTP status and extra response fields."""
+
+    def __init__(self, message, status_code=400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.extra = extra
+
+    def to_dict(self):
+        payload = {"error": self.message}
+        payload.update(self.extra)
+        payload["success"] = False
+        return payload
+
+
+def analyze_reviews(df, text_column='Reviews', workers=0, chunk_size=5000):
     # Sentiment analysis
-    df = analyze_sentiment(df, text_column)
-    
+    df = analyze_sentiment(df, text_column, workers=workers, chunk_size=chunk_size)
+
     # Common phrases extraction
-    common_phrases = extract_common_phrases(df[text_column].tolist())
-    
+    common_phrases = extract_common_phrases(df[text_column].tolist(), workers=workers, chunk_size=chunk_size)
+
     # Visualization data preparation
-    chart_data = prepare_chart_data(df)
-    
+    chart_data = prepare_chart_data(df, aggregate_sentiment(df))
+
     return {
         "mean_positive": chart_data['sentiment']['means'][0],
         "mean_negative": chart_data['sentiment']['means'][1],
@@ -22,3 +72,733 @@ def analyze_reviews(df, text_column='Reviews'):
         "common_phrases": common_phrases,
         "chart_data": chart_data
     }
+
+
+def format_price(val):
+    try:
+        price_val = float(str(val).replace('$', '').replace(',', ''))
+        return f"${price_val:.2f}"
+    except:
+        return str(val)
+
+
+def first_present(columns, candidates):
+    return next((col for col in candidates if col in columns), None)
+
+
+def extract_product_info(df):
+    """Read product name, brand and price from the first row of ``df``."""
+    product_info = {}
+
+    for col_name in PRODUCT_NAME_COLUMNS:
+        if col_name in df.columns and len(df) > 0:
+            val = df[col_name].iloc[0]
+            if pd.notna(val) and str(val).strip():
+                product_info['Product Name'] = str(val).strip()
+                break
+
+    for col_name in BRAND_NAME_COLUMNS:
+        if col_name in df.columns and len(df) > 0:
+            val = df[col_name].iloc[0]
+            if pd.notna(val) and str(val).strip():
+                product_info['Brand Name'] = str(val).strip()
+                break
+
+    for col_name in PRICE_COLUMNS:
+        if col_name in df.columns and len(df) > 0:
+            val = df[col_name].iloc[0]
+            if pd.notna(val):
+                product_info['Price'] = format_price(val)
+                break
+
+    # Set defaults if not found
+    product_info.setdefault('Product Name', 'Unknown Product')
+    product_info.setdefault('Brand Name', 'Unknown Brand')
+    product_info.setdefault('Price', 'N/A')
+    return product_info
+
+
+def sales_trend_from_sentiment(overall_sentiment):
+    if overall_sentiment > 0.05:
+        trend = 'Up'
+        message = "Customers are mostly satisfied, so the product is likely to sell well."
+    elif overall_sentiment < -0.05:
+        trend = 'Down'
+        message = "Many customers are unhappy, which may reduce future sales."
+    else:
+        trend = 'Stable'
+        message = "Customer opinions are mixed, so sales are expected to stay the same."
+
+    return {
+        "avg_sentiment": round(overall_sentiment, 3),
+        "trend": trend,
+        "message": message
+    }
+
+
+def _trend_table(trend, freq):
+    """Buckets of ``trend`` at ``freq`` with their mean, count-weighted EWMA and rolling mean."""
+    table = trend.buckets(freq)
+    weights = table['weight']
+    table['mean'] = table['sum'] / weights.where(weights > 0)
+    # Smoothing sums and weights separately keeps thin buckets from swinging the line
+    table['ewma'] = (table['sum'].ewm(span=TREND_EWMA_SPAN).mean()
+                     / weights.ewm(span=TREND_EWMA_SPAN).mean().where(lambda w: w > 0))
+    rolling = table[['sum', 'weight']].rolling(TREND_ROLLING_WINDOW, min_periods=1).sum()
+    table['rolling_mean'] = rolling['sum'] / rolling['weight'].where(rolling['weight'] > 0)
+    return table
+
+
+def _weighted_slope(table):
+    """Least-squares change of the bucket mean per bucket, weighting buckets by their review weight."""
+    filled = table['weight'].to_numpy() > 0
+    x = np.flatnonzero(filled).astype(float)
+    y = table['mean'].to_numpy()[filled]
+    w = table['weight'].to_numpy()[filled]
+    x_mean = np.average(x, weights=w)
+    spread = np.sum(w * (x - x_mean) ** 2)
+    if spread == 0:
+        return 0.0
+    return float(np.sum(w * (x - x_mean) * (y - np.average(y, weights=w))) / spread)
+
+
+def _plain_float(value, digits=4):
+    return round(float(value), digits) if pd.notna(value) else None
+
+
+def build_trend_response(trend, date_column):
+    """Daily, weekly and monthly sentiment series and the direction of the trend.
+
+    The direction is read at the coarsest granularity that suits the time
+    span covered and still has ``TREND_MIN_BUCKETS`` buckets with reviews:
+    the weighted least-squares slope of the bucket means, times the number
+    of buckets, is the change over the whole span. It is None when there
+    are too few dated reviews to tell.
+    """
+    tables = {name: _trend_table(trend, freq) for name, freq in TREND_FREQUENCIES.items()}
+    daily = tables['daily']
+    start, end = daily.index[0], daily.index[-1]
+    span_days = (end - start).days
+    preferred = 'monthly' if span_days > 180 else 'weekly' if span_days > 28 else 'daily'
+    candidates = list(TREND_FREQUENCIES)[::-1]
+    granularity = next((name for name in candidates[candidates.index(preferred):]
+                        if (tables[name]['weight'] > 0).sum() >= TREND_MIN_BUCKETS), None)
+
+    report = {
+        "date_column": date_column,
+        "dated_reviews": trend.dated,
+        "undated_reviews": trend.undated,
+        "start": start.strftime('%Y-%m-%d'),
+        "end": end.strftime('%Y-%m-%d'),
+        "granularity": granularity,
+        "direction": None,
+        "series": {
+            name: [{
+                "period": period.strftime('%Y-%m-%d'),
+                "reviews": int(row.count),
+                "mean": _plain_float(row.mean),
+                "ewma": _plain_float(row.ewma),
+                "rolling_mean": _plain_float(row.rolling_mean)
+            } for period, row in zip(table.index[-TREND_MAX_POINTS:],
+                                     table.tail(TREND_MAX_POINTS).itertuples(index=False))]
+            for name, table in tables.items()
+        }
+    }
+    if granularity is not None:
+        table = tables[granularity]
+        slope = _weighted_slope(table)
+        change = slope * (len(table) - 1)
+        report.update(
+            buckets=len(table),
+            slope=round(slope, 5),
+            change=round(change, 4),
+            ewma=_plain_float(table['ewma'].iloc[-1]),
+            direction='Up' if change > 0.05 else 'Down' if change < -0.05 else 'Stable'
+        )
+    return report
+
+
+def sales_trend_from_series(trend_report, overall_sentiment):
+    """``sales_trend`` read from the dated sentiment series instead of the overall mean."""
+    granularity = trend_report['granularity']
+    unit = TREND_UNITS[granularity]
+    buckets = trend_report['buckets']
+    change = trend_report['change']
+    recent = trend_report['ewma']
+    if trend_report['direction'] == 'Up':
+        message = (f"Sentiment is improving: the {granularity} average rose by {change:.2f} over {buckets} "
+                   f"{unit}s (recent level {recent:.2f}), so sales are likely to grow.")
+    elif trend_report['direction'] == 'Down':
+        message = (f"Sentiment is declining: the {granularity} average fell by {abs(change):.2f} over {buckets} "
+                   f"{unit}s (recent level {recent:.2f}), which may reduce future sales.")
+    else:
+        message = (f"Sentiment has held steady around {recent:.2f} over {buckets} {unit}s, "
+                   "so sales are expected to stay the same.")
+    return {
+        "avg_sentiment": round(overall_sentiment, 3),
+        "trend": trend_report['direction'],
+        "message": message,
+        "recent_sentiment": recent,
+        "slope": trend_report['slope'],
+        "granularity": granularity,
+        "source": "time_series"
+    }
+
+
+def build_upload_response(product_info, aggregate, phrases=None, top_k=10, trend_report=None):
+    """Assemble the /api/upload payload from the accumulated results.
+
+    With a ``trend_report`` that has a direction, ``sales_trend`` follows the
+    dated series; otherwise it is read from the overall mean.
+    """
+    common_phrases = phrases.top(top_k) if phrases is not None else []
+    positive_phrases = phrases.top(top_k, 'positive') if phrases is not None else []
+    negative_phrases = phrases.top(top_k, 'negative') if phrases is not None else []
+    pos_count = aggregate.counts['positive']
+    neg_count = aggregate.counts['negative']
+    neu_count = aggregate.counts['neutral']
+    pos_mean = float(aggregate.mean('positive'))
+    neg_mean = float(aggregate.mean('negative'))
+    overall_sentiment = float(aggregate.overall_mean())
+
+    chart_data = {
+        "sentiment": {
+            "labels": ["Positive", "Negative"],
+            "means": [pos_mean, abs(neg_mean)]  # Make negative mean positive for display
+        },
+        "distribution": {
+            "labels": ["Positive", "Neutral", "Negative"],
+            "values": [int(pos_count), int(neu_count), int(neg_count)]
+        },
+        "counts": {
+            "labels": ["Total Reviews"],
+            "values": [int(aggregate.total)]
+        }
+    }
+
+    return {
+        "success": True,
+        "chart_data": chart_data,
+        "product_info": product_info,
+        "common_phrases": common_phrases,
+        "negative_phrases": negative_phrases,
+        "positive_phrases": positive_phrases,
+        "sentiment_score": overall_sentiment,
+        "sales_trend": sales_trend_from_series(trend_report, overall_sentiment)
+        if trend_report is not None and trend_report['direction'] is not None
+        else sales_trend_from_sentiment(overall_sentiment),
+        "stats": {
+            "total_reviews": int(aggregate.total),
+            "positive_reviews": int(pos_count),
+            "negative_reviews": int(neg_count),
+            "neutral_reviews": int(neu_count)
+        }
+    }
+
+
+def build_rating_response(ratings, has_ratings=True, has_votes=True):
+    """Vote-weighted means and rating/sentiment agreement for the /api/upload payload."""
+    rated = ratings.rated
+    order = [SENTIMENT_LABELS.index(label) for label in ('positive', 'neutral', 'negative')]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rating_means = ratings.rating_score_sums / ratings.rating_weight_sums
+    return {
+        "has_ratings": has_ratings,
+        "has_votes": has_votes,
+        "vote_weighted_sentiment": ratings.weighted_mean(),
+        "vote_weighted_means": {
+            "positive": ratings.weighted_mean('positive'),
+            "negative": ratings.weighted_mean('negative')
+        },
+        "rated_reviews": rated,
+        "agreement_rate": round(ratings.agreement_rate(), 4),
+        "disagreement_count": ratings.disagreements,
+        "disagreement_rate": round(ratings.disagreements / rated, 4) if rated else 0.0,
+        "matrix": {
+            "ratings": list(RATING_LEVELS),
+            "labels": ["Positive", "Neutral", "Negative"],
+            "values": ratings.matrix[:, order].tolist()
+        },
+        "mean_sentiment_by_rating": [float(mean) if np.isfinite(mean) else None for mean in rating_means],
+        "disagreements": [example for _, _, example in ratings.examples]
+    }
+
+
+class ProductGroups:
+    """Per-product and per-brand aggregates for multi-product uploads."""
+
+    def __init__(self, products=None, brands=None):
+        self.products = products or GroupedAggregate()
+        self.brands = brands or GroupedAggregate()
+        self.bind([])
+
+    def bind(self, columns):
+        """Resolve the product, brand and price columns of the file being read."""
+        self.product_column = first_present(columns, PRODUCT_NAME_COLUMNS)
+        self.brand_column = first_present(columns, BRAND_NAME_COLUMNS)
+        self.price_column = first_present(columns, PRICE_COLUMNS)
+
+    @staticmethod
+    def _keys(chunk, column, default):
+        if column is None:
+            return pd.Series(default, index=chunk.index, dtype=object)
+        keys = chunk[column].astype(str).str.strip()
+        return keys.where(chunk[column].notna() & (keys != ''), default)
+
+    def add(self, chunk, scores, labels, token_lists, weights=None):
+        products = self._keys(chunk, self.product_column, 'Unknown Product')
+        brands = self._keys(chunk, self.brand_column, 'Unknown Brand')
+        attributes = pd.DataFrame({'brand': brands.to_numpy()})
+        if self.price_column is not None:
+            attributes['price'] = chunk[self.price_column].to_numpy()
+        self.products.add(products, scores, labels, token_lists, attributes, weights)
+        self.brands.add(brands, scores, labels, token_lists, weights=weights)
+
+    def to_state(self):
+        return {"products": self.products.to_state(), "brands": self.brands.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(GroupedAggregate.from_state(state['products']), GroupedAggregate.from_state(state['brands']))
+
+
+class AnalysisState:
+    """Running aggregates of one dataset; everything needed to rebuild its payload.
+
+    A new upload starts from an empty state. Appending rows to a stored
+    dataset loads its saved state and folds only the new rows into it.
+    """
+
+    def __init__(self, text_column='Reviews', ngram_range=(1, 1), top_k=10, group_options=None, date_column=None):
+        self.text_column = text_column
+        # Requested date column; without one a DATE_COLUMNS match is used when the file has it
+        self.date_column = date_column
+        self.ngram_range = tuple(ngram_range)
+        self.top_k = top_k
+        self.group_options = group_options
+        self.aggregate = SentimentAggregate()
+        self.phrases = PhraseCounter(get_stop_words(), ngram_range)
+        self.phrases_ok = True
+        self.groups = ProductGroups() if group_options is not None else None
+        self.ratings = None
+        self.has_ratings = False
+        self.has_votes = False
+        self.trend = None
+        self.trend_column = None
+        self.product_info = None
+        self.sample_reviews = []
+        self.rows_in = 0
+
+    def to_state(self):
+        return {
+            "text_column": self.text_column,
+            "ngram_range": list(self.ngram_range),
+            "top_k": self.top_k,
+            "group_options": self.group_options,
+            "aggregate": self.aggregate.to_state(),
+            "phrases": self.phrases.to_state() if self.phrases_ok else None,
+            "groups": self.groups.to_state() if self.groups is not None else None,
+            "ratings": self.ratings.to_state() if self.ratings is not None else None,
+            "has_ratings": self.has_ratings,
+            "has_votes": self.has_votes,
+            "date_column": self.date_column,
+            "trend": self.trend.to_state() if self.trend is not None else None,
+            "trend_column": self.trend_column,
+            "product_info": self.product_info,
+            "sample_reviews": self.sample_reviews,
+            "rows_in": self.rows_in,
+            "version": ANALYSIS_VERSION
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        analysis = cls(state['text_column'], state['ngram_range'], state['top_k'], state['group_options'],
+                       state.get('date_column'))
+        analysis.aggregate = SentimentAggregate.from_state(state['aggregate'])
+        if state['phrases'] is None:
+            analysis.phrases_ok = False
+        else:
+            analysis.phrases = PhraseCounter.from_state(state['phrases'], get_stop_words())
+        if state['groups'] is not None:
+            analysis.groups = ProductGroups.from_state(state['groups'])
+        if state['ratings'] is not None:
+            analysis.ratings = RatingAggregate.from_state(state['ratings'])
+        analysis.has_ratings = state['has_ratings']
+        analysis.has_votes = state['has_votes']
+        if state.get('trend') is not None:
+            analysis.trend = TrendAggregate.from_state(state['trend'])
+        analysis.trend_column = state.get('trend_column')
+        analysis.product_info = state['product_info']
+        analysis.sample_reviews = state['sample_reviews']
+        analysis.rows_in = state['rows_in']
+        return analysis
+
+    @staticmethod
+    def is_current(state):
+        """Whether a saved state was written by this analysis version and can be loaded."""
+        return state.get('version') == ANALYSIS_VERSION
+
+    def restore(self, state):
+        """Reset this object to a saved ``to_state`` snapshot."""
+        self.__dict__.update(AnalysisState.from_state(state).__dict__)
+
+
+def _group_entries(aggregate, table, top_k, max_groups):
+    table = table.sort_values('total', ascending=False, kind='stable').head(max_groups)
+    phrases = aggregate.top_phrases(table.index, top_k)
+    entries = []
+    for name, row in table.iterrows():
+        mean = float(row['mean'])
+        entries.append({
+            "name": name,
+            "reviews": int(row['total']),
+            "distribution": {label: int(row[label]) for label in ('positive', 'neutral', 'negative')},
+            "sentiment_score": mean,
+            "mean_positive": float(row['mean_positive']),
+            "mean_negative": float(row['mean_negative']),
+            "trend": sales_trend_from_sentiment(mean)['trend'],
+            "top_phrases": phrases.get(name, [])
+        })
+    return entries
+
+
+def build_group_response(groups, top_k=5, max_groups=1000):
+    """Per-product and per-brand summaries, largest groups first."""
+    product_table = groups.products.table()
+    brand_table = groups.brands.table()
+
+    products = _group_entries(groups.products, product_table, top_k, max_groups)
+    for entry in products:
+        row = product_table.loc[entry['name']]
+        entry['brand'] = row['brand']
+        if 'price' in product_table.columns:
+            entry['price'] = format_price(row['price']) if pd.notna(row['price']) else 'N/A'
+
+    brands = _group_entries(groups.brands, brand_table, top_k, max_groups)
+    product_counts = product_table['brand'].value_counts() if len(product_table) else pd.Series(dtype=int)
+    for entry in brands:
+        entry['products'] = int(product_counts.get(entry['name'], 0))
+
+    return {
+        "product_count": len(product_table),
+        "brand_count": len(brand_table),
+        "products": products,
+        "brands": brands
+    }
+
+
+def _missing_reviews_error(columns, text_column):
+    potential_review_cols = [col for col in columns if 'review' in col.lower() or 'comment' in col.lower() or 'feedback' in col.lower()]
+    if potential_review_cols:
+        logger.debug("Potential review columns found: %s", potential_review_cols)
+        return AnalysisError(
+            f"Missing '{text_column}' column. Found potential columns: {', '.join(potential_review_cols)}",
+            available_columns=columns
+        )
+    return AnalysisError(f"Missing required '{text_column}' column", available_columns=columns)
+
+
+def _duplicate_weights(file_path, encoding, chunk_size, text_column, duplicates, progress):
+    """Cluster every review of the CSV; the first pass of the ``downweight`` mode.
+
+    Returns one weight and one representative flag per cleaned review, in
+    stream order. The k reviews of a cluster the file starts weigh 1/k
+    each, so the cluster counts once. A review joining a cluster from an
+    earlier append weighs 0, as that cluster has counted once already;
+    short reviews weigh 1.
+    """
+    bytes_total = os.path.getsize(file_path)
+    first_cluster = len(duplicates.sizes)
+    representatives, clusters = [], []
+    rows = 0
+    chunks = iter_csv_chunks(file_path, encoding, chunk_size)
+    while True:
+        with metrics.timer('analysis_stage_seconds', stage='csv_parse'):
+            chunk, bytes_read = next(chunks, (None, bytes_total))
+        if chunk is None:
+            break
+        rows += len(chunk)
+        with metrics.timer('analysis_stage_seconds', stage='cleaning'):
+            _, texts = clean_review_chunk(chunk, text_column)
+        with metrics.timer('analysis_stage_seconds', stage='dedup'):
+            is_copy, chunk_clusters = duplicates.add(texts)
+        metrics.inc('analysis_rows_duplicate_total', int(is_copy.sum()))
+        representatives.append(~is_copy)
+        clusters.append(chunk_clusters)
+        progress('deduplicating', rows, bytes_read, bytes_total)
+    representatives = np.concatenate(representatives) if representatives else np.zeros(0, dtype=bool)
+    clusters = np.concatenate(clusters) if clusters else np.zeros(0, dtype=np.int64)
+    weights = np.where(clusters >= 0, 0.0, 1.0)
+    new = clusters >= first_cluster
+    sizes = np.bincount(clusters[new] - first_cluster)
+    weights[new] = 1.0 / sizes[clusters[new] - first_cluster]
+    return weights, representatives
+
+
+def _fold_csv_stream(state, file_path, encoding, chunk_size, workers, worker_chunk_size,
+                     score_store, dataset_writer, review_index, duplicates, progress):
+    """Clean, score and aggregate every chunk of the CSV into ``state``."""
+    text_column = state.text_column
+    bytes_total = os.path.getsize(file_path)
+    bytes_read = 0
+    progress('reading', 0, bytes_read, bytes_total)
+    try:
+        columns = read_csv_columns(file_path, encoding)
+    except UnicodeDecodeError:
+        raise
+    except Exception as e:
+        raise AnalysisError(f"Failed to read CSV: {str(e)}")
+
+    logger.debug("CSV columns (%s): %s", encoding, columns)
+    if text_column not in columns:
+        logger.info("Missing required column %r", text_column)
+        raise _missing_reviews_error(columns, text_column)
+
+    aggregate = state.aggregate
+    phrases = state.phrases
+    groups = state.groups
+    if groups is not None:
+        groups.bind(columns)
+    rating_column = first_present(columns, RATING_COLUMNS)
+    vote_column = first_present(columns, VOTE_COLUMNS)
+    if (rating_column or vote_column) and state.ratings is None:
+        state.ratings = RatingAggregate()
+    state.has_ratings = state.has_ratings or bool(rating_column)
+    state.has_votes = state.has_votes or bool(vote_column)
+    ratings = state.ratings
+    if state.date_column is not None and state.date_column not in columns:
+        raise AnalysisError(f"Missing date column '{state.date_column}'", available_columns=columns)
+    date_column = state.date_column or first_present(columns, DATE_COLUMNS)
+    if date_column is not None:
+        state.trend_column = date_column
+        if state.trend is None:
+            state.trend = TrendAggregate()
+    trend = state.trend if date_column is not None else None
+    ngram_range = state.ngram_range
+    sample_reviews = state.sample_reviews
+    original_count = 0
+    cleaned_count = 0
+
+    try:
+        dedup_weights = None
+        if duplicates is not None and duplicates.mode == 'downweight':
+            # Cluster sizes are only known at the end of the file, so it is read twice
+            dedup_weights, dedup_representatives = _duplicate_weights(
+                file_path, encoding, chunk_size, text_column, duplicates, progress
+            )
+        chunks = iter_csv_chunks(file_path, encoding, chunk_size)
+        while True:
+            with metrics.timer('analysis_stage_seconds', stage='csv_parse'):
+                chunk, bytes_read = next(chunks, (None, bytes_total))
+            if chunk is None:
+                break
+            original_count += len(chunk)
+            metrics.inc('analysis_rows_in_total', len(chunk))
+
+            with metrics.timer('analysis_stage_seconds', stage='cleaning'):
+                chunk, texts = clean_review_chunk(chunk, text_column)
+            metrics.inc('analysis_rows_cleaned_total', len(texts))
+            if texts.empty:
+                progress('analyzing', original_count, bytes_read, bytes_total)
+                continue
+
+            weights = representative = None
+            if dedup_weights is not None:
+                weights = dedup_weights[cleaned_count:cleaned_count + len(texts)]
+                representative = dedup_representatives[cleaned_count:cleaned_count + len(texts)]
+            elif duplicates is not None:
+                with metrics.timer('analysis_stage_seconds', stage='dedup'):
+                    is_copy, _ = duplicates.add(texts)
+                metrics.inc('analysis_rows_duplicate_total', int(is_copy.sum()))
+                if duplicates.mode == 'exclude':
+                    # Copies are never scored, stored or counted
+                    chunk, texts = chunk[~is_copy], texts[~is_copy]
+                    if texts.empty:
+                        progress('analyzing', original_count, bytes_read, bytes_total)
+                        continue
+            cleaned_count += len(texts)
+
+            if state.product_info is None:
+                state.product_info = extract_product_info(chunk)
+            if len(sample_reviews) < 50:
+                sample_reviews.extend(texts.head(50 - len(sample_reviews)).tolist())
+
+            token_lists = None
+            with metrics.timer('analysis_stage_seconds', stage='scoring'):
+                if score_store is not None:
+                    scores, token_lists = cached_scores_and_tokens(
+                        texts.tolist(), score_store, workers=workers, chunk_size=worker_chunk_size
+                    )
+                else:
+                    scores = sentiment_scores(texts, workers=workers, chunk_size=worker_chunk_size)
+                scored = pd.DataFrame({
+                    'sentiment_score': scores,
+                    'sentiment': label_sentiments(scores)
+                })
+            with metrics.timer('analysis_stage_seconds', stage='aggregation'):
+                if weights is not None:
+                    scored['weight'] = weights
+                    aggregate.merge(aggregate_sentiment(scored, weight_column='weight'))
+                else:
+                    aggregate.merge(aggregate_sentiment(scored))
+            if trend is not None:
+                with metrics.timer('analysis_stage_seconds', stage='trend'):
+                    trend.add(parse_dates(chunk[date_column]), scores, weights)
+            flags = None
+            if ratings is not None:
+                with metrics.timer('analysis_stage_seconds', stage='ratings'):
+                    flags = ratings.add(
+                        scores, scored['sentiment'].cat.codes,
+                        ratings=chunk[rating_column] if rating_column else None,
+                        votes=chunk[vote_column] if vote_column else None,
+                        texts=texts,
+                        weights=weights
+                    )
+                    if not rating_column:
+                        flags = None
+            if dataset_writer is not None:
+                with metrics.timer('analysis_stage_seconds', stage='persist'):
+                    dataset_writer.write(chunk, scores, scored['sentiment'], flags)
+            if token_lists is None and (groups is not None or review_index is not None):
+                # Tokenize once and share the tokens with the index, groups and phrase counter
+                with metrics.timer('analysis_stage_seconds', stage='tokenizing'):
+                    stop_words = phrases.stop_words
+                    token_lists = [tokenize(text, stop_words) for text in texts]
+            if review_index is not None:
+                with metrics.timer('analysis_stage_seconds', stage='indexing'):
+                    review_index.add_tokens(token_lists)
+            if groups is not None:
+                with metrics.timer('analysis_stage_seconds', stage='grouping'):
+                    ngram_lists = [make_ngrams(tokens, ngram_range) for tokens in token_lists]
+                    if representative is not None:
+                        # Phrases count each near-duplicate cluster once, through its representative
+                        ngram_lists = [ngrams if keep else [] for ngrams, keep in zip(ngram_lists, representative)]
+                    groups.add(chunk, scores, scored['sentiment'], ngram_lists, weights)
+
+            if state.phrases_ok:
+                phrase_tokens, phrase_texts, phrase_labels = token_lists, texts, scored['sentiment']
+                if representative is not None:
+                    phrase_texts, phrase_labels = texts[representative], phrase_labels[representative]
+                    if token_lists is not None:
+                        phrase_tokens = [tokens for tokens, keep in zip(token_lists, representative) if keep]
+                try:
+                    with metrics.timer('analysis_stage_seconds', stage='phrase_extraction'):
+                        if phrase_tokens is not None:
+                            phrases.add_tokens(phrase_tokens, phrase_labels)
+                        else:
+                            phrase_counts(
+                                phrase_texts.tolist(), labels=phrase_labels, workers=workers,
+                                chunk_size=worker_chunk_size, ngram_range=ngram_range, into=phrases
+                            )
+                except Exception as e:
+                    logger.warning("Error extracting phrases: %s", e)
+                    state.phrases_ok = False
+            progress('analyzing', original_count, bytes_read, bytes_total)
+    except UnicodeDecodeError:
+        raise
+    except pd.errors.ParserError as e:
+        raise AnalysisError(f"Failed to read CSV: {str(e)}")
+
+    state.rows_in += original_count
+    logger.info("Data cleaned: %d rows remaining (from %d)", cleaned_count, original_count)
+    if cleaned_count == 0:
+        raise AnalysisError("No valid reviews found after cleaning")
+    progress('finalizing', original_count, bytes_total, bytes_total)
+    return cleaned_count
+
+
+def build_state_response(state):
+    """The /api/upload payload and chatbot context for everything folded into ``state``."""
+    with metrics.timer('analysis_stage_seconds', stage='response'):
+        trend_report = None
+        if state.trend is not None and state.trend.dated:
+            trend_report = build_trend_response(state.trend, state.trend_column)
+        response_data = build_upload_response(
+            state.product_info, state.aggregate, state.phrases if state.phrases_ok else None, state.top_k,
+            trend_report
+        )
+        if trend_report is not None:
+            response_data['sentiment_trend'] = trend_report
+        if state.groups is not None:
+            response_data['groups'] = build_group_response(state.groups, **state.group_options)
+        if state.ratings is not None:
+            response_data['ratings'] = build_rating_response(state.ratings, state.has_ratings, state.has_votes)
+    context = {
+        "reviews": list(state.sample_reviews),
+        "text_column": state.text_column,
+        "product_info": state.product_info,
+        # Precomputed figures the chatbot answers count and sentiment questions from
+        "summary": {
+            name: response_data[name] for name in (
+                'stats', 'sentiment_score', 'sales_trend', 'common_phrases', 'positive_phrases', 'negative_phrases'
+            )
+        }
+    }
+    return response_data, context
+
+
+def _no_progress(stage, rows_processed, bytes_read=None, bytes_total=None):
+    pass
+
+
+def analyze_csv_file(file_path, text_column='Reviews', chunk_size=20000, workers=0,
+                     worker_chunk_size=5000, sample_size=64 * 1024, ngram_range=(1, 1), top_k=10,
+                     score_store=None, dataset_writer=None, group_options=None, state=None, progress=None,
+                     review_index=None, duplicates=None, date_column=None):
+    """Analyze an uploaded CSV in streaming chunks.
+
+    Peak memory is bounded by ``chunk_size`` rows: every chunk is cleaned,
+    scored and phrase-counted, then folded into a running SentimentAggregate
+    and PhraseCounter. Returns the /api/upload response payload and the
+    chatbot context; raises ``AnalysisError`` for files that cannot be
+    analyzed.
+
+    With a ``score_store``, reviews scored by any earlier upload reuse their
+    stored score and tokens. With a ``dataset_writer``, the cleaned rows and
+    their scores are written out chunk by chunk; the caller closes it.
+    ``group_options`` (``{'top_k': ..., 'max_groups': ...}``) switches on the
+    multi-product mode, which adds per-product and per-brand summaries under
+    ``groups``. Reviews with a date (``date_column``, or the first
+    ``DATE_COLUMNS`` match) are bucketed by day, week and month into
+    ``sentiment_trend``, and ``sales_trend`` then follows that series.
+
+    Pass an ``AnalysisState`` as ``state`` to fold the file into existing
+    aggregates (its own text column, n-grams and grouping then apply); the
+    state is updated in place, so the caller can persist it afterwards.
+    ``progress(stage, rows_processed, bytes_read, bytes_total)`` is called as
+    the stream advances; the bytes give the share of the file done.
+    A ``review_index`` (``ReviewIndex``) gets one row per cleaned review, in
+    the order they are written to ``dataset_writer``. A ``duplicates``
+    detector (``DuplicateDetector``) clusters near-duplicate reviews before
+    scoring, handles them according to its mode and adds its report to the
+    payload under ``duplicates``.
+    """
+    progress = progress or _no_progress
+    if state is None:
+        state = AnalysisState(text_column, ngram_range, top_k, group_options, date_column)
+    snapshot = state.to_state()
+    index_checkpoint = review_index.checkpoint() if review_index is not None else None
+    duplicates_checkpoint = duplicates.checkpoint() if duplicates is not None else None
+    with metrics.timer('analysis_stage_seconds', stage='total'):
+        encoding = detect_encoding(file_path, sample_size)
+        try:
+            _fold_csv_stream(state, file_path, encoding, chunk_size, workers, worker_chunk_size,
+                             score_store, dataset_writer, review_index, duplicates, progress)
+        except UnicodeDecodeError:
+            if encoding == FALLBACK_ENCODING:
+                raise
+            # The sample decoded cleanly but a later chunk did not; start over once
+            logger.info("%s failed past the sample, retrying with %s", encoding, FALLBACK_ENCODING)
+            if dataset_writer is not None:
+                dataset_writer.abort()
+            if review_index is not None:
+                review_index.rollback(index_checkpoint)
+            if duplicates is not None:
+                duplicates.rollback(duplicates_checkpoint)
+            state.restore(snapshot)
+            _fold_csv_stream(state, file_path, FALLBACK_ENCODING, chunk_size, workers, worker_chunk_size,
+                             score_store, dataset_writer, review_index, duplicates, progress)
+        response_data, context = build_state_response(state)
+        if duplicates is not None:
+            response_data['duplicates'] = duplicates.report()
+        return response_data, context
@@ -0,0 +1,243 @@
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.services.analysis import AnalysisError, AnalysisState, analyze_csv_file
+from app.services.dedup import DuplicateDetector
+from app.services.result_cache import ANALYSIS_VERSION
+from app.utils.nlp_processor import warm_up
+from app.utils.score_store import ScoreStore
+
+MANIFEST_FILE = 'manifest.jsonl'
+SUMMARY_FILE = 'summary.json'
+RESULTS_FOLDER = 'results'
+
+# Settings that change the results; a file is re-analyzed when any of them differs
+_RESULT_SETTINGS = ('text_column', 'ngram_range', 'top_k', 'group_options', 'dedup_mode', 'dedup_threshold',
+                    'dedup_min_words', 'date_column')
+
+# Per-process state, built once by the pool initializer in every worker
+_worker_state = {}
+
+
+def collect_files(inputs, recursive=False):
+    """CSV files named by ``inputs`` (directories, files or glob patterns), sorted and without repeats."""
+    found = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '**', '*.csv') if recursive else os.path.join(pattern, '*.csv')
+        found.update(os.path.abspath(path) for path in glob.glob(pattern, recursive=recursive)
+                     if os.path.isfile(path))
+    return sorted(found)
+
+
+def settings_fingerprint(settings):
+    relevant = {name: settings.get(name) for name in _RESULT_SETTINGS}
+    relevant['analysis_version'] = ANALYSIS_VERSION
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def result_name(path):
+    """Per-file result name; the path hash keeps same-named files of different folders apart."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}.json"
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(settings):
+    # Load the VADER lexicon, stop words and score store once per worker, not once per file
+    warm_up()
+    _worker_state['settings'] = settings
+    _worker_state['score_store'] = (ScoreStore(settings['score_store_path'], settings['score_store_max_entries'])
+                                    if settings.get('score_store_path') else None)
+
+
+def analyze_file(path, results_folder):
+    """Analyze one CSV in the current worker and write its payload; returns its manifest entry."""
+    settings = _worker_state['settings']
+    stat = os.stat(path)
+    entry = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "settings": settings_fingerprint(settings)
+    }
+    started = time.perf_counter()
+    state = AnalysisState(settings['text_column'], settings['ngram_range'], settings['top_k'],
+                          settings['group_options'], settings.get('date_column'))
+    duplicates = None
+    if settings['dedup_mode'] != 'off':
+        duplicates = DuplicateDetector(settings['dedup_mode'], settings['dedup_threshold'],
+                                       min_words=settings.get('dedup_min_words', 5))
+    try:
+        response_data, _ = analyze_csv_file(
+            path, state=state, chunk_size=settings['chunk_size'], score_store=_worker_state['score_store'],
+            duplicates=duplicates
+        )
+    except AnalysisError as e:
+        return dict(entry, status='failed', error=e.message, seconds=round(time.perf_counter() - started, 3))
+    except Exception as e:
+        return dict(entry, status='failed', error=f"{type(e).__name__}: {e}",
+                    seconds=round(time.perf_counter() - started, 3))
+
+    output = result_name(path)
+    _write_json(os.path.join(results_folder, output), dict(response_data, source=path))
+    stats = response_data['stats']
+    return dict(
+        entry,
+        status='done',
+        output=os.path.join(RESULTS_FOLDER, output),
+        rows_in=state.rows_in,
+        reviews=stats['total_reviews'],
+        positive=stats['positive_reviews'],
+        negative=stats['negative_reviews'],
+        neutral=stats['neutral_reviews'],
+        sentiment_score=response_data['sentiment_score'],
+        trend=response_data['sales_trend']['trend'],
+        duplicates=response_data['duplicates']['duplicate_reviews'] if duplicates is not None else None,
+        seconds=round(time.perf_counter() - started, 3)
+    )
+
+
+def read_manifest(path):
+    """Latest manifest entry per file; a line cut short by an interrupted run is ignored."""
+    entries = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entries[entry['path']] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def is_current(entry, path, fingerprint, output_folder):
+    """Whether ``entry`` records a finished analysis of the file as it is now."""
+    if entry is None or entry.get('status') != 'done' or entry.get('settings') != fingerprint:
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return (entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+            and os.path.exists(os.path.join(output_folder, entry['output'])))
+
+
+def summarize(entries, run):
+    """Combined figures over every file of the batch plus the throughput of this run."""
+    done = [entry for entry in entries if entry['status'] == 'done']
+    reviews = sum(entry['reviews'] for entry in done)
+    counts = {label: sum(entry[label] for entry in done) for label in ('positive', 'negative', 'neutral')}
+    summary = {
+        "files": len(entries),
+        "analyzed": len(done),
+        "failed": len(entries) - len(done),
+        "rows_in": sum(entry['rows_in'] for entry in done),
+        "total_reviews": reviews,
+        "positive_reviews": counts['positive'],
+        "negative_reviews": counts['negative'],
+        "neutral_reviews": counts['neutral'],
+        # Review-weighted mean of the per-file scores
+        "sentiment_score": sum(entry['sentiment_score'] * entry['reviews'] for entry in done) / reviews
+        if reviews else 0.0,
+        "trends": {trend: sum(1 for entry in done if entry['trend'] == trend) for trend in ('Up', 'Stable', 'Down')},
+        "run": run,
+        "results": [{name: entry.get(name) for name in (
+            'path', 'status', 'output', 'reviews', 'sentiment_score', 'trend', 'duplicates', 'seconds', 'error'
+        )} for entry in entries]
+    }
+    if any(entry.get('duplicates') is not None for entry in done):
+        summary['duplicate_reviews'] = sum(entry.get('duplicates') or 0 for entry in done)
+    return summary
+
+
+def run_batch(files, output_folder, settings, workers=1, resume=True, report=None):
+    """Analyze ``files`` with up to ``workers`` processes and write per-file results and a summary.
+
+    Every finished file is appended to ``manifest.jsonl`` in
+    ``output_folder`` right away, so an interrupted run picks up where it
+    stopped: with ``resume``, files whose entry matches their size, mtime
+    and the analysis settings are skipped. Each worker process loads the
+    NLP models once and keeps them for all the files it handles; at most
+    twice ``workers`` files are queued at a time. ``report(entry, done,
+    total)`` is called as files finish. Returns the summary, which is also
+    written to ``summary.json``.
+    """
+    results_folder = os.path.join(output_folder, RESULTS_FOLDER)
+    os.makedirs(results_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    fingerprint = settings_fingerprint(settings)
+    previous = read_manifest(manifest_path) if resume else {}
+    if not resume and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    pending = [path for path in files if not is_current(previous.get(path), path, fingerprint, output_folder)]
+    skipped = set(files) - set(pending)
+    finished = {path: previous[path] for path in skipped}
+    started = time.perf_counter()
+    processed = []
+
+    with open(manifest_path, 'a', encoding='utf-8') as manifest:
+        def record(entry):
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            os.fsync(manifest.fileno())
+            finished[entry['path']] = entry
+            processed.append(entry)
+            if report is not None:
+                report(entry, len(processed), len(pending))
+
+        if pending:
+            # Forked workers inherit the models loaded here instead of each loading their own
+            warm_up()
+        if workers <= 1:
+            _init_worker(settings)
+            for path in pending:
+                record(analyze_file(path, results_folder))
+        elif pending:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+                queue = iter(pending)
+                running = set()
+                while True:
+                    for path in queue:
+                        running.add(pool.submit(analyze_file, path, results_folder))
+                        if len(running) >= 2 * workers:
+                            break
+                    if not running:
+                        break
+                    completed, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        record(future.result())
+
+    elapsed = time.perf_counter() - started
+    done = [entry for entry in processed if entry['status'] == 'done']
+    rows_in = sum(entry['rows_in'] for entry in done)
+    size = sum(entry['size'] for entry in processed)
+    run = {
+        "workers": workers,
+        "files_processed": len(processed),
+        "files_skipped": len(files) - len(pending),
+        "seconds": round(elapsed, 3),
+        "rows_in": rows_in,
+        "bytes": size,
+        "files_per_second": round(len(processed) / elapsed, 3) if elapsed else 0.0,
+        "rows_per_second": round(rows_in / elapsed, 1) if elapsed else 0.0,
+        "mb_per_second": round(size / elapsed / 1024 ** 2, 3) if elapsed else 0.0
+    }
+    summary = summarize([finished[path] for path in files if path in finished], run)
+    _write_json(os.path.join(output_folder, SUMMARY_FILE), summary)
+    return summary
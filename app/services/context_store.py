@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Expired rows are purged from SQLite every this many writes
+_PURGE_EVERY = 100
+
+
+class ContextStore:
+    """Chat contexts kept server side and looked up by an opaque id.
+
+    Only the id travels in the session cookie. Contexts live in an in-process
+    LRU in front of a SQLite table shared by every worker process. Entries are
+    never rewritten: each ``put`` gets a fresh id, so a copy held in any
+    worker's memory is always current. Every entry expires ``ttl`` seconds
+    after it was written.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_memory_entries=256):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._stats = {'hits': 0, 'memory_hits': 0, 'misses': 0}
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS contexts (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS contexts_expires_at ON contexts (expires_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, context_id, context, expires_at):
+        with self._lock:
+            self._memory[context_id] = (context, expires_at)
+            self._memory.move_to_end(context_id)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, context):
+        """Store ``context`` (a JSON-serializable dict) under a new id and return the id."""
+        context_id = uuid.uuid4().hex
+        expires_at = time.time() + self.ttl
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO contexts (id, data, expires_at) VALUES (?, ?, ?)",
+            (context_id, json.dumps(context), expires_at)
+        )
+        conn.commit()
+        self._remember(context_id, context, expires_at)
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % _PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+        return context_id
+
+    def get(self, context_id):
+        if not context_id:
+            return None
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(context_id)
+            if cached is not None and cached[1] > now:
+                self._memory.move_to_end(context_id)
+                self._stats['hits'] += 1
+                self._stats['memory_hits'] += 1
+                return cached[0]
+        row = self._connect().execute(
+            "SELECT data, expires_at FROM contexts WHERE id = ? AND expires_at > ?", (context_id, now)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self._memory.pop(context_id, None)
+                self._stats['misses'] += 1
+            return None
+        context = json.loads(row[0])
+        self._remember(context_id, context, row[1])
+        with self._lock:
+            self._stats['hits'] += 1
+        return context
+
+    def delete(self, context_id):
+        conn = self._connect()
+        conn.execute("DELETE FROM contexts WHERE id = ?", (context_id,))
+        conn.commit()
+        with self._lock:
+            self._memory.pop(context_id, None)
+
+    def purge_expired(self):
+        now = time.time()
+        conn = self._connect()
+        purged = conn.execute("DELETE FROM contexts WHERE expires_at <= ?", (now,)).rowcount
+        conn.commit()
+        with self._lock:
+            for context_id in [key for key, (_, expires_at) in self._memory.items() if expires_at <= now]:
+                del self._memory[context_id]
+        return purged
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        stats['entries'] = self._connect().execute("SELECT COUNT(*) FROM contexts").fetchone()[0]
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_context_store(config):
+    """Return the process-wide context store configured from the Flask config."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContextStore(
+                config['CONTEXT_STORE_PATH'],
+                ttl=config['CONTEXT_TTL'],
+                max_memory_entries=config['CONTEXT_MEMORY_ENTRIES'],
+            )
+        return _store
@@ -0,0 +1,263 @@
+import bisect
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows: the development server runs a single process
+    fcntl = None
+
+_CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+_DATASET_ID = re.compile(r'^[0-9a-f]{16,64}$')
+
+# Columns the analysis adds to every stored row
+SCORE_COLUMNS = [('sentiment_score', pa.float64()), ('sentiment', _CATEGORY_TYPE), ('rating_disagreement', pa.bool_())]
+
+
+def _as_strings(series):
+    strings = series.astype(str).astype(object)
+    strings[series.isna()] = None
+    return strings
+
+
+class DatasetWriter:
+    """Appends analyzed chunks to a Parquet file, one row group per chunk.
+
+    The schema is fixed by the first chunk: numeric CSV columns are stored as
+    float64, ``categorical_columns`` (product and brand names) as dictionary
+    encoded strings and everything else as strings, so later chunks with a
+    different inferred dtype still fit. Appends pass the ``schema`` of the
+    existing parts instead. The file only appears under its final name once
+    ``close`` succeeds, and never replaces a part that is already there.
+    """
+
+    def __init__(self, path, categorical_columns=(), schema=None, compression='zstd'):
+        self.path = path
+        self.categorical_columns = set(categorical_columns)
+        self.compression = compression
+        self.rows = 0
+        self._tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._writer = None
+        self._kinds = None
+        self._schema = None
+        self._fixed_schema = schema
+
+    def _column_kind(self, name, series):
+        if name in self.categorical_columns:
+            return 'category'
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            return 'number'
+        return 'string'
+
+    def _open(self, chunk):
+        if self._fixed_schema is not None:
+            score_names = {name for name, _ in SCORE_COLUMNS}
+            self._kinds = {
+                field.name: ('category' if field.type == _CATEGORY_TYPE
+                             else 'number' if field.type == pa.float64() else 'string')
+                for field in self._fixed_schema if field.name not in score_names
+            }
+            self._schema = self._fixed_schema
+        else:
+            self._kinds = {name: self._column_kind(name, chunk[name]) for name in chunk.columns}
+            types = {'category': _CATEGORY_TYPE, 'number': pa.float64(), 'string': pa.string()}
+            fields = [pa.field(str(name), types[kind]) for name, kind in self._kinds.items()]
+            self._schema = pa.schema(fields + [pa.field(name, type_) for name, type_ in SCORE_COLUMNS])
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._writer = pq.ParquetWriter(self._tmp_path, self._schema, compression=self.compression)
+
+    def write(self, chunk, scores, labels, disagreements=None):
+        """Store the cleaned ``chunk`` with its compound ``scores`` and sentiment ``labels``.
+
+        ``disagreements`` flags reviews whose star rating contradicts their
+        text; it is left null for datasets without ratings.
+        """
+        if len(chunk) == 0:
+            return
+        if self._writer is None:
+            self._open(chunk)
+        columns = {}
+        for name, kind in self._kinds.items():
+            series = chunk[name] if name in chunk.columns else pd.Series(None, index=chunk.index, dtype=object)
+            if kind == 'number':
+                columns[str(name)] = pd.to_numeric(series, errors='coerce').astype('float64').to_numpy()
+            elif kind == 'category':
+                columns[str(name)] = pd.Categorical(_as_strings(series))
+            else:
+                columns[str(name)] = _as_strings(series).to_numpy()
+        columns['sentiment_score'] = pd.Series(scores, dtype='float64').to_numpy()
+        columns['sentiment'] = pd.Categorical(pd.Series(labels).astype(str))
+        columns['rating_disagreement'] = (np.asarray(disagreements, dtype=bool) if disagreements is not None
+                                          else np.full(len(chunk), None, dtype=object))
+        frame = pd.DataFrame(columns)
+        self._writer.write_table(pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False))
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is None:
+            return False
+        self._writer.close()
+        self._writer = None
+        # A hard link fails if the name is taken, where a rename would silently overwrite that part
+        os.link(self._tmp_path, self.path)
+        os.remove(self._tmp_path)
+        return True
+
+    def abort(self):
+        """Discard everything written so far; the writer can be reused afterwards."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+        self.rows = 0
+        self._kinds = self._schema = None
+
+
+class DatasetStore:
+    """Analyzed uploads persisted as compressed Parquet, keyed by dataset id.
+
+    The dataset id is the sha256 of the uploaded bytes, so the same file is
+    stored once. Each dataset is a folder of Parquet parts, the first from
+    the upload and one more per append, plus the gzipped JSON state of its
+    running aggregates. Readers memory-map the parts and load only the
+    columns they ask for instead of re-parsing and re-scoring the CSV.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def path(self, dataset_id):
+        if not _DATASET_ID.match(dataset_id or ''):
+            raise ValueError(f"Invalid dataset id: {dataset_id}")
+        return os.path.join(self.folder, dataset_id)
+
+    def parts(self, dataset_id):
+        return sorted(glob.glob(os.path.join(self.path(dataset_id), 'part-*.parquet')))
+
+    def exists(self, dataset_id):
+        try:
+            return bool(self.parts(dataset_id))
+        except ValueError:
+            return False
+
+    @contextmanager
+    def lock(self, dataset_id):
+        """Hold the dataset for a whole read-fold-write cycle, against other threads and processes.
+
+        Writing a part and its state must happen under this lock: part
+        numbers come from the parts present, and the state is read, updated
+        and written back. Processes are kept apart by an ``flock`` on a lock
+        file in the dataset folder.
+        """
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(dataset_id, threading.Lock())
+        folder = self.path(dataset_id)
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def writer(self, dataset_id, categorical_columns=()):
+        """A writer for the next part; appends reuse the schema of the existing parts."""
+        parts = self.parts(dataset_id)
+        schema = pq.read_schema(parts[0]) if parts else None
+        path = os.path.join(self.path(dataset_id), f"part-{len(parts):05d}.parquet")
+        return DatasetWriter(path, categorical_columns, schema=schema)
+
+    def _state_path(self, dataset_id):
+        return os.path.join(self.path(dataset_id), 'state.json.gz')
+
+    def save_state(self, dataset_id, state):
+        path = self._state_path(dataset_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load_state(self, dataset_id):
+        """The saved aggregate state, or None when the dataset has none."""
+        try:
+            with gzip.open(self._state_path(dataset_id), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, dataset_id, columns=None):
+        """Load the dataset (or just ``columns``) as a DataFrame."""
+        tables = [pq.read_table(part, columns=columns, memory_map=True) for part in self.parts(dataset_id)]
+        return pa.concat_tables(tables).to_pandas()
+
+    def iter_batches(self, dataset_id, columns=None, batch_size=10000):
+        """Yield the dataset as DataFrames of at most ``batch_size`` rows."""
+        for part in self.parts(dataset_id):
+            parquet_file = pq.ParquetFile(part, memory_map=True)
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pandas()
+
+    def take(self, dataset_id, positions, columns=None):
+        """The rows at ``positions`` (in dataset order), reading only the row groups that hold them."""
+        wanted = sorted(set(positions))
+        rows = {}
+        offset = 0
+        for part in self.parts(dataset_id):
+            parquet_file = pq.ParquetFile(part, memory_map=True)
+            for row_group in range(parquet_file.num_row_groups):
+                end = offset + parquet_file.metadata.row_group(row_group).num_rows
+                hits = wanted[bisect.bisect_left(wanted, offset):bisect.bisect_left(wanted, end)]
+                if hits:
+                    frame = parquet_file.read_row_group(row_group, columns=columns).to_pandas()
+                    for position in hits:
+                        rows[position] = frame.iloc[position - offset]
+                offset = end
+        return pd.DataFrame([rows[position] for position in positions if position in rows])
+
+    def info(self, dataset_id):
+        """Row count, columns and size from the Parquet footers, without reading any data."""
+        parts = self.parts(dataset_id)
+        footers = [pq.read_metadata(part) for part in parts]
+        schema = footers[0].schema.to_arrow_schema()
+        return {
+            "dataset_id": dataset_id,
+            "rows": sum(metadata.num_rows for metadata in footers),
+            "parts": len(parts),
+            "row_groups": sum(metadata.num_row_groups for metadata in footers),
+            "columns": {field.name: str(field.type) for field in schema},
+            "bytes": sum(os.path.getsize(part) for part in parts)
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_dataset_store(config):
+    """Return the process-wide dataset store configured from the Flask config."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DatasetStore(config['DATASET_FOLDER'])
+        return _store
@@ -0,0 +1,287 @@
+import gzip
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from app.utils.phrase_engine import words
+
+DEDUP_MODES = ('off', 'report', 'exclude', 'downweight')
+
+_SIGNATURES_FILE = 'dedup-signatures.npz'
+_META_FILE = 'dedup.json.gz'
+# Shingles hashed at once; bounds the (shingles x permutations) work array to a few MB
+_BLOCK_SHINGLES = 16384
+
+
+class DuplicateDetector:
+    """Near-duplicate reviews clustered with MinHash signatures and LSH banding.
+
+    Every review gets a ``num_perm`` MinHash signature of its word
+    shingles. The signature is cut into ``bands``; reviews sharing any band
+    land in the same bucket, so each review is compared only with the few
+    cluster representatives in its buckets instead of with every review
+    seen. A candidate is a duplicate when the share of equal MinHash values,
+    an estimate of the shingle Jaccard similarity, reaches ``threshold``.
+    The first review of a cluster is its representative; later ones are its
+    copies. Reviews of fewer than ``min_words`` words ("Great phone",
+    "good.") are too short to tell a copy from a common phrase; they are
+    never clustered and only counted as short.
+
+    ``mode`` tells the analysis what to do with copies: ``report`` only
+    counts them, ``exclude`` drops them before scoring and ``downweight``
+    lets every review of a k-review cluster weigh 1/k, so the cluster
+    counts once in every aggregate.
+    """
+
+    def __init__(self, mode='report', threshold=0.8, num_perm=64, bands=16, shingle_size=3, seed=1,
+                 max_examples=5, min_words=5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.mode = mode
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.max_examples = max_examples
+        self.min_words = min_words
+        rng = np.random.RandomState(seed)
+        self._a = self._odd_multipliers(rng, num_perm)
+        self._b = self._odd_multipliers(rng, num_perm)
+        # Folds the rows of a band into one 64-bit bucket key
+        self._mix = self._odd_multipliers(rng, num_perm // bands)
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+        self.sizes = []
+        self.examples = {}
+        self.rows = 0
+        self.duplicates = 0
+        self.short = 0
+
+    @staticmethod
+    def _odd_multipliers(rng, n):
+        high = rng.randint(0, 1 << 31, n).astype(np.uint64)
+        low = rng.randint(0, 1 << 31, n).astype(np.uint64)
+        return (high << np.uint64(33)) | (low << np.uint64(1)) | np.uint64(1)
+
+    @property
+    def kept_rows(self):
+        """Reviews that went on to scoring, i.e. rows the dataset holds."""
+        return self.rows - self.duplicates if self.mode == 'exclude' else self.rows
+
+    @staticmethod
+    def _words(texts):
+        return [words(text) for text in texts]
+
+    def _shingle_hashes(self, texts, word_lists):
+        """64-bit hashes of the overlapping ``shingle_size``-word shingles of every text.
+
+        Returns the hashes and the index of the text each belongs to, in text
+        order. Words are hashed once and shingle hashes are combined from
+        them arithmetically, so no shingle string is ever built. Texts
+        shorter than a shingle are hashed whole; texts without any word
+        (e.g. "5/5 !!!") by their stripped text.
+        """
+        size = self.shingle_size
+        lengths = np.fromiter(map(len, word_lists), dtype=np.int64, count=len(word_lists))
+        words = np.array([word for word_list in word_lists for word in word_list], dtype=object)
+        # pandas hashes with a fixed key, so signatures stay comparable across processes
+        word_hashes = pd.util.hash_array(words) if len(words) else np.empty(0, dtype=np.uint64)
+        word_owners = np.repeat(np.arange(len(word_lists)), lengths)
+
+        n_windows = max(len(words) - size + 1, 0)
+        hashes = np.zeros(n_windows, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * np.uint64(0x100000001B3) + word_hashes[offset:offset + n_windows]
+        whole = word_owners[:n_windows] == word_owners[size - 1:size - 1 + n_windows]
+        hashes, owners = hashes[whole], word_owners[:n_windows][whole]
+
+        short = np.flatnonzero(lengths < size)
+        if len(short):
+            short_texts = np.array([' '.join(word_lists[i]) or str(texts[i]).strip() for i in short], dtype=object)
+            hashes = np.concatenate([hashes, pd.util.hash_array(short_texts)])
+            owners = np.concatenate([owners, short])
+            order = np.argsort(owners, kind='stable')
+            hashes, owners = hashes[order], owners[order]
+        return hashes, owners
+
+    def signatures(self, texts, word_lists=None):
+        """MinHash signatures of ``texts`` as a ``(len(texts), num_perm)`` uint32 array."""
+        texts = list(texts)
+        # Built transposed so the per-text minimum runs along contiguous memory
+        signatures = np.full((self.num_perm, len(texts)), np.iinfo(np.uint32).max, dtype=np.uint64)
+        if not texts:
+            return signatures.T.astype(np.uint32)
+        hashes, owners = self._shingle_hashes(texts, word_lists if word_lists is not None else self._words(texts))
+        a, b = self._a[:, None], self._b[:, None]
+        for start in range(0, len(hashes), _BLOCK_SHINGLES):
+            block = hashes[start:start + _BLOCK_SHINGLES]
+            block_owners = owners[start:start + _BLOCK_SHINGLES]
+            # Multiply-shift hashing: one cheap random permutation of the shingle hashes per row
+            values = (a * block + b) >> np.uint64(32)
+            starts = np.flatnonzero(np.r_[True, block_owners[1:] != block_owners[:-1]])
+            cols = block_owners[starts]
+            signatures[:, cols] = np.minimum(signatures[:, cols], np.minimum.reduceat(values, starts, axis=1))
+        return np.ascontiguousarray(signatures.T, dtype=np.uint32)
+
+    def _band_keys(self, signatures):
+        """One list of bucket keys per band, aligned with ``signatures``."""
+        width = self.num_perm // self.bands
+        wide = signatures.astype(np.uint64)
+        return [(wide[:, band * width:(band + 1) * width] * self._mix).sum(axis=1).tolist()
+                for band in range(self.bands)]
+
+    def _add_representatives(self, signatures):
+        first = len(self._signatures)
+        self._signatures = np.concatenate([self._signatures, signatures])
+        for band, keys in enumerate(self._band_keys(signatures)):
+            buckets = self._buckets[band]
+            for offset, key in enumerate(keys):
+                buckets.setdefault(key, []).append(first + offset)
+
+    def _note_example(self, representative, text):
+        """Keep a sample text of the ``max_examples`` largest clusters."""
+        examples = self.examples
+        if representative in examples:
+            return
+        if len(examples) >= self.max_examples:
+            smallest = min(examples, key=self.sizes.__getitem__)
+            if self.sizes[smallest] >= self.sizes[representative]:
+                return
+            del examples[smallest]
+        examples[representative] = str(text)[:300]
+
+    def add(self, texts):
+        """Cluster one chunk of reviews.
+
+        Returns a boolean array flagging the copies and an int array with
+        each review's cluster, the index of its representative (-1 for
+        short reviews).
+        """
+        texts = list(texts)
+        word_lists = self._words(texts)
+        long_enough = np.flatnonzero(np.fromiter(map(len, word_lists), dtype=np.int64, count=len(texts))
+                                     >= self.min_words)
+        signatures = self.signatures([texts[i] for i in long_enough], [word_lists[i] for i in long_enough])
+        keys = self._band_keys(signatures)
+        duplicate = np.zeros(len(texts), dtype=bool)
+        clusters = np.full(len(texts), -1, dtype=np.int64)
+        needed = int(np.ceil(self.threshold * self.num_perm))
+        stored = len(self._signatures)
+        fresh = []  # signatures of this chunk that start a new cluster
+        for row, signature in enumerate(signatures):
+            i = long_enough[row]
+            match = None
+            checked = set()
+            for band, buckets in enumerate(self._buckets):
+                for candidate in buckets.get(keys[band][row], ()):
+                    if candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    known = self._signatures[candidate] if candidate < stored \
+                        else signatures[fresh[candidate - stored]]
+                    if np.count_nonzero(known == signature) >= needed:
+                        match = candidate
+                        break
+                if match is not None:
+                    break
+            if match is None:
+                representative = stored + len(fresh)
+                fresh.append(row)
+                clusters[i] = representative
+                self.sizes.append(1)
+                for band, buckets in enumerate(self._buckets):
+                    buckets.setdefault(keys[band][row], []).append(representative)
+                continue
+            self.sizes[match] += 1
+            duplicate[i] = True
+            clusters[i] = match
+            self._note_example(match, texts[i])
+        self._signatures = np.concatenate([self._signatures, signatures[fresh]])
+        self.rows += len(texts)
+        self.duplicates += int(duplicate.sum())
+        self.short += len(texts) - len(long_enough)
+        return duplicate, clusters
+
+    def checkpoint(self):
+        return len(self.sizes), list(self.sizes), dict(self.examples), self.rows, self.duplicates, self.short
+
+    def rollback(self, checkpoint):
+        """Forget every review added since ``checkpoint()``."""
+        n_clusters, sizes, examples, rows, duplicates, short = checkpoint
+        removed = self._signatures[n_clusters:]
+        for band, keys in enumerate(self._band_keys(removed)):
+            buckets = self._buckets[band]
+            for key in keys:
+                members = [member for member in buckets.get(key, []) if member < n_clusters]
+                if members:
+                    buckets[key] = members
+                else:
+                    buckets.pop(key, None)
+        self._signatures = self._signatures[:n_clusters]
+        self.sizes = sizes
+        self.examples = examples
+        self.rows = rows
+        self.duplicates = duplicates
+        self.short = short
+
+    def report(self):
+        """Duplicate counts and the largest clusters for the /api/upload payload."""
+        sizes = np.asarray(self.sizes, dtype=np.int64)
+        largest = sorted(self.examples, key=lambda representative: (-self.sizes[representative], representative))
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "min_words": self.min_words,
+            "reviews": self.rows,
+            "short_reviews": self.short,
+            "unique_reviews": self.rows - self.duplicates,
+            "duplicate_reviews": self.duplicates,
+            "duplicate_rate": round(self.duplicates / self.rows, 4) if self.rows else 0.0,
+            "clusters": int((sizes > 1).sum()),
+            "largest_clusters": [{"review": self.examples[representative], "copies": self.sizes[representative]}
+                                 for representative in largest]
+        }
+
+    def save(self, folder):
+        """Write the signatures and counts next to a dataset; files are replaced atomically."""
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        signatures_path = os.path.join(folder, _SIGNATURES_FILE)
+        meta_path = os.path.join(folder, _META_FILE)
+        with open(signatures_path + suffix, 'wb') as f:
+            np.savez(f, signatures=self._signatures, sizes=np.asarray(self.sizes, dtype=np.int64))
+        with gzip.open(meta_path + suffix, 'wt', encoding='utf-8') as f:
+            json.dump({
+                "mode": self.mode, "threshold": self.threshold, "num_perm": self.num_perm, "bands": self.bands,
+                "shingle_size": self.shingle_size, "seed": self.seed, "max_examples": self.max_examples,
+                "min_words": self.min_words, "rows": self.rows, "duplicates": self.duplicates, "short": self.short,
+                "examples": [[representative, text] for representative, text in self.examples.items()]
+            }, f)
+        os.replace(signatures_path + suffix, signatures_path)
+        os.replace(meta_path + suffix, meta_path)
+
+    @classmethod
+    def load(cls, folder):
+        """The detector saved in ``folder``, or None when it is missing or incomplete."""
+        try:
+            with gzip.open(os.path.join(folder, _META_FILE), 'rt', encoding='utf-8') as f:
+                meta = json.load(f)
+            with np.load(os.path.join(folder, _SIGNATURES_FILE)) as arrays:
+                signatures = arrays['signatures']
+                sizes = arrays['sizes']
+        except (OSError, ValueError, KeyError):
+            return None
+        detector = cls(meta['mode'], meta['threshold'], meta['num_perm'], meta['bands'], meta['shingle_size'],
+                       meta['seed'], meta['max_examples'], meta['min_words'])
+        if signatures.shape != (len(sizes), detector.num_perm):
+            return None
+        detector._add_representatives(signatures.astype(np.uint32))
+        detector.sizes = sizes.tolist()
+        detector.examples = {rep: text for rep, text in meta['examples']}
+        detector.rows = meta['rows']
+        detector.duplicates = meta['duplicates']
+        detector.short = meta['short']
+        return detector
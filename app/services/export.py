@@ -0,0 +1,71 @@
+import zlib
+
+import pandas as pd
+
+from app.services.analysis import BRAND_NAME_COLUMNS, PRODUCT_NAME_COLUMNS
+from app.utils.xlsx_stream import iter_xlsx
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+SCORE_FIELDS = ('sentiment_score', 'sentiment', 'rating_disagreement')
+
+
+def export_columns(available, text_column, requested=None):
+    """Columns to export, in order.
+
+    By default the review text, the product and brand fields the dataset
+    has and the scores; ``requested`` is ``'all'`` or a comma-separated list
+    of stored columns. Raises ValueError naming any unknown column.
+    """
+    available = list(available)
+    if requested is None:
+        wanted = [text_column] + PRODUCT_NAME_COLUMNS + BRAND_NAME_COLUMNS + list(SCORE_FIELDS)
+        return [name for name in dict.fromkeys(wanted) if name in available]
+    if requested.strip() == 'all':
+        return available
+    wanted = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in wanted if name not in available]
+    if unknown or not wanted:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}" if unknown else "No columns requested")
+    return wanted
+
+
+def csv_chunks(frames, columns):
+    """UTF-8 CSV, one chunk per frame after the header line."""
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode('utf-8')
+    for frame in frames:
+        yield frame.to_csv(index=False, header=False, columns=columns).encode('utf-8')
+
+
+def jsonl_chunks(frames, columns):
+    """One JSON object per review; missing values become null."""
+    for frame in frames:
+        if len(frame):
+            yield frame[columns].to_json(orient='records', lines=True, force_ascii=False).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a byte stream into one gzip member as it goes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(datasets, dataset_id, fmt, columns, batch_size=10000, compress_level=None):
+    """Stream a stored dataset as ``fmt`` bytes, reading ``batch_size`` rows at a time.
+
+    Only ``columns`` are read from the Parquet parts, and each batch is
+    serialized and handed on before the next is read, so neither the
+    dataset nor the file is ever held in memory. With ``compress_level``
+    the output is gzipped on the fly.
+    """
+    frames = datasets.iter_batches(dataset_id, columns=columns, batch_size=batch_size)
+    chunks = {'csv': csv_chunks, 'jsonl': jsonl_chunks, 'xlsx': iter_xlsx}[fmt](frames, columns)
+    return gzip_chunks(chunks, compress_level) if compress_level is not None else chunks
@@ -0,0 +1,72 @@
+import codecs
+import warnings
+
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+FALLBACK_ENCODING = 'latin-1'
+
+
+def detect_encoding(file_path, sample_size=64 * 1024):
+    """Pick the CSV encoding from a sample of the file instead of a full read.
+
+    UTF-8 is preferred; anything that does not decode as UTF-8 falls back to
+    latin-1, which accepts every byte sequence.
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # final=False tolerates a multi-byte character cut off by the sample
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def read_csv_columns(file_path, encoding):
+    return list(pd.read_csv(file_path, encoding=encoding, nrows=0).columns)
+
+
+def iter_csv_chunks(file_path, encoding, chunk_size):
+    """Yield the CSV as DataFrames of at most ``chunk_size`` rows, each with the bytes read so far.
+
+    The parser reads ahead in blocks, so the byte count runs slightly ahead
+    of the rows; compared with the file size it gives the share of the file
+    done.
+    """
+    with open(file_path, 'rb') as f:
+        with pd.read_csv(f, encoding=encoding, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield chunk, f.tell()
+
+
+def clean_review_chunk(chunk, text_column='Reviews'):
+    """Drop missing, blank and literal 'nan' reviews with a single mask.
+
+    Returns the kept rows and their review texts as strings.
+    """
+    texts = chunk[text_column].astype(str)
+    keep = chunk[text_column].notna() & (texts != 'nan') & (texts.str.strip() != '')
+    return chunk[keep], texts[keep]
+
+
+def parse_dates(values):
+    """Review dates as naive UTC timestamps; values that do not parse become NaT.
+
+    Strings are parsed with the format pandas infers from the first value,
+    which is vectorized; only when most values do not fit that format are
+    they parsed one by one. Numbers are read as Unix timestamps in seconds.
+    """
+    if is_numeric_dtype(values):
+        dates = pd.to_datetime(values, unit='s', errors='coerce', utc=True)
+    else:
+        with warnings.catch_warnings():
+            # "Could not infer format" is expected for free-form columns
+            warnings.simplefilter('ignore', UserWarning)
+            dates = pd.to_datetime(values, errors='coerce', utc=True)
+            present = values.notna()
+            if dates[present].isna().mean() > 0.5:
+                dates = pd.to_datetime(values, errors='coerce', utc=True, format='mixed')
+    return dates.dt.tz_localize(None)
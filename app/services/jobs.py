@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.services.analysis import AnalysisError
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Progress of a running job is written to the shared store at most this often
+_PROGRESS_SAVE_INTERVAL = 0.5
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity; the caller should retry later."""
+
+
+class Job:
+    def __init__(self, target):
+        self.id = uuid.uuid4().hex
+        self.target = target
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.rows_processed = 0
+        self.bytes_read = 0
+        self.bytes_total = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.context = None
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def progress(self, stage, rows_processed, bytes_read=None, bytes_total=None):
+        self.stage = stage
+        self.rows_processed = int(rows_processed)
+        if bytes_total is not None:
+            self.bytes_read = int(bytes_read or 0)
+            self.bytes_total = int(bytes_total)
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - (self.started_at or self.created_at)
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "rows_processed": self.rows_processed,
+            "elapsed": round(elapsed, 3)
+        }
+        if self.bytes_total:
+            # The row total is only known at the end; estimate it from the share of the file read so far
+            done = 1.0 if self.status == 'done' else min(self.bytes_read / self.bytes_total, 1.0)
+            data.update(bytes_read=self.bytes_read, bytes_total=self.bytes_total, percent=round(100 * done, 1))
+            if 0 < done < 1 and self.status == 'running':
+                data.update(rows_total_estimate=round(self.rows_processed / done),
+                            eta_seconds=round(elapsed * (1 - done) / done, 1))
+            elif self.status == 'done':
+                data['rows_total_estimate'] = self.rows_processed
+        if self.status == 'done':
+            data["result"] = self.result
+        elif self.status == 'failed':
+            data["error"] = self.error
+        return data
+
+    def to_record(self):
+        return {name: getattr(self, name) for name in (
+            'id', 'status', 'stage', 'rows_processed', 'bytes_read', 'bytes_total', 'created_at', 'started_at',
+            'finished_at', 'result', 'context', 'error'
+        )}
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(None)
+        for name, value in record.items():
+            setattr(job, name, value)
+        return job
+
+
+class JobStore:
+    """Job status, progress and results in a SQLite table shared by every worker process.
+
+    A job runs in the process that accepted it, but the client's polls can
+    land on any worker; they read the job from here.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+            "finished_at REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, job):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO jobs (id, status, data, finished_at) VALUES (?, ?, ?, ?)",
+                     (job.id, job.status, json.dumps(job.to_record()), job.finished_at))
+        conn.commit()
+
+    def load(self, job_id):
+        row = self._connect().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_record(json.loads(row[0])) if row is not None else None
+
+    def delete(self, job_id):
+        conn = self._connect()
+        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        conn.commit()
+
+    def purge(self, finished_before):
+        conn = self._connect()
+        purged = conn.execute("DELETE FROM jobs WHERE finished_at < ?", (finished_before,)).rowcount
+        conn.commit()
+        return purged
+
+    def counts(self):
+        """Jobs per status across every process."""
+        return dict(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobManager:
+    """Runs analysis jobs on a fixed set of background threads.
+
+    The queue is bounded: ``submit`` raises ``JobQueueFull`` instead of letting
+    work pile up. Every job is mirrored to a ``JobStore`` as it is queued,
+    makes progress and finishes, so any worker process can answer a poll
+    for it. Finished jobs are kept for ``result_ttl`` seconds so clients can
+    poll for the result, then dropped.
+    """
+
+    def __init__(self, app, store, workers=2, queue_size=8, result_ttl=600):
+        self.app = app
+        self.store = store
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._purged_at = time.time()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"analysis-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _track(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+        self.store.save(job)
+
+    def _save(self, job):
+        try:
+            self.store.save(job)
+        except sqlite3.Error as e:
+            logger.warning("Could not store job %s: %s", job.id, e)
+
+    def submit(self, target):
+        """Queue ``target(progress)``, which must return ``(result, context)``."""
+        self.purge_expired()
+        job = Job(target)
+        self._track(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            self.store.delete(job.id)
+            raise JobQueueFull("Analysis queue is full")
+        return job
+
+    def add_finished(self, result, context):
+        """Record an already-available result (e.g. a cache hit) as a finished job."""
+        self.purge_expired()
+        job = Job(None)
+        job.status = job.stage = 'done'
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.context = context
+        self._track(job)
+        return job
+
+    def add_future(self, future, on_result, on_error=None):
+        """Track work already running elsewhere (a ``concurrent.futures.Future``) as a job.
+
+        ``on_result(value)`` and ``on_error(exception)`` turn the outcome into
+        ``(result, context)``; without ``on_error`` a failure fails the job.
+        No worker thread is held while the future is pending.
+        """
+        self.purge_expired()
+        job = Job(None)
+        job.status = job.stage = 'running'
+        job.started_at = job.created_at
+        self._track(job)
+
+        def finish(done):
+            try:
+                error = done.exception()
+                if error is None:
+                    job.result, job.context = on_result(done.result())
+                elif on_error is not None:
+                    job.result, job.context = on_error(error)
+                else:
+                    raise error
+                job.status = job.stage = 'done'
+            except Exception as e:
+                logger.warning("Job %s failed: %s", job.id, e)
+                job.error = {"error": str(e), "success": False}
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                self._save(job)
+                metrics.inc('analysis_jobs_total', labels={'status': job.status})
+
+        future.add_done_callback(finish)
+        return job
+
+    def get(self, job_id):
+        """The job, from this process when it runs here, else from the shared store."""
+        self.purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        job = self.store.load(job_id)
+        if job is not None and job.finished and job.finished_at < time.time() - self.result_ttl:
+            return None
+        return job
+
+    def purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            # Also clears jobs left behind by processes that are gone
+            purge_store = expired or self._purged_at < cutoff
+            if purge_store:
+                self._purged_at = time.time()
+        if purge_store:
+            self.store.purge(cutoff)
+        return len(expired)
+
+    def stats(self):
+        counts = self.store.counts()
+        return {
+            "queued": self._queue.qsize(),
+            "capacity": self._queue.maxsize,
+            "running": counts.get('running', 0),
+            "done": counts.get('done', 0),
+            "failed": counts.get('failed', 0)
+        }
+
+    def _progress_saver(self, job):
+        last_saved = [0.0]
+
+        def progress(stage, rows_processed, bytes_read=None, bytes_total=None):
+            previous_stage = job.stage
+            job.progress(stage, rows_processed, bytes_read, bytes_total)
+            now = time.monotonic()
+            if stage != previous_stage or now - last_saved[0] >= _PROGRESS_SAVE_INTERVAL:
+                last_saved[0] = now
+                self._save(job)
+        return progress
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            self._save(job)
+            metrics.observe('job_queue_wait_seconds', job.started_at - job.created_at)
+            try:
+                with self.app.app_context():
+                    job.result, job.context = job.target(self._progress_saver(job))
+                job.status = job.stage = 'done'
+            except AnalysisError as e:
+                job.error = e.to_dict()
+                job.status = 'failed'
+            except Exception as e:
+                logger.exception("Analysis job %s failed", job.id)
+                job.error = {"error": f"Internal server error: {str(e)}", "success": False}
+                job.status = 'failed'
+            finally:
+                job.target = None
+                job.finished_at = time.time()
+                self._save(job)
+                metrics.inc('analysis_jobs_total', labels={'status': job.status})
+                self._queue.task_done()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(app):
+    """Return the process-wide job manager, starting its threads on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(
+                app,
+                JobStore(app.config['JOB_STORE_PATH']),
+                workers=app.config['JOB_WORKERS'],
+                queue_size=app.config['JOB_QUEUE_SIZE'],
+                result_ttl=app.config['JOB_RESULT_TTL'],
+            )
+        return _manager
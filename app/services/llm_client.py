@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import httpx
+import openai
+
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe('llm_requests_total', 'Chat completions requested, by result (hit, shared, miss, error).')
+metrics.describe('llm_request_seconds', 'Latency of chat completion calls to the model API.')
+
+
+class ResponseCache:
+    """In-process LRU of model answers; entries expire ``ttl`` seconds after they were stored."""
+
+    def __init__(self, ttl=3600, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LLMClient:
+    """Shared chat completion client with pooled connections and an answer cache.
+
+    One ``openai`` client and its ``httpx`` connection pool serve every
+    request of the process. Answers are cached by a hash of the cache scope
+    (the dataset the question is about), the model, the rendered messages
+    and the sampling parameters. Identical requests already in flight share
+    one API call.
+
+    ``stream`` yields the answer as it is generated. ``complete_async`` runs
+    the call on a background event loop and returns a
+    ``concurrent.futures.Future``, so many slow completions can be waiting at
+    once without holding a request thread each. ``base_url`` points the
+    client at any OpenAI-compatible server, e.g. a local stub.
+    """
+
+    def __init__(self, api_key, base_url=None, model='gpt-3.5-turbo', timeout=30.0, max_retries=2,
+                 pool_size=10, cache_ttl=3600, cache_entries=1024):
+        self.model = model
+        self.cache = ResponseCache(cache_ttl, cache_entries)
+        self._options = dict(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        # openai builds its own httpx client with arguments newer httpx releases reject; pass ours
+        self._client = openai.OpenAI(
+            http_client=httpx.Client(limits=self._limits, timeout=timeout), **self._options
+        )
+        self._async_client = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def cache_key(self, messages, scope=None, max_tokens=200, temperature=0.7):
+        payload = json.dumps([scope, self.model, messages, max_tokens, temperature], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _claim(self, key):
+        """The cached answer as a finished future, the future of an identical call in flight,
+        or a new future the caller must complete (``owner`` is True)."""
+        answer = self.cache.get(key)
+        if answer is not None:
+            metrics.inc('llm_requests_total', labels={'result': 'hit'})
+            future = Future()
+            future.set_result(answer)
+            return future, False
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.inc('llm_requests_total', labels={'result': 'shared'})
+                return future, False
+            future = self._inflight[key] = Future()
+        return future, True
+
+    def _settle(self, key, future, answer=None, error=None, started=None):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if started is not None:
+            metrics.observe('llm_request_seconds', time.perf_counter() - started)
+        if error is not None:
+            metrics.inc('llm_requests_total', labels={'result': 'error'})
+            future.set_exception(error)
+            return
+        metrics.inc('llm_requests_total', labels={'result': 'miss'})
+        self.cache.put(key, answer)
+        future.set_result(answer)
+
+    def complete(self, messages, scope=None, max_tokens=200, temperature=0.7):
+        """The model's answer to ``messages``, from the cache when possible."""
+        key = self.cache_key(messages, scope, max_tokens, temperature)
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        started = time.perf_counter()
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=max_tokens, temperature=temperature
+            )
+        except Exception as e:
+            self._settle(key, future, error=e, started=started)
+            raise
+        self._settle(key, future, response.choices[0].message.content, started=started)
+        return future.result()
+
+    def stream(self, messages, scope=None, max_tokens=200, temperature=0.7):
+        """Yield the answer in pieces as the model produces them.
+
+        Cached answers, and answers to an identical request already in
+        flight, come back as a single piece. The full answer is cached once
+        the stream completes.
+        """
+        key = self.cache_key(messages, scope, max_tokens, temperature)
+        future, owner = self._claim(key)
+        if not owner:
+            yield future.result()
+            return
+        started = time.perf_counter()
+        parts = []
+        try:
+            response = self._client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=max_tokens, temperature=temperature, stream=True
+            )
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except BaseException as e:
+            # Also reached when the consumer stops early; waiters must not hang on a partial answer
+            self._settle(key, future, error=e if isinstance(e, Exception) else RuntimeError("Stream closed"),
+                         started=started)
+            raise
+        self._settle(key, future, ''.join(parts), started=started)
+
+    def _event_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-client-loop', daemon=True).start()
+                self._async_client = openai.AsyncOpenAI(
+                    http_client=httpx.AsyncClient(limits=self._limits, timeout=self._options['timeout']),
+                    **self._options
+                )
+                self._loop = loop
+            return self._loop
+
+    async def _complete_async(self, key, future, messages, max_tokens, temperature):
+        started = time.perf_counter()
+        try:
+            response = await self._async_client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=max_tokens, temperature=temperature
+            )
+        except Exception as e:
+            self._settle(key, future, error=e, started=started)
+            return
+        self._settle(key, future, response.choices[0].message.content, started=started)
+
+    def complete_async(self, messages, scope=None, max_tokens=200, temperature=0.7):
+        """Like ``complete`` but returns at once with a future of the answer."""
+        key = self.cache_key(messages, scope, max_tokens, temperature)
+        future, owner = self._claim(key)
+        if owner:
+            asyncio.run_coroutine_threadsafe(
+                self._complete_async(key, future, messages, max_tokens, temperature), self._event_loop()
+            )
+        return future
+
+    def stats(self):
+        with self._inflight_lock:
+            inflight = len(self._inflight)
+        return {"cached_answers": len(self.cache), "inflight": inflight}
+
+
+_client = None
+_client_settings = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client(config):
+    """Return the process-wide LLM client, rebuilt only when its settings change."""
+    global _client, _client_settings
+    settings = (
+        config['OPENAI_API_KEY'], config['OPENAI_BASE_URL'], config['OPENAI_MODEL'], config['OPENAI_TIMEOUT'],
+        config['OPENAI_MAX_RETRIES'], config['OPENAI_POOL_SIZE'], config['CHAT_CACHE_TTL'],
+        config['CHAT_CACHE_ENTRIES']
+    )
+    with _client_lock:
+        if _client is None or settings != _client_settings:
+            api_key, base_url, model, timeout, max_retries, pool_size, cache_ttl, cache_entries = settings
+            _client = LLMClient(api_key, base_url=base_url, model=model, timeout=timeout, max_retries=max_retries,
+                                pool_size=pool_size, cache_ttl=cache_ttl, cache_entries=cache_entries)
+            _client_settings = settings
+        return _client
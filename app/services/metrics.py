@@ -0,0 +1,133 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from static asset hits up to large analyses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process counters and histograms rendered in Prometheus text format.
+
+    Values are per process; with several server workers each one reports its
+    own series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, labels=None):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def histogram_sums(self, name):
+        """Summed observations of every series of a histogram, keyed by its sorted ``(label, value)`` pairs."""
+        with self._lock:
+            return {key: histogram.sum for key, histogram in self._histograms.get(name, {}).items()}
+
+    def register_collector(self, collector):
+        """Add a callable returning ``[(name, type, labels, value)]`` gauges read at render time."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.extend(self._header(name, 'counter'))
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._histograms):
+                lines.extend(self._header(name, 'histogram'))
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        collected = {}
+        for collector in self._collectors:
+            try:
+                for name, metric_type, labels, value in collector():
+                    collected.setdefault((name, metric_type), []).append((_label_key(labels), value))
+            except Exception:
+                continue
+        for (name, metric_type), samples in sorted(collected.items()):
+            lines.extend(self._header(name, metric_type))
+            for key, value in samples:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, name, metric_type):
+        header = []
+        if name in self._help:
+            header.append(f"# HELP {name} {self._help[name]}")
+        header.append(f"# TYPE {name} {metric_type}")
+        return header
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'Request latency by endpoint and status.')
+metrics.describe('analysis_stage_seconds', 'Time spent in each analysis pipeline stage.')
+metrics.describe('analysis_rows_in_total', 'CSV rows read by the analysis pipeline.')
+metrics.describe('analysis_rows_cleaned_total', 'Rows left for scoring after cleaning.')
+metrics.describe('analysis_rows_duplicate_total', 'Cleaned rows found to be near-duplicates of an earlier review.')
+metrics.describe('analysis_uploads_total', 'Uploads analyzed, by outcome.')
+metrics.describe('dataset_exports_total', 'Dataset exports started, by format.')
+metrics.describe('result_cache_lookups_total', 'Result cache lookups on /api/upload, by result.')
+metrics.describe('job_queue_wait_seconds', 'Time analysis jobs spend queued before a worker picks them up.')
+metrics.describe('analysis_jobs_total', 'Background analysis jobs finished, by status.')
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+# Bump whenever the shape or meaning of the /api/upload payload or of the saved
+# dataset aggregates changes, so stale entries are never served or appended to.
+ANALYSIS_VERSION = 9
+
+
+def make_cache_key(content_hash, params=None):
+    """Combine the hash of the uploaded bytes with the analysis parameters."""
+    params = dict(params or {})
+    params['analysis_version'] = ANALYSIS_VERSION
+    encoded = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{content_hash}:{encoded}".encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of full analysis payloads with LRU and size-based eviction.
+
+    Every entry is a single JSON file named after its key. The file mtime is
+    bumped on each hit, so evicting the oldest mtimes first gives LRU order
+    that is shared by every worker process using the same folder.
+    """
+
+    def __init__(self, folder, max_entries=256, max_bytes=200 * 1024 * 1024):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path, None)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._count('stores')
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        evicted = 0
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, name = entries.pop(0)
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            total_bytes -= size
+            evicted += 1
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += evicted
+        return evicted
+
+    def clear(self):
+        for _, _, name in self._entries():
+            try:
+                os.remove(os.path.join(self.folder, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        entries = self._entries()
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache(config):
+    """Return the process-wide cache configured from the Flask config."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                config['RESULT_CACHE_FOLDER'],
+                max_entries=config['RESULT_CACHE_MAX_ENTRIES'],
+                max_bytes=config['RESULT_CACHE_MAX_BYTES'],
+            )
+        return _cache
@@ -0,0 +1,175 @@
+import gzip
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from app.utils.phrase_engine import tokenize
+
+_COUNTS_FILE = 'index-counts.npz'
+_TERMS_FILE = 'index-terms.json.gz'
+
+# Loaded dataset indexes kept per process
+_CACHE_ENTRIES = 4
+
+
+def estimate_tokens(text):
+    """Rough model token count for budgeting prompt text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+class ReviewIndex:
+    """TF-IDF retrieval over reviews backed by a sparse term-count matrix.
+
+    Row ``i`` holds the unigram counts of the ``i``-th cleaned review, in the
+    order the reviews were stored, so search results are dataset row
+    positions. Only raw counts are kept; IDF weights and row norms are
+    derived on the first search, which lets appends add rows without
+    rescoring the existing ones.
+    """
+
+    def __init__(self, terms=None, counts=None):
+        self.terms = list(terms or [])
+        self._vocabulary = {term: col for col, term in enumerate(self.terms)}
+        self._blocks = [counts] if counts is not None and counts.shape[0] else []
+        self._prepared = None
+
+    @property
+    def size(self):
+        return sum(block.shape[0] for block in self._blocks)
+
+    def add_tokens(self, token_lists):
+        """Append one row per review from already tokenized text."""
+        vocabulary = self._vocabulary
+        indices = []
+        indptr = [0]
+        for tokens in token_lists:
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is None:
+                    col = vocabulary[token] = len(self.terms)
+                    self.terms.append(token)
+                indices.append(col)
+            indptr.append(len(indices))
+        if len(indptr) == 1:
+            return
+        block = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(indptr) - 1, len(self.terms))
+        )
+        block.sum_duplicates()
+        self._blocks.append(block)
+        self._prepared = None
+
+    def checkpoint(self):
+        return len(self._blocks), len(self.terms)
+
+    def rollback(self, checkpoint):
+        """Drop every row and term added since ``checkpoint()``."""
+        n_blocks, n_terms = checkpoint
+        del self._blocks[n_blocks:]
+        for term in self.terms[n_terms:]:
+            del self._vocabulary[term]
+        del self.terms[n_terms:]
+        self._prepared = None
+
+    def counts(self):
+        """All rows as a single CSR matrix over the full vocabulary."""
+        n_terms = len(self.terms)
+        if not self._blocks:
+            return sparse.csr_matrix((0, n_terms), dtype=np.float32)
+        for block in self._blocks:
+            if block.shape[1] != n_terms:
+                block.resize((block.shape[0], n_terms))
+        if len(self._blocks) > 1:
+            self._blocks = [sparse.vstack(self._blocks, format='csr')]
+        return self._blocks[0]
+
+    def _prepare(self):
+        if self._prepared is None:
+            counts = self.counts()
+            n_docs = counts.shape[0]
+            doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+            idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+            weights = np.log1p(counts.data) * idf[counts.indices]
+            rows = np.repeat(np.arange(n_docs), np.diff(counts.indptr))
+            norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_docs))
+            norms[norms == 0] = 1.0
+            weighted = sparse.csr_matrix(
+                ((weights / norms[rows]).astype(np.float32), counts.indices, counts.indptr), shape=counts.shape
+            )
+            # Questions touch a handful of terms; column slices are cheap in CSC
+            self._prepared = (idf, weighted.tocsc())
+        return self._prepared
+
+    def search(self, question, stop_words, k=8):
+        """The ``k`` reviews most similar to ``question`` as ``[(position, score)]``, best first."""
+        cols = sorted({self._vocabulary[token] for token in tokenize(question, stop_words)
+                       if token in self._vocabulary})
+        if not cols or not self.size:
+            return []
+        idf, weighted = self._prepare()
+        scores = weighted[:, cols] @ idf[cols]
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(int(position), float(scores[position])) for position in order]
+
+    def save(self, folder):
+        """Write the index next to a dataset; files are replaced atomically."""
+        suffix = f".{uuid.uuid4().hex}.tmp"
+        counts_path = os.path.join(folder, _COUNTS_FILE)
+        terms_path = os.path.join(folder, _TERMS_FILE)
+        with gzip.open(terms_path + suffix, 'wt', encoding='utf-8') as f:
+            json.dump(self.terms, f)
+        with open(counts_path + suffix, 'wb') as f:
+            sparse.save_npz(f, self.counts())
+        os.replace(terms_path + suffix, terms_path)
+        os.replace(counts_path + suffix, counts_path)
+
+    @classmethod
+    def load(cls, folder):
+        """The index saved in ``folder``, or None when it is missing or incomplete."""
+        try:
+            with gzip.open(os.path.join(folder, _TERMS_FILE), 'rt', encoding='utf-8') as f:
+                terms = json.load(f)
+            counts = sparse.load_npz(os.path.join(folder, _COUNTS_FILE)).tocsr()
+        except (OSError, ValueError):
+            return None
+        if counts.shape[1] != len(terms):
+            return None
+        return cls(terms, counts)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def get_dataset_index(datasets, dataset_id):
+    """The stored index of a dataset, or None when it has none or it lags behind the data.
+
+    Loaded indexes are cached per process and reloaded after an append.
+    """
+    folder = datasets.path(dataset_id)
+    try:
+        version = (os.path.getmtime(os.path.join(folder, _COUNTS_FILE)), len(datasets.parts(dataset_id)))
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(dataset_id)
+        if cached is not None and cached[0] == version:
+            _cache.move_to_end(dataset_id)
+            return cached[1]
+    index = ReviewIndex.load(folder)
+    if index is None or index.size != datasets.info(dataset_id)['rows']:
+        return None
+    with _cache_lock:
+        _cache[dataset_id] = (version, index)
+        while len(_cache) > _CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return index
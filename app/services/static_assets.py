@@ -0,0 +1,163 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, send_file
+
+# Vite writes content-hashed bundles (e.g. assets/index-BzX3kq9L.js); they never change under the same name
+_HASHED_NAME = re.compile(r'^assets/.+[.-][0-9A-Za-z_-]{8,}\.[0-9a-z]+$')
+# Precompressed variants, in order of preference
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Compressed copies must be at least 10% smaller to be kept
+_MIN_SAVING = 0.9
+_COMPRESSIBLE = ('.html', '.js', '.mjs', '.css', '.json', '.svg', '.txt', '.xml', '.map', '.ico', '.wasm')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+class StaticAsset:
+    def __init__(self, path, mimetype, etag, immutable, variants, data=None):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.immutable = immutable
+        # encoding -> file path, or -> bytes for assets held in memory
+        self.variants = variants
+        self.data = data
+
+
+class StaticAssets:
+    """The built frontend (``dist/``) served from a manifest built once per process.
+
+    Every file is hashed for its ETag up front, so a request costs a dict
+    lookup instead of filesystem checks. Content-hashed bundles are cached
+    by browsers for a year; everything else, index.html included, is
+    revalidated with the ETag. ``.br``/``.gz`` files written next to an
+    asset (see ``precompress_static.py``) are served to clients that accept
+    them. index.html is kept in memory together with a gzipped copy.
+
+    With ``reload`` the manifest is rebuilt whenever index.html changes,
+    which is what a new frontend build does.
+    """
+
+    def __init__(self, folder, reload=False):
+        self.folder = folder
+        self.reload = reload
+        self._manifest = None
+        self._index_mtime = None
+        self._lock = threading.Lock()
+
+    def _index_path(self):
+        return os.path.join(self.folder, 'index.html')
+
+    def _scan(self):
+        manifest = {}
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(tuple(suffix for _, suffix in _ENCODINGS)):
+                    continue
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    data = f.read()
+                variants = {encoding: path + suffix for encoding, suffix in _ENCODINGS
+                            if os.path.exists(path + suffix)}
+                asset = StaticAsset(
+                    path,
+                    mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    hashlib.sha1(data).hexdigest()[:20],
+                    bool(_HASHED_NAME.match(rel_path)),
+                    variants
+                )
+                if rel_path == 'index.html':
+                    asset.data = data
+                    compressed = gzip.compress(data, 9)
+                    asset.variants = {'gzip': compressed} if len(compressed) < len(data) * _MIN_SAVING else {}
+                manifest[rel_path] = asset
+        return manifest
+
+    def manifest(self):
+        with self._lock:
+            if self._manifest is None or self.reload:
+                try:
+                    index_mtime = os.stat(self._index_path()).st_mtime_ns
+                except OSError:
+                    index_mtime = None
+                if self._manifest is None or index_mtime != self._index_mtime:
+                    self._manifest = self._scan() if os.path.isdir(self.folder) else {}
+                    self._index_mtime = index_mtime
+            return self._manifest
+
+    def serve(self, rel_path, request):
+        """The response for ``rel_path``, or None when the build has no such file."""
+        asset = self.manifest().get(rel_path)
+        if asset is None:
+            return None
+
+        encoding = next((encoding for encoding, _ in _ENCODINGS
+                         if encoding in asset.variants and request.accept_encodings[encoding]), None)
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif asset.data is not None:
+            response = Response(asset.variants[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+        else:
+            response = send_file(asset.variants[encoding] if encoding else asset.path, mimetype=asset.mimetype,
+                                 conditional=False, etag=False, max_age=None)
+            # send_file names the .gz/.br file; the client asked for the asset itself
+            response.headers.pop('Content-Disposition', None)
+        if encoding and response.status_code == 200:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+def precompress(folder, min_size=1024):
+    """Write ``.gz`` (and ``.br`` when the brotli package is installed) next to compressible files.
+
+    Returns the number of variants written.
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    written = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(_COMPRESSIBLE):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            variants = [('.gz', gzip.compress(data, 9))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for suffix, compressed in variants:
+                # Not worth a second file when compression barely helps
+                if len(compressed) < len(data) * _MIN_SAVING:
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def get_static_assets(config):
+    """Return the process-wide static asset manifest configured from the Flask config."""
+    global _assets
+    with _assets_lock:
+        if _assets is None or _assets.folder != config['DIST_FOLDER']:
+            _assets = StaticAssets(config['DIST_FOLDER'], reload=config['STATIC_RELOAD'])
+        return _assets
@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Leftover temp files from interrupted uploads are removed after this long
+_STALE_TMP_SECONDS = 3600
+
+
+class UploadStore:
+    """Uploaded files stored once per content hash, with names kept as metadata.
+
+    Uploads stream to a temp file while their sha256 is computed; the bytes
+    then become ``blobs/<hh>/<sha256>.csv`` unless that blob already exists,
+    in which case the copy is dropped. Every upload adds a row to a SQLite
+    ``uploads`` table (hash, original name, time), so the names survive
+    without extra copies. ``compact`` applies the retention policy: blobs
+    unused for ``max_age`` seconds go first, then the least recently used
+    until the store fits in ``max_bytes``. Blobs used within ``grace``
+    seconds are never removed, so an analysis still reading one is safe.
+    """
+
+    def __init__(self, folder, max_bytes=2 * 1024 ** 3, max_age=30 * 24 * 3600, grace=3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace
+        self._local = threading.local()
+        self._stats = {'stored': 0, 'deduplicated': 0, 'evicted': 0}
+        self._stats_lock = threading.Lock()
+        os.makedirs(os.path.join(folder, 'tmp'), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads (id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT NOT NULL, "
+            "filename TEXT NOT NULL, uploaded_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS uploads_hash ON uploads (hash)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.folder, 'uploads.sqlite3'), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.folder, 'blobs', content_hash[:2], f"{content_hash}.csv")
+
+    def save(self, stream, filename, block_size=1024 * 1024):
+        """Store the bytes of ``stream`` under ``filename``; returns ``(path, sha256, deduplicated)``."""
+        tmp_path = os.path.join(self.folder, 'tmp', uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    block = stream.read(block_size)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+            content_hash = digest.hexdigest()
+            path = self.blob_path(content_hash)
+            now = time.time()
+            conn = self._connect()
+            # The write lock keeps compaction (in any process) from removing the blob in between
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO blobs (hash, size, created_at, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(hash) DO UPDATE SET last_used = excluded.last_used",
+                    (content_hash, size, now, now)
+                )
+                deduplicated = os.path.exists(path)
+                if deduplicated:
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                conn.execute("INSERT INTO uploads (hash, filename, uploaded_at) VALUES (?, ?, ?)",
+                             (content_hash, filename, now))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._stats_lock:
+            self._stats['deduplicated' if deduplicated else 'stored'] += 1
+        return path, content_hash, deduplicated
+
+    def names(self, content_hash):
+        """Every (filename, uploaded_at) this content was uploaded as, oldest first."""
+        return self._connect().execute(
+            "SELECT filename, uploaded_at FROM uploads WHERE hash = ? ORDER BY id", (content_hash,)
+        ).fetchall()
+
+    def _evict(self, conn, content_hash, used_before):
+        """Remove a blob unless it was used again since it was picked."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute("DELETE FROM blobs WHERE hash = ? AND last_used < ?",
+                                   (content_hash, used_before)).rowcount
+            if deleted:
+                conn.execute("DELETE FROM uploads WHERE hash = ?", (content_hash,))
+                try:
+                    os.remove(self.blob_path(content_hash))
+                except FileNotFoundError:
+                    pass
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return bool(deleted)
+
+    def compact(self):
+        """Apply the age and size limits and clear stale temp files; returns the blobs removed."""
+        now = time.time()
+        protected = now - self.grace
+        conn = self._connect()
+        cutoff = min(now - self.max_age, protected)
+        expired = [row[0] for row in conn.execute("SELECT hash FROM blobs WHERE last_used < ?", (cutoff,))]
+        evicted = sum(self._evict(conn, content_hash, cutoff) for content_hash in expired)
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total > self.max_bytes:
+            for content_hash, size in conn.execute(
+                "SELECT hash, size FROM blobs WHERE last_used < ? ORDER BY last_used", (protected,)
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if self._evict(conn, content_hash, protected):
+                    total -= size
+                    evicted += 1
+
+        tmp_folder = os.path.join(self.folder, 'tmp')
+        for name in os.listdir(tmp_folder):
+            path = os.path.join(tmp_folder, name)
+            try:
+                if os.path.getmtime(path) < now - _STALE_TMP_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
+        with self._stats_lock:
+            self._stats['evicted'] += evicted
+        if evicted:
+            logger.info("Upload store compaction removed %d blobs", evicted)
+        return evicted
+
+    def stats(self):
+        conn = self._connect()
+        blobs, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        uploads, uploaded_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(blobs.size), 0) FROM uploads JOIN blobs USING (hash)"
+        ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(blobs=blobs, bytes=size, uploads=uploads, uploaded_bytes=uploaded_bytes)
+        return stats
+
+
+def _compaction_loop(store, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            store.compact()
+        except Exception:
+            logger.exception("Upload store compaction failed")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_upload_store(config):
+    """Return the process-wide upload store, starting its background compaction on first use."""
+    global _store
+    with _store_lock:
+        if _store is None or _store.folder != config['UPLOAD_STORE_FOLDER']:
+            _store = UploadStore(
+                config['UPLOAD_STORE_FOLDER'],
+                max_bytes=config['UPLOAD_STORE_MAX_BYTES'],
+                max_age=config['UPLOAD_STORE_MAX_AGE'],
+                grace=config['UPLOAD_STORE_GRACE'],
+            )
+            interval = config['UPLOAD_STORE_COMPACT_INTERVAL']
+            if interval > 0:
+                threading.Thread(target=_compaction_loop, args=(_store, interval),
+                                 name='upload-store-compaction', daemon=True).start()
+        return _store
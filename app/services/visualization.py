@@ -1,23 +1,21 @@
+from app.services.aggregation import aggregate_sentiment
 
-def prepare_chart_data(df):
-    positive_df = df[df['sentiment'] == 'positive']
-    negative_df = df[df['sentiment'] == 'negative']
-    neutral_df = df[df['sentiment'] == 'neutral']
+def prepare_chart_data(df, aggregate=None):
+    if aggregate is None:
+        aggregate = aggregate_sentiment(df)
+    counts = aggregate.counts
 
     return {
         'sentiment': {
             'labels': ['Positive', 'Negative'],
-            'means': [
-                positive_df['sentiment_score'].mean() if not positive_df.empty else 0,
-                negative_df['sentiment_score'].mean() if not negative_df.empty else 0
-            ]
+            'means': [aggregate.mean('positive'), aggregate.mean('negative')]
         },
         'counts': {
             'labels': ['Positive', 'Negative'],
-            'values': [len(positive_df), len(negative_df)]
+            'values': [counts['positive'], counts['negative']]
         },
         'distribution': {
             'labels': ['Positive', 'Neutral', 'Negative'],
-            'values': [len(positive_df), len(neutral_df), len(negative_df)]
+            'values': [counts['positive'], counts['neutral'], counts['negative']]
         }
     }
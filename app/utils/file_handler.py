@@ -1,18 +1,11 @@
-
-import os
 import pandas as pd
+from app.utils.xlsx_stream import iter_xlsx
 
-def ensure_upload_folder(upload_folder):
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-
-def save_uploaded_file(file):
-    if file.filename == '':
-        raise ValueError("No selected file")
-    ensure_upload_folder('uploads')
-    file_path = os.path.join('uploads', file.filename)
-    file.save(file_path)
-    return file_path
+def write_excel_report(frames, filename, columns, sheet_name='Reviews'):
+    """Write the DataFrames of ``frames`` one after another as a single table, one frame in memory at a time."""
+    with open(filename, 'wb') as f:
+        for chunk in iter_xlsx(frames, columns, sheet_name):
+            f.write(chunk)
 
 def generate_excel_report(df, filename):
-    df.to_excel(filename, index=False)
+    write_excel_report([df], filename, df.columns)
@@ -1,34 +1,131 @@
+import threading
 
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.corpus import stopwords
-from collections import Counter
+from app.utils.sentiment_engine import label_sentiments
+from app.utils.phrase_engine import PhraseCounter, tokenize
+from app.utils.score_store import text_key
+import numpy as np
 
-# Initialize NLTK components
-try:
-    nltk.download('stopwords', quiet=True)
-    nltk.download('vader_lexicon', quiet=True)
-    nltk.download('punkt', quiet=True)
-except:
-    pass
+# NLTK data the analysis needs, as (download name, nltk.data path)
+NLTK_RESOURCES = [
+    ('vader_lexicon', 'sentiment/vader_lexicon.zip'),
+    ('stopwords', 'corpora/stopwords'),
+]
 
-sia = SentimentIntensityAnalyzer()
-stop_words = set(stopwords.words('english'))
-stop_words.update(["a", "an", "the", "is", "are", "to", "in", "of", "and", "for", "on", "with"])
+_engine = None
+_stop_words = None
+_init_lock = threading.Lock()
 
-def analyze_sentiment(df, text_column='Reviews'):
+def missing_nltk_resources():
+    """Names of required NLTK resources not found locally; never touches the network."""
+    import nltk
+
+    missing = []
+    for name, path in NLTK_RESOURCES:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+def download_nltk_resources(quiet=True):
+    import nltk
+
+    for name in missing_nltk_resources():
+        nltk.download(name, quiet=quiet)
+    return missing_nltk_resources()
+
+def build_stop_words():
+    from nltk.corpus import stopwords
+
+    words = set(stopwords.words('english'))
+    words.update(["a", "an", "the", "is", "are", "to", "in", "of", "and", "for", "on", "with"])
+    return words
+
+def get_sentiment_engine():
+    """The batch VADER engine, built on first use."""
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                from nltk.sentiment import SentimentIntensityAnalyzer
+                from app.utils.sentiment_engine import BatchSentimentEngine
+                _engine = BatchSentimentEngine(SentimentIntensityAnalyzer())
+    return _engine
+
+def get_stop_words():
+    global _stop_words
+    if _stop_words is None:
+        with _init_lock:
+            if _stop_words is None:
+                _stop_words = build_stop_words()
+    return _stop_words
+
+def warm_up():
+    """Build the analyzer and stop words now, e.g. before forking server workers."""
+    get_sentiment_engine()
+    get_stop_words()
+
+def _use_parallel(n_items, workers, chunk_size):
+    return workers and workers > 1 and n_items > chunk_size
+
+def sentiment_scores(texts, workers=0, chunk_size=5000):
+    if _use_parallel(len(texts), workers, chunk_size):
+        from app.utils.parallel import parallel_compound_scores
+        return parallel_compound_scores(list(texts), workers, chunk_size)
+    return get_sentiment_engine().compound_scores(texts)
+
+def cached_scores_and_tokens(texts, store, workers=0, chunk_size=5000):
+    """Compound scores and phrase tokens for ``texts``, computing only store misses.
+
+    Returns a float array of scores and a list of token lists aligned with
+    ``texts``; newly computed results are written back to ``store``.
+    """
+    texts = list(texts)
+    keys = [text_key(text) for text in texts]
+    found = store.lookup(set(keys))
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        miss_texts = list(missing.values())
+        miss_scores = sentiment_scores(miss_texts, workers=workers, chunk_size=chunk_size)
+        stop_words = get_stop_words()
+        new_entries = [(key, score, tokenize(text, stop_words))
+                       for key, text, score in zip(missing, miss_texts, miss_scores)]
+        store.store(new_entries)
+        for key, score, tokens in new_entries:
+            found[key] = (score, tokens)
+
+    scores = np.fromiter((found[key][0] for key in keys), dtype=float, count=len(keys))
+    return scores, [found[key][1] for key in keys]
+
+def analyze_sentiment(df, text_column='Reviews', workers=0, chunk_size=5000):
     df[text_column] = df[text_column].astype(str).replace('nan', '')
-    df['sentiment_score'] = df[text_column].apply(lambda x: sia.polarity_scores(x)['compound'])
-    df['sentiment'] = df['sentiment_score'].apply(
-        lambda x: 'positive' if x > 0.05 else 'negative' if x < -0.05 else 'neutral'
-    )
+    scores = sentiment_scores(df[text_column], workers=workers, chunk_size=chunk_size)
+    df['sentiment_score'] = scores
+    df['sentiment'] = label_sentiments(scores)
     return df
 
-def extract_common_phrases(reviews):
-    phrases = []
-    for review in reviews:
-        review_str = str(review).lower()
-        tokens = nltk.word_tokenize(review_str)
-        filtered_tokens = [token for token in tokens if token not in stop_words and token.isalpha()]
-        phrases.extend(filtered_tokens)
-    return Counter(phrases).most_common(10)
+def count_phrases(reviews, labels=None, ngram_range=(1, 1), stop_words=None):
+    if stop_words is None:
+        stop_words = get_stop_words()
+    return PhraseCounter(stop_words, ngram_range).add(reviews, labels)
+
+def phrase_counts(reviews, labels=None, workers=0, chunk_size=5000, ngram_range=(1, 1), into=None):
+    """Count phrases of ``reviews`` (optionally per label) into a PhraseCounter.
+
+    Pass ``into`` to accumulate into an existing counter across chunks.
+    """
+    reviews = list(reviews)
+    if _use_parallel(len(reviews), workers, chunk_size):
+        from app.utils.parallel import parallel_count_phrases
+        counts = parallel_count_phrases(reviews, labels, workers, chunk_size, ngram_range)
+        return into.merge(counts) if into is not None else counts
+    if into is not None:
+        return into.add(reviews, labels)
+    return count_phrases(reviews, labels, ngram_range)
+
+def extract_common_phrases(reviews, top_n=10, workers=0, chunk_size=5000, ngram_range=(1, 1)):
+    return phrase_counts(reviews, workers=workers, chunk_size=chunk_size, ngram_range=ngram_range).top(top_n)
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Per-process state, built once by the pool initializer in every worker
+_worker_state = {}
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    # Forked workers inherit the parent's already-built engine and stop words
+    from app.utils.nlp_processor import get_sentiment_engine, get_stop_words
+
+    _worker_state['engine'] = get_sentiment_engine()
+    _worker_state['stop_words'] = get_stop_words()
+
+
+def _score_chunk(texts):
+    return _worker_state['engine'].compound_scores(texts)
+
+
+def _count_chunk(reviews, labels, ngram_range):
+    from app.utils.nlp_processor import count_phrases
+    return count_phrases(reviews, labels, ngram_range, stop_words=_worker_state['stop_words'])
+
+
+def get_executor(workers):
+    """Return the shared process pool, (re)creating it for a new worker count."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_executor():
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = None
+        _executor_workers = 0
+
+
+def _chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def parallel_compound_scores(texts, workers, chunk_size):
+    """Score texts across the process pool; output order matches the input."""
+    parts = list(get_executor(workers).map(_score_chunk, _chunks(texts, chunk_size)))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=float)
+
+
+def parallel_count_phrases(reviews, labels, workers, chunk_size, ngram_range=(1, 1)):
+    """Count phrases across the process pool into one PhraseCounter.
+
+    Chunk counters are merged in input order so that ties in the top-k
+    break exactly as they do on the serial path.
+    """
+    from app.utils.nlp_processor import get_stop_words
+    from app.utils.phrase_engine import PhraseCounter
+
+    review_chunks = _chunks(reviews, chunk_size)
+    label_chunks = _chunks(np.asarray(labels), chunk_size) if labels is not None else [None] * len(review_chunks)
+    counts = PhraseCounter(get_stop_words(), ngram_range)
+    parts = get_executor(workers).map(
+        _count_chunk, review_chunks, label_chunks, [ngram_range] * len(review_chunks)
+    )
+    for part in parts:
+        counts.merge(part)
+    return counts
@@ -0,0 +1,95 @@
+import heapq
+import re
+from collections import Counter
+from operator import itemgetter
+
+from app.utils.sentiment_engine import SENTIMENT_LABELS
+
+# Runs of letters (any script), joined across apostrophes so "don't" stays one
+# token; digits, underscores and other punctuation split tokens
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+
+def words(text):
+    """Lower-case alphabetic tokens of ``text``; typographic apostrophes count as plain ones."""
+    return TOKEN_PATTERN.findall(str(text).lower().replace('\u2019', "'"))
+
+
+def tokenize(text, stop_words):
+    """Lower-case alphabetic tokens of ``text`` with stop words removed."""
+    return [token for token in words(text) if token not in stop_words]
+
+
+def make_ngrams(tokens, ngram_range=(1, 1)):
+    """Unigrams plus optional bigrams/trigrams, joined with spaces."""
+    low, high = ngram_range
+    if low == high == 1:
+        return tokens
+    grams = []
+    for n in range(low, high + 1):
+        if n == 1:
+            grams.extend(tokens)
+        else:
+            grams.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return grams
+
+
+class PhraseCounter:
+    """Incremental phrase counts over all reviews and per sentiment label.
+
+    Each review is tokenized once and its n-grams are added to the overall
+    counter and to the counter of its label, so common, positive and
+    negative phrases come out of a single pass. Counters from separate
+    chunks are combined with ``merge``.
+    """
+
+    def __init__(self, stop_words, ngram_range=(1, 1)):
+        self.stop_words = stop_words
+        self.ngram_range = tuple(ngram_range)
+        self.total = Counter()
+        self.by_label = {label: Counter() for label in SENTIMENT_LABELS}
+
+    def add_tokens(self, token_lists, labels=None):
+        if labels is None:
+            for tokens in token_lists:
+                self.total.update(make_ngrams(tokens, self.ngram_range))
+            return self
+        for tokens, label in zip(token_lists, labels):
+            grams = make_ngrams(tokens, self.ngram_range)
+            self.total.update(grams)
+            self.by_label[label].update(grams)
+        return self
+
+    def add(self, texts, labels=None):
+        stop_words = self.stop_words
+        return self.add_tokens((tokenize(text, stop_words) for text in texts), labels)
+
+    def merge(self, other):
+        self.total.update(other.total)
+        for label, counts in other.by_label.items():
+            self.by_label[label].update(counts)
+        return self
+
+    def to_state(self):
+        # Plain dicts keep insertion order, so top-k ties still break by first occurrence
+        return {
+            "ngram_range": list(self.ngram_range),
+            "total": dict(self.total),
+            "by_label": {label: dict(counts) for label, counts in self.by_label.items()}
+        }
+
+    @classmethod
+    def from_state(cls, state, stop_words):
+        counter = cls(stop_words, state['ngram_range'])
+        counter.total = Counter(state['total'])
+        for label, counts in state['by_label'].items():
+            counter.by_label[label] = Counter(counts)
+        return counter
+
+    def top(self, k=10, label=None):
+        """The ``k`` most frequent phrases as (phrase, count) pairs.
+
+        Ties keep first-seen order, exactly like ``Counter.most_common``.
+        """
+        counts = self.total if label is None else self.by_label[label]
+        return heapq.nlargest(k, counts.items(), key=itemgetter(1))
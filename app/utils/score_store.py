@@ -0,0 +1,136 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite caps the number of bound parameters per statement
+_BATCH = 500
+# Part of every key; bump it when the stored tokens change, so rows tokenized
+# the old way are never read and age out of the table
+_KEY_VERSION = b'tokens-v2'
+
+
+def normalize_text(text):
+    """Collapse whitespace; VADER and the phrase tokenizer both ignore it."""
+    return ' '.join(str(text).split())
+
+
+def text_key(text):
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16, person=_KEY_VERSION).digest()
+
+
+class ScoreStore:
+    """Persistent per-review cache of VADER compound scores and phrase tokens.
+
+    Rows are keyed by a hash of the whitespace-normalized review text, so a
+    review seen in any earlier upload is never scored or tokenized again.
+    When the table grows past ``max_entries`` the least recently used rows
+    are deleted.
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key BLOB PRIMARY KEY, compound REAL NOT NULL, tokens TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        conn.commit()
+        self._entries = conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, keys):
+        """Return ``{key: (compound, tokens)}`` for the keys already stored."""
+        keys = list(keys)
+        conn = self._connect()
+        found = {}
+        for i in range(0, len(keys), _BATCH):
+            batch = keys[i:i + _BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(
+                f"SELECT key, compound, tokens FROM scores WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, compound, tokens in rows:
+                found[key] = (compound, tokens.split(' ') if tokens else [])
+        if found:
+            now = time.time()
+            hit_keys = list(found)
+            for i in range(0, len(hit_keys), _BATCH):
+                batch = hit_keys[i:i + _BATCH]
+                placeholders = ','.join('?' * len(batch))
+                conn.execute(f"UPDATE scores SET last_used = ? WHERE key IN ({placeholders})", [now] + batch)
+            conn.commit()
+        with self._lock:
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(keys) - len(found)
+        return found
+
+    def store(self, entries):
+        """Insert ``(key, compound, tokens)`` rows, then evict if over capacity."""
+        now = time.time()
+        conn = self._connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO scores (key, compound, tokens, last_used) VALUES (?, ?, ?, ?)",
+            [(key, float(compound), ' '.join(tokens), now) for key, compound, tokens in entries]
+        )
+        conn.commit()
+        with self._lock:
+            self._entries += len(entries)
+            over = self._entries > self.max_entries
+        if over:
+            self.evict()
+
+    def evict(self):
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        # Trim to 90% so eviction does not run on every subsequent insert
+        excess = entries - int(self.max_entries * 0.9)
+        evicted = 0
+        if excess > 0 and entries > self.max_entries:
+            conn.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            conn.commit()
+            evicted = excess
+        with self._lock:
+            self._entries = entries - evicted
+            self._stats['evictions'] += evicted
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = self._entries
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_score_store(config):
+    """Return the process-wide score store configured from the Flask config."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScoreStore(config['SCORE_STORE_PATH'], max_entries=config['SCORE_STORE_MAX_ENTRIES'])
+        return _store
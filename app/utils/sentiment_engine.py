@@ -0,0 +1,139 @@
+import re
+import string
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+SENTIMENT_LABELS = ('positive', 'negative', 'neutral')
+
+_PUNCT = re.escape(string.punctuation)
+# A whitespace token that VADER maps to its bare word: one run of punctuation
+# on exactly one side of a punctuation-free word of two or more characters.
+_LEADING_PUNC = re.compile(rf"([{_PUNCT}]+)([^{_PUNCT}]{{2,}})")
+_TRAILING_PUNC = re.compile(rf"([^{_PUNCT}]{{2,}})([{_PUNCT}]+)")
+
+
+def label_sentiments(scores):
+    """Bucket compound scores into a positive/negative/neutral Categorical."""
+    scores = np.asarray(scores, dtype=float)
+    codes = np.select(
+        [scores > POSITIVE_THRESHOLD, scores < NEGATIVE_THRESHOLD],
+        [0, 1],
+        default=2
+    )
+    return pd.Categorical.from_codes(codes, categories=SENTIMENT_LABELS)
+
+
+class BatchSentimentEngine:
+    """Score whole columns of texts with VADER, returning compound scores.
+
+    The results are identical to ``SentimentIntensityAnalyzer.polarity_scores``
+    but the work is organised for batches:
+
+    * duplicate texts are scored once (``pd.factorize``);
+    * the lexicon is precompiled into a hashed index of every token form VADER
+      can map onto a lexicon entry, so texts with no sentiment-laden token are
+      resolved to 0.0 with one vectorised lookup over the exploded tokens;
+    * the remaining texts skip the pos/neg/neu breakdown and VADER's costly
+      punctuation/word cross product when splitting words.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.constants = analyzer.constants
+        self.punc_list = frozenset(self.constants.PUNC_LIST)
+        self.trigger_tokens = self._compile_lexicon(analyzer.lexicon, self.constants.PUNC_LIST)
+        # An Index keeps its hash table between calls, unlike Series.isin(set)
+        self.trigger_index = pd.Index(sorted(self.trigger_tokens), dtype=object)
+
+    @staticmethod
+    def _compile_lexicon(lexicon, punc_list):
+        triggers = set()
+        for word in lexicon:
+            word = word.lower()
+            triggers.add(word)
+            for punc in punc_list:
+                triggers.add(punc + word)
+                triggers.add(word + punc)
+        return frozenset(triggers)
+
+    def _words_and_emoticons(self, text):
+        words = []
+        for token in text.split():
+            if len(token) <= 1:
+                continue
+            match = _LEADING_PUNC.fullmatch(token)
+            if match and match.group(1) in self.punc_list:
+                token = match.group(2)
+            else:
+                match = _TRAILING_PUNC.fullmatch(token)
+                if match and match.group(2) in self.punc_list:
+                    token = match.group(1)
+            words.append(token)
+        return words
+
+    def compound(self, text):
+        """Compound score of a single text, equal to ``polarity_scores(text)['compound']``."""
+        if not isinstance(text, str):
+            text = str(text.encode('utf-8'))
+        sia = self.analyzer
+        words = self._words_and_emoticons(text)
+        allcaps = sum(1 for word in words if word.isupper())
+        sentitext = SimpleNamespace(
+            words_and_emoticons=words,
+            is_cap_diff=0 < len(words) - allcaps < len(words)
+        )
+
+        # VADER looks up each item's position with list.index, i.e. the
+        # first occurrence; keep that behaviour so the scores stay identical.
+        first_index = {}
+        for i, word in enumerate(words):
+            first_index.setdefault(word, i)
+
+        sentiments = []
+        boosters = self.constants.BOOSTER_DICT
+        for item in words:
+            i = first_index[item]
+            item_lower = item.lower()
+            if (i < len(words) - 1 and item_lower == 'kind' and words[i + 1].lower() == 'of') \
+                    or item_lower in boosters:
+                sentiments.append(0)
+                continue
+            sentiments = sia.sentiment_valence(0, sentitext, item, i, sentiments)
+
+        sentiments = sia._but_check(words, sentiments)
+        if not sentiments:
+            return 0.0
+
+        sum_s = float(sum(sentiments))
+        punct_emph_amplifier = sia._punctuation_emphasis(sum_s, text)
+        if sum_s > 0:
+            sum_s += punct_emph_amplifier
+        elif sum_s < 0:
+            sum_s -= punct_emph_amplifier
+        return round(self.constants.normalize(sum_s), 4)
+
+    def compound_scores(self, texts):
+        """Return the compound score of every text as a float64 NumPy array."""
+        texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+        scores = np.zeros(len(texts), dtype=float)
+        if texts.empty:
+            return scores
+
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        uniques = pd.Series(uniques, dtype=object).astype(str)
+
+        tokens = uniques.str.lower().str.split().explode()
+        hits = pd.Series(self.trigger_index.get_indexer(tokens.to_numpy()) >= 0, index=tokens.index)
+        has_trigger = hits.groupby(level=0).any()
+        has_trigger = has_trigger.reindex(range(len(uniques)), fill_value=False).to_numpy()
+
+        unique_scores = np.zeros(len(uniques), dtype=float)
+        for idx in np.flatnonzero(has_trigger):
+            unique_scores[idx] = self.compound(uniques.iat[idx])
+
+        scores[:] = unique_scores[codes]
+        return scores
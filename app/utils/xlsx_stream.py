@@ -0,0 +1,190 @@
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_numeric_dtype
+
+# Rows per worksheet, header included; longer tables continue on another sheet
+EXCEL_MAX_ROWS = 1048576
+# Excel refuses longer cell text
+EXCEL_MAX_CHARS = 32767
+# Control characters XML 1.0 does not allow anywhere
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_SHEET_START = f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}"><sheetData>'.encode('utf-8')
+_SHEET_END = b'</sheetData></worksheet>'
+# Style 1 is the bold header
+_STYLES = (
+    f'{_XML_HEADER}<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _Sink:
+    """Write-only file object collecting what zipfile writes until it is drained.
+
+    It has no ``tell``/``seek``, so zipfile streams every entry with a data
+    descriptor instead of going back to patch the local header.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def column_letter(index):
+    """Spreadsheet column name of a 0-based column index (0 -> A, 26 -> AA)."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _text(values):
+    text = values.astype(str).str.slice(0, EXCEL_MAX_CHARS)
+    if text.str.contains(_ILLEGAL_XML).any():
+        text = text.str.replace(_ILLEGAL_XML, '', regex=True)
+    return (text.str.replace('&', '&amp;', regex=False).str.replace('<', '&lt;', regex=False)
+            .str.replace('>', '&gt;', regex=False))
+
+
+def _cells(values, ref):
+    """The ``<c>`` element of every value of one column; missing values give an empty string."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    if is_bool_dtype(values) or (values.dtype == object and infer_dtype(values, skipna=True) == 'boolean'):
+        present = values.notna().to_numpy()
+        cells = ref + '" t="b"><v>' + values.map({True: '1', False: '0'}).fillna('') + '</v></c>'
+    elif is_numeric_dtype(values):
+        numbers = pd.to_numeric(values, errors='coerce').astype('float64')
+        present = np.isfinite(numbers.to_numpy())
+        # Shortest round-tripping repr, so no digits are lost
+        cells = ref + '"><v>' + numbers.astype(str) + '</v></c>'
+    else:
+        present = values.notna().to_numpy()
+        cells = ref + '" t="inlineStr"><is><t xml:space="preserve">' + _text(values) + '</t></is></c>'
+    return cells.where(present, '')
+
+
+def _sheet_rows(frame, columns, first_row):
+    """The ``<row>`` elements of ``frame``, numbered from ``first_row``, as UTF-8 bytes."""
+    numbers = pd.Series(np.arange(first_row, first_row + len(frame)).astype(str), index=frame.index)
+    rows = '<row r="' + numbers + '">'
+    for position, name in enumerate(columns):
+        rows = rows + _cells(frame[name], '<c r="' + column_letter(position) + numbers)
+    return (''.join(rows + '</row>')).encode('utf-8')
+
+
+def _header_row(columns):
+    cells = ''.join(f'<c r="{column_letter(position)}1" s="1" t="inlineStr"><is><t>{escape(str(name))}</t></is></c>'
+                    for position, name in enumerate(columns))
+    return f'<row r="1">{cells}</row>'.encode('utf-8')
+
+
+def _package_parts(sheet_names):
+    sheets = ''.join(f'<sheet name="{escape(name)}" sheetId="{number}" r:id="rId{number}"/>'
+                     for number, name in enumerate(sheet_names, 1))
+    sheet_rels = ''.join(
+        f'<Relationship Id="rId{number}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{number}.xml"/>'
+        for number in range(1, len(sheet_names) + 1)
+    )
+    sheet_types = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for number in range(1, len(sheet_names) + 1)
+    )
+    return {
+        'xl/workbook.xml': f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets>'
+                           '</workbook>',
+        'xl/_rels/workbook.xml.rels': f'{_XML_HEADER}<Relationships xmlns="{_PACKAGE_REL_NS}">{sheet_rels}'
+                                      f'<Relationship Id="rId{len(sheet_names) + 1}" Type="{_REL_NS}/styles" '
+                                      'Target="styles.xml"/></Relationships>',
+        'xl/styles.xml': _STYLES,
+        '_rels/.rels': f'{_XML_HEADER}<Relationships xmlns="{_PACKAGE_REL_NS}"><Relationship Id="rId1" '
+                       f'Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>',
+        '[Content_Types].xml': f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                               '<Default Extension="rels" '
+                               'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                               '<Default Extension="xml" ContentType="application/xml"/>'
+                               '<Override PartName="/xl/workbook.xml" '
+                               'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                               '<Override PartName="/xl/styles.xml" '
+                               'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                               f'{sheet_types}</Types>'
+    }
+
+
+def iter_xlsx(frames, columns, sheet_name='Reviews', compresslevel=6):
+    """Yield an .xlsx workbook of the DataFrames in ``frames`` as one table, while it is written.
+
+    A workbook is a zip archive; its entries are deflated into a write-only
+    sink with data descriptors, so the compressed sheet XML of every frame
+    can be handed on before the next frame is read. Cells are inline
+    strings, numbers and booleans. Review text is never read as a formula.
+    Past Excel's row limit the table continues on ``<sheet_name> (2)`` and
+    so on; the workbook index naming the sheets is written last.
+    """
+    columns = list(columns)
+    sink = _Sink()
+    sheet_names = []
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+        entry = None
+        row = EXCEL_MAX_ROWS
+        try:
+            for frame in frames:
+                start = 0
+                while start < len(frame):
+                    if row >= EXCEL_MAX_ROWS:
+                        if entry is not None:
+                            entry.write(_SHEET_END)
+                            entry.close()
+                        sheet_names.append(f"{sheet_name} ({len(sheet_names) + 1})" if sheet_names else sheet_name)
+                        # zipfile refuses entries past 2 GiB unless they are zip64, and a full
+                        # sheet of long reviews can be larger than that
+                        entry = archive.open(f'xl/worksheets/sheet{len(sheet_names)}.xml', 'w', force_zip64=True)
+                        entry.write(_SHEET_START + _header_row(columns))
+                        row = 1
+                    part = frame.iloc[start:start + EXCEL_MAX_ROWS - row]
+                    entry.write(_sheet_rows(part, columns, row + 1))
+                    row += len(part)
+                    start += len(part)
+                    yield sink.drain()
+            if entry is None:
+                sheet_names.append(sheet_name)
+                entry = archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+                entry.write(_SHEET_START + _header_row(columns))
+            entry.write(_SHEET_END)
+        finally:
+            if entry is not None:
+                entry.close()
+        for name, content in _package_parts(sheet_names).items():
+            archive.writestr(name, content)
+    yield sink.drain()
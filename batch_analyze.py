@@ -0,0 +1,84 @@
+"""Analyze a directory or glob of review CSVs offline, outside the web server.
+
+Every file goes through the same streaming analysis as /api/upload. Each
+result is written to <output>/results/<name>.json, and the combined figures
+to <output>/summary.json. Finished files are recorded in
+<output>/manifest.jsonl, so rerunning the same command after an interruption
+only analyzes what is left:
+
+    python batch_analyze.py uploads/ --workers 4
+    python batch_analyze.py 'exports/**/*.csv' --output backfill --dedup exclude
+
+The exit status is 1 when any file could not be analyzed.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from app import configure_logging
+from app.config import Config
+from app.services.batch import collect_files, run_batch
+from app.services.dedup import DEDUP_MODES
+
+
+def _report(entry, done, total):
+    name = os.path.basename(entry['path'])
+    if entry['status'] == 'done':
+        print(f"[{done}/{total}] {name}: {entry['reviews']} reviews in {entry['seconds']:.2f}s")
+    else:
+        print(f"[{done}/{total}] {name}: FAILED ({entry['error']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('inputs', nargs='+', help='directories, CSV files or glob patterns')
+    parser.add_argument('--output', default=os.path.join('data', 'batch'),
+                        help='folder for results, manifest and summary (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='analysis processes')
+    parser.add_argument('--recursive', action='store_true', help='include CSVs in subdirectories')
+    parser.add_argument('--restart', action='store_true', help='ignore the manifest and analyze every file again')
+    parser.add_argument('--products', action='store_true', help='add per-product and per-brand summaries')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default=Config.DEDUP_MODE,
+                        help='near-duplicate handling (default: %(default)s)')
+    parser.add_argument('--date-column', help='column with the review dates (default: a known name when present)')
+    parser.add_argument('--no-score-store', action='store_true', help='do not reuse or store per-review scores')
+    parser.add_argument('--verbose', action='store_true', help='log every analysis step')
+    args = parser.parse_args(argv)
+
+    configure_logging(logging.DEBUG if args.verbose else logging.WARNING)
+    files = collect_files(args.inputs, recursive=args.recursive)
+    if not files:
+        print("No CSV files found")
+        return 1
+
+    settings = {
+        'text_column': 'Reviews',
+        'ngram_range': list(Config.PHRASE_NGRAM_RANGE),
+        'top_k': Config.PHRASE_TOP_K,
+        'group_options': {'top_k': Config.GROUP_TOP_K, 'max_groups': Config.GROUP_MAX_GROUPS}
+        if args.products else None,
+        'dedup_mode': args.dedup,
+        'dedup_threshold': Config.DEDUP_THRESHOLD,
+        'dedup_min_words': Config.DEDUP_MIN_WORDS,
+        'date_column': args.date_column,
+        'chunk_size': Config.CSV_CHUNK_SIZE,
+        'score_store_path': None if args.no_score_store or not Config.SCORE_STORE_ENABLED else Config.SCORE_STORE_PATH,
+        'score_store_max_entries': Config.SCORE_STORE_MAX_ENTRIES
+    }
+    workers = max(1, min(args.workers, len(files)))
+    print(f"Analyzing {len(files)} files with {workers} workers into {args.output}/")
+    summary = run_batch(files, args.output, settings, workers=workers, resume=not args.restart, report=_report)
+
+    run = summary['run']
+    print(f"{summary['analyzed']}/{summary['files']} files analyzed, {summary['failed']} failed, "
+          f"{run['files_skipped']} already done")
+    print(f"This run: {run['files_processed']} files, {run['rows_in']} rows, {run['bytes'] / 1024 ** 2:.1f} MB "
+          f"in {run['seconds']:.2f}s ({run['rows_per_second']:.0f} rows/s, {run['files_per_second']:.2f} files/s, "
+          f"{run['mb_per_second']:.2f} MB/s)")
+    print(f"Summary written to {os.path.join(args.output, 'summary.json')}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""Benchmark the review analysis pipeline stage by stage.
+
+Builds datasets from the CSVs in uploads/ (the real corpus plus synthetic
+copies scaled to the requested row counts by repeating its rows), then
+posts each one to /api/upload. Stage times are read from the pipeline's own
+``analysis_stage_seconds`` timers, so every stage the upload path runs is
+covered: upload storage, CSV parse, cleaning, near-duplicate detection,
+scoring, aggregation, trend, ratings, Parquet persist, tokenizing, indexing,
+grouping, phrase extraction, the response and the dataset commit. Time
+the upload spends outside any stage is reported as ``unaccounted``.
+
+Every upload runs in a fresh process, so its peak RSS is that upload's
+alone. A second fresh process repeats the upload with tracemalloc on and
+reports, per stage, the peak memory allocated above what was allocated
+when the stage started (scoring worker processes are not traced).
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 10000,100000,1000000
+    python benchmarks/bench_pipeline.py --products --dedup report
+    python benchmarks/bench_pipeline.py --baseline benchmarks/results/baseline.json
+
+Results are written as JSON (``--output``). With ``--baseline`` every stage
+is compared to the stored run and the exit status is 1 when any stage is
+slower than ``--threshold`` times its baseline.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+from app.services.dedup import DEDUP_MODES  # noqa: E402
+from app.services.ingestion import detect_encoding  # noqa: E402
+from app.services.metrics import metrics  # noqa: E402
+
+# analysis_stage_seconds stages in pipeline order; 'total' (analyze_csv_file) wraps those from csv_parse to response
+STAGES = ['upload_save', 'csv_parse', 'cleaning', 'dedup', 'scoring', 'aggregation', 'trend', 'ratings', 'persist',
+          'tokenizing', 'indexing', 'grouping', 'phrase_extraction', 'response', 'dataset_commit', 'index_save']
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'latest.json')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class StageMemory:
+    """Peak traced allocation of every stage, above what was allocated when it started.
+
+    Stages nest (``total`` wraps most others), so each open stage keeps the
+    highest peak seen by the stages it contains.
+    """
+
+    def __init__(self):
+        self.peaks = {}
+        self._open = []
+
+    @contextlib.contextmanager
+    def track(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1][1] = max(self._open[-1][1], peak)
+        tracemalloc.reset_peak()
+        frame = [current, current]
+        self._open.append(frame)
+        try:
+            yield
+        finally:
+            self._open.pop()
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            self.peaks[stage] = max(self.peaks.get(stage, 0), peak - frame[0])
+            if self._open:
+                self._open[-1][1] = max(self._open[-1][1], peak)
+
+    def install(self):
+        """Wrap ``metrics.timer`` so every stage timer is also tracked."""
+        timer = metrics.timer
+
+        @contextlib.contextmanager
+        def tracked_timer(name, **labels):
+            with timer(name, **labels), self.track(labels.get('stage', name)):
+                yield
+
+        metrics.timer = tracked_timer
+
+def load_corpus(pattern):
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        try:
+            frames.append(pd.read_csv(path, encoding=detect_encoding(path)))
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+    if not frames:
+        raise SystemExit(f"No CSV files matched {pattern}")
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_dataset(corpus, rows, folder):
+    """Write ``rows`` rows to a CSV by repeating the corpus."""
+    path = os.path.join(folder, f"bench_{rows}.csv")
+    repeats = -(-rows // len(corpus))
+    header = True
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for _ in range(repeats):
+            part = corpus.iloc[:rows - written]
+            part.to_csv(f, index=False, header=header)
+            header = False
+            written += len(part)
+    return path
+
+
+def make_app(workdir, options):
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app()
+    app.config.update(
+        TESTING=True,
+        MAX_CONTENT_LENGTH=None,
+        UPLOAD_STORE_FOLDER=os.path.join(workdir, 'uploads'),
+        DATASET_FOLDER=os.path.join(workdir, 'datasets'),
+        CONTEXT_STORE_PATH=os.path.join(workdir, 'contexts.sqlite3'),
+        JOB_STORE_PATH=os.path.join(workdir, 'jobs.sqlite3'),
+        RESULT_CACHE_ENABLED=False,
+        SCORE_STORE_ENABLED=False,
+        ANALYSIS_WORKERS=options['workers'],
+        ANALYSIS_CHUNK_SIZE=options['worker_chunk_size'],
+        CSV_CHUNK_SIZE=options['chunk_size'],
+        PHRASE_NGRAM_RANGE=tuple(options['ngram_range']),
+    )
+    return app
+
+
+def run_upload(path, workdir, options, trace_memory=False):
+    """Post ``path`` to /api/upload once; meant to run in a fresh process.
+
+    Returns the upload's seconds, the per-stage seconds and the peak RSS, or
+    with ``trace_memory`` the per-stage traced allocation peaks in MB.
+    """
+    app = make_app(workdir, options)
+    memory = None
+    if trace_memory:
+        memory = StageMemory()
+        memory.install()
+        tracemalloc.start()
+    rss_before = peak_rss_mb()
+    query = f"?dedup={options['dedup']}" + ('&mode=products' if options['products'] else '')
+    client = app.test_client()
+    started = time.perf_counter()
+    with open(path, 'rb') as f, contextlib.redirect_stdout(io.StringIO()):
+        response = client.post('/api/upload' + query, data={'file': (f, os.path.basename(path))},
+                               content_type='multipart/form-data')
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/upload returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    if memory is not None:
+        tracemalloc.stop()
+        return {stage: round(peak / (1024 * 1024), 1) for stage, peak in memory.peaks.items()}
+    seconds = {dict(labels).get('stage'): total
+               for labels, total in metrics.histogram_sums('analysis_stage_seconds').items()}
+    payload = response.get_json()
+    return {
+        "seconds": elapsed,
+        "stages": seconds,
+        "clean_rows": payload['stats']['total_reviews'],
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def in_fresh_process(function, *args, **kwargs):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(function, *args, **kwargs).result()
+
+
+def stage_result(seconds, rows, peak_mb=None):
+    result = {
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None
+    }
+    if peak_mb is not None:
+        result["peak_alloc_mb"] = peak_mb
+    return result
+
+
+def compare(results, baseline, threshold, min_seconds=0.05):
+    """Return ``(dataset, stage, ratio)`` for every stage slower than the threshold.
+
+    Stages faster than ``min_seconds`` in both runs are too noisy to flag.
+    """
+    base = {entry['dataset']: entry['stages'] for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results['results']:
+        for stage, current in entry['stages'].items():
+            previous = base.get(entry['dataset'], {}).get(stage)
+            if not previous or not previous.get('seconds'):
+                continue
+            ratio = current['seconds'] / previous['seconds']
+            current['vs_baseline'] = round(ratio, 3)
+            if ratio > threshold and max(current['seconds'], previous['seconds']) >= min_seconds:
+                regressions.append((entry['dataset'], stage, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', default=os.path.join(ROOT, 'uploads', '*.csv'), help='glob of source CSVs')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma separated synthetic row counts')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='rows per streamed CSV chunk')
+    parser.add_argument('--workers', type=int, default=0, help='process pool size for scoring (0 = serial)')
+    parser.add_argument('--worker-chunk-size', type=int, default=5000)
+    parser.add_argument('--ngrams', default='1,1', help='phrase n-gram range, e.g. 1,2')
+    parser.add_argument('--products', action='store_true', help='upload with per-product and per-brand summaries')
+    parser.add_argument('--dedup', choices=DEDUP_MODES, default='off', help='near-duplicate mode of the uploads')
+    parser.add_argument('--skip-memory', action='store_true', help='do not repeat each upload to trace its memory')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio counted as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='ignore stages faster than this')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    corpus = load_corpus(args.corpus)
+    workdir = tempfile.mkdtemp(prefix='review-bench-')
+    options = {
+        "chunk_size": args.chunk_size,
+        "workers": args.workers,
+        "worker_chunk_size": args.worker_chunk_size,
+        "ngram_range": [int(n) for n in args.ngrams.split(',')],
+        "products": args.products,
+        "dedup": args.dedup
+    }
+
+    results = {
+        "meta": dict(
+            options,
+            timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            pandas=pd.__version__,
+            corpus_rows=len(corpus)
+        ),
+        "results": []
+    }
+
+    try:
+        datasets = [('corpus', len(corpus), write_dataset(corpus, len(corpus), workdir))]
+        datasets += [(f"synthetic_{rows}", rows, write_dataset(corpus, rows, workdir)) for rows in sizes]
+
+        for name, rows, path in datasets:
+            print(f"== {name}: {rows} rows ({os.path.getsize(path) / 1e6:.1f} MB)")
+            # Separate folders, so the second run does not find the dataset already stored
+            run = in_fresh_process(run_upload, path, os.path.join(workdir, f"{name}-time"), options)
+            peaks = {} if args.skip_memory else in_fresh_process(
+                run_upload, path, os.path.join(workdir, f"{name}-memory"), options, trace_memory=True)
+            timings = run['stages']
+            stages = {stage: stage_result(timings[stage], rows, peaks.get(stage)) for stage in STAGES
+                      if stage in timings}
+            stages['pipeline_total'] = stage_result(timings.get('total', 0.0), rows, peaks.get('total'))
+            accounted = sum(timings[stage] for stage in STAGES if stage in timings)
+            stages['unaccounted'] = stage_result(max(run['seconds'] - accounted, 0.0), rows)
+            stages['end_to_end_upload'] = dict(stage_result(run['seconds'], rows),
+                                               rss_before_mb=run['rss_before_mb'], peak_rss_mb=run['peak_rss_mb'])
+            for stage, result in stages.items():
+                memory = result.get('peak_alloc_mb', result.get('peak_rss_mb'))
+                print(f"  {stage:<20} {result['seconds']:>9.3f}s {result['rows_per_sec'] or 0:>12.0f} rows/s"
+                      + (f" {memory:>8.1f} MB" if memory is not None else ''))
+            results['results'].append({"dataset": name, "rows": rows, "clean_rows": run['clean_rows'],
+                                       "stages": stages})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_seconds)
+        results['meta']['baseline'] = args.baseline
+        for dataset, stage, ratio in regressions:
+            print(f"REGRESSION {dataset}/{stage}: {ratio:.2f}x baseline")
+        exit_code = 1 if regressions else 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
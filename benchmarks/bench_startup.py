@@ -0,0 +1,81 @@
+"""Measure application cold start and first-analysis latency.
+
+Every measurement runs in a fresh interpreter so imports are not shared:
+
+* import_app      - ``from app import create_app; create_app()``
+* warm_up         - building the VADER analyzer and stop words
+* first_analysis  - the first /api/upload of the sample CSV after startup
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_PROBE = r'''
+import contextlib, io, json, os, sys, tempfile, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+from app import create_app
+with contextlib.redirect_stdout(io.StringIO()):
+    app = create_app()
+timings = {{"import_app": time.perf_counter() - started}}
+
+from app.utils.nlp_processor import warm_up
+started = time.perf_counter()
+warm_up()
+timings["warm_up"] = time.perf_counter() - started
+
+if {sample!r}:
+    folder = tempfile.mkdtemp(prefix='review-startup-')
+    app.config.update(TESTING=True, UPLOAD_STORE_FOLDER=folder, RESULT_CACHE_ENABLED=False, SCORE_STORE_ENABLED=False)
+    with open({sample!r}, 'rb') as f, contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        app.test_client().post('/api/upload', data={{'file': (f, 'sample.csv')}}, content_type='multipart/form-data')
+        timings["first_analysis"] = time.perf_counter() - started
+print(json.dumps(timings))
+'''
+
+
+def run_probe(sample):
+    result = subprocess.run([sys.executable, '-c', _PROBE.format(root=ROOT, sample=sample)],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'probe failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample', help='CSV uploaded for the first-analysis timing (default: first file in uploads/)')
+    parser.add_argument('--output', help='write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    sample = args.sample
+    if sample is None:
+        candidates = sorted(glob.glob(os.path.join(ROOT, 'uploads', '*.csv')))
+        sample = candidates[0] if candidates else ''
+
+    runs = [run_probe(sample) for _ in range(args.repeat)]
+    summary = {}
+    for stage in runs[0]:
+        values = [run[stage] for run in runs]
+        summary[stage] = {"median": round(statistics.median(values), 4), "min": round(min(values), 4)}
+        print(f"{stage:<16} median {summary[stage]['median']:.3f}s  min {summary[stage]['min']:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"repeat": args.repeat, "sample": sample, "stages": summary}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Answers ``POST /v1/chat/completions`` with a canned completion after a fixed
+delay, streamed word by word when the request asks for ``stream``, so
+/api/chat and /api/chat/stream (pooling, caching, the async path) can be
+exercised and timed without a key or network access:
+
+    python benchmarks/openai_stub.py --port 8001 --latency 1.5
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python main.py
+
+``GET /stats`` reports how many completions were served.
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_served = 0
+_served_lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+    latency = 0.0
+    token_delay = 0.0
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request, answer):
+        """Server-sent events, one word per chunk, ``token_delay`` apart."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for word in re.findall(r'\S+\s*', answer):
+            chunk = {
+                "id": f"chatcmpl-stub-{_served}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get('model', 'stub'),
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        self._send_json(200, {"completions": _served})
+
+    def do_POST(self):
+        global _served
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        time.sleep(self.latency)
+        with _served_lock:
+            _served += 1
+        question = request.get('messages', [{}])[-1].get('content', '').rsplit('Question:', 1)[-1].split('\n')[0]
+        answer = f"Stub answer to:{question}"
+        if request.get('stream'):
+            self._send_stream(request, answer)
+            return
+        time.sleep(self.token_delay * len(answer.split()))
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{_served}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='seconds between generated words')
+    args = parser.parse_args(argv)
+
+    StubHandler.latency = args.latency
+    StubHandler.token_delay = args.token_delay
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"OpenAI stub on http://{args.host}:{args.port}/v1 ({args.latency}s latency)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
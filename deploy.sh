@@ -15,9 +15,12 @@ npm run build
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Gzip/brotli copies of the built assets for the server to send as-is
+python precompress_static.py dist
+
 # Download NLTK data
 echo "Downloading NLTK data..."
-python -c "import nltk; nltk.download('vader_lexicon'); nltk.download('punkt'); nltk.download('stopwords')"
+python setup_nltk.py
 
 echo "=== Deployment completed! ==="
 echo ""
@@ -25,8 +28,9 @@ echo "To run the application:"
 echo "1. Set your OpenAI API key:"
 echo "   export OPENAI_API_KEY='your-openai-api-key-here'"
 echo ""
-echo "2. Start the Flask server:"
-echo "   python main.py"
+echo "2. Start the server:"
+echo "   gunicorn -c gunicorn.conf.py   (production)"
+echo "   python main.py                 (development)"
 echo ""
 echo "3. Open your browser to:"
 echo "   http://localhost:5000"
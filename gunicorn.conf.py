@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+# Every worker is a separate process. State that requests share lives on disk, so any worker can serve any request:
+# job status and results (JOB_STORE_PATH, for async uploads, appends and chat), chat contexts, the result cache,
+# score store, datasets, and uploads. Appends to a dataset hold an flock on it. Only caches (model answers,
+# the static manifest) and /api/metrics counters are per process.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads let a worker keep serving static files and polls while another
+# request waits on an analysis or a streamed chat answer
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Import wsgi.py in the master so workers are forked from a warmed-up process:
+# the NLTK analyzer, stop words and static manifest are shared copy-on-write
+preload_app = True
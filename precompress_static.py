@@ -0,0 +1,13 @@
+import sys
+
+from app.services.static_assets import precompress
+
+
+def main(folder='dist'):
+    """Write gzip (and brotli, when installed) copies of the built frontend for the server to send as-is."""
+    written = precompress(folder)
+    print(f"Wrote {written} precompressed files under {folder}/")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -1,7 +1,7 @@
 
 // API handling functions
 class ApiService {
-    static async uploadFile(file) {
+    static async uploadFile(file, options = {}) {
         console.log('=== API: Starting file upload ===');
         console.log('File:', file.name, 'Size:', file.size);
         
@@ -9,7 +9,9 @@ class ApiService {
         formData.append('file', file);
 
         try {
-            const response = await fetch('/api/upload', {
+            // mode: 'products' returns per-product and per-brand summaries as well
+            const mode = options.mode ? `&mode=${encodeURIComponent(options.mode)}` : '';
+            const response = await fetch(`/api/upload?async=1${mode}`, {
                 method: 'POST',
                 body: formData
             });
@@ -22,7 +24,9 @@ class ApiService {
                 throw new Error(`Server error: ${response.status} - ${errorText}`);
             }
 
-            const data = await response.json();
+            const job = await response.json();
+            console.log('API: Analysis job queued:', job.job_id);
+            const data = await ApiService.waitForJob(job.status_url);
             console.log('=== API: RECEIVED DATA FROM BACKEND ===');
             console.log('Full response:', data);
             console.log('Sentiment score:', data.sentiment_score);
@@ -39,6 +43,45 @@ class ApiService {
         }
     }
 
+    static async appendToDataset(datasetId, file) {
+        // Scores only the new rows and returns the updated payload for the whole dataset
+        const formData = new FormData();
+        formData.append('file', file);
+
+        const response = await fetch(`/api/datasets/${encodeURIComponent(datasetId)}/append?async=1`, {
+            method: 'POST',
+            body: formData
+        });
+        if (!response.ok) {
+            const errorText = await response.text();
+            throw new Error(`Server error: ${response.status} - ${errorText}`);
+        }
+        const job = await response.json();
+        return ApiService.waitForJob(job.status_url);
+    }
+
+    static async waitForJob(statusUrl, intervalMs = 1000) {
+        while (true) {
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+
+            if (!response.ok) {
+                throw new Error(job.error || `Job status error: ${response.status}`);
+            }
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error ? job.error.error : 'Analysis failed');
+            }
+
+            const percent = job.percent !== undefined ? ` (${job.percent}%` +
+                (job.eta_seconds !== undefined ? `, about ${Math.ceil(job.eta_seconds)}s left)` : ')') : '';
+            console.log(`API: Job ${job.job_id} ${job.stage}, ${job.rows_processed} rows processed${percent}`);
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     static async askChatbot(question) {
         try {
             const response = await fetch('/api/chat', {
@@ -9,6 +9,7 @@ call venv\Scripts\activate
 echo.
 echo Installing/updating dependencies...
 pip install -r requirements.txt
+python setup_nltk.py
 npm install
 
 echo.
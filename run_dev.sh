@@ -9,6 +9,7 @@ source venv/bin/activate
 echo
 echo "Installing/updating dependencies..."
 pip install -r requirements.txt
+python setup_nltk.py
 npm install
 
 echo
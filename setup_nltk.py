@@ -1,7 +1,7 @@
 
-import nltk
 import ssl
-import os
+
+from app.utils.nlp_processor import download_nltk_resources
 
 try:
     _create_unverified_https_context = ssl._create_unverified_context
@@ -10,12 +10,13 @@ except AttributeError:
 else:
     ssl._create_default_https_context = _create_unverified_https_context
 
-# Download required NLTK data
-try:
-    nltk.download('vader_lexicon', quiet=True)
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    print("NLTK data downloaded successfully")
-except Exception as e:
-    print(f"Error downloading NLTK data: {e}")
-
+# Download the NLTK data the analysis needs; run once at install/build time
+if __name__ == '__main__':
+    try:
+        missing = download_nltk_resources()
+        if missing:
+            print(f"Error downloading NLTK data: {missing} still missing")
+        else:
+            print("NLTK data downloaded successfully")
+    except Exception as e:
+        print(f"Error downloading NLTK data: {e}")
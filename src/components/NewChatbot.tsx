@@ -55,26 +55,23 @@ const NewChatbot = () => {
     setInputValue('');
     setIsLoading(true);
 
+    const botId = (Date.now() + 1).toString();
     try {
-      const response = await chatbotService.processMessage(inputValue);
-      
-      const botMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        type: 'bot',
-        text: response,
-        timestamp: new Date()
-      };
-
-      setMessages(prev => [...prev, botMessage]);
+      // Show the answer as it streams in
+      setMessages(prev => [...prev, { id: botId, type: 'bot', text: '', timestamp: new Date() }]);
+      const appendText = (delta: string) =>
+        setMessages(prev => prev.map(m => (m.id === botId ? { ...m, text: m.text + delta } : m)));
+      const response = await chatbotService.streamMessage(userMessage.text, appendText);
+      setMessages(prev => prev.map(m => (m.id === botId ? { ...m, text: response } : m)));
     } catch (error) {
       console.error('Chat error:', error);
       const errorMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
+        id: botId,
         type: 'bot',
         text: 'Sorry, I encountered an error. Please try again.',
         timestamp: new Date()
       };
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => [...prev.filter(m => m.id !== botId), errorMessage]);
     } finally {
       setIsLoading(false);
     }
@@ -126,7 +123,7 @@ const NewChatbot = () => {
             </div>
           )}
           
-          {messages.map((message) => (
+          {messages.filter((message) => message.text).map((message) => (
             <div 
               key={message.id}
               className={`p-3 rounded-lg text-sm max-w-xs ${
@@ -139,7 +136,7 @@ const NewChatbot = () => {
             </div>
           ))}
           
-          {isLoading && (
+          {isLoading && !messages[messages.length - 1]?.text && (
             <div className="bg-gray-100 p-3 rounded-lg text-sm">
               <div className="flex items-center gap-2">
                 <div className="animate-spin rounded-full h-3 w-3 border-b-2 border-blue-600"></div>
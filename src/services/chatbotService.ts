@@ -63,6 +63,78 @@ class ChatbotService {
     }
   }
 
+  /**
+   * Ask /api/chat/stream and call onDelta with every piece of the answer as
+   * it arrives. Resolves with the full answer; falls back to the local
+   * response when the stream is unavailable.
+   */
+  async streamMessage(message: string, onDelta: (delta: string) => void): Promise<string> {
+    if (!this.analysisData) {
+      const answer = "Please upload and analyze a CSV file first, then I can help you with insights about your data.";
+      onDelta(answer);
+      return answer;
+    }
+
+    let answer = '';
+    try {
+      const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ question: message }),
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Chat stream failed with status ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+          const event = this.parseEvent(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf('\n\n');
+          if (event.name === 'delta' && event.data.delta) {
+            answer += event.data.delta;
+            onDelta(event.data.delta);
+          } else if (event.name === 'done') {
+            return event.data.answer ?? answer;
+          }
+        }
+      }
+      return answer;
+    } catch (error) {
+      console.error('Chatbot stream error:', error);
+      if (answer) return answer;
+      const fallback = this.generateLocalResponse(message);
+      onDelta(fallback);
+      return fallback;
+    }
+  }
+
+  private parseEvent(raw: string): { name: string; data: any } {
+    let name = 'message';
+    const data: string[] = [];
+    for (const line of raw.split('\n')) {
+      if (line.startsWith('event:')) name = line.slice(6).trim();
+      else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+    }
+    try {
+      return { name, data: data.length ? JSON.parse(data.join('\n')) : {} };
+    } catch {
+      return { name, data: {} };
+    }
+  }
+
   private generateLocalResponse(message: string): string {
     const lowerMessage = message.toLowerCase();
     const data = this.analysisData!;
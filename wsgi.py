@@ -0,0 +1,13 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py`` (see gunicorn.conf.py).
+
+Everything expensive happens at import, which gunicorn does once in the
+master before forking workers: the NLTK analyzer and stop words are built
+and the static asset manifest (ETags, index.html) is loaded, so workers
+share that memory and answer their first request warm.
+"""
+from app import create_app, check_nltk_data
+from app.services.static_assets import get_static_assets
+
+app = create_app()
+check_nltk_data(warm_up=True)
+get_static_assets(app.config).manifest()